@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the floorplanning tool
+Times the core hot paths on seeded synthetic designs, headless on an Agg canvas
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+
+from floorplan_bookshelf import net_edges, read_bookshelf, write_bookshelf
+from floorplan_desktop_v3 import FloorplanToolV2
+from floorplan_replay import mouse_event
+
+# Name stems of the sample CSV, numbered to make every name unique
+NAME_STEMS = ('CPU_Core', 'Memory_Controller', 'GPU_Unit', 'IO_Bridge', 'Network_Interface', 'Power_Management')
+
+# Largest designs each benchmark is run on (the quadratic ones are capped lower)
+DEFAULT_LIMITS = {
+    'dense_blocks': 5000,           # process_adjacency_matrix needs an N x N matrix
+    'plot_blocks': 1000,            # Full update_plot
+    'drag_blocks': 200,             # Drag frames (one full redraw per motion event)
+    'offset_connections': 5000,     # get_connection_offset is quadratic in connections
+    'bookshelf_nodes': 1000000,     # Bookshelf files written to a temporary directory
+    'batch_cells': 10**8            # Candidates x blocks scored by the batch evaluator
+}
+
+# Candidate placements scored per batch_evaluate run
+BATCH_CANDIDATES = 256
+
+
+def generate_design(n, density=None, area_distribution='lognormal', seed=0):
+    """Seeded synthetic design
+
+    density is the fraction of block pairs that are connected (default: an
+    average of four connections per block). Returns a dict with 'names',
+    'areas', 'src', 'dst' and 'weights'; src < dst for every connection.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"{NAME_STEMS[i % len(NAME_STEMS)]}_{i}" for i in range(n)]
+
+    if area_distribution == 'uniform':
+        areas = rng.uniform(1e5, 1.2e6, n)
+    elif area_distribution == 'lognormal':
+        areas = rng.lognormal(np.log(6e5), 0.8, n)
+    elif area_distribution == 'bimodal':
+        # A few large macros among many small ones
+        large = rng.random(n) < 0.1
+        areas = np.where(large, rng.uniform(1e6, 4e6, n), rng.uniform(2e4, 2e5, n))
+    else:
+        raise ValueError(f"Unknown area distribution: {area_distribution}")
+    areas = np.round(areas)
+
+    pairs = n * (n - 1) // 2
+    if density is None:
+        density = min(1.0, 4.0 / max(n - 1, 1))
+    count = int(round(density * pairs))
+
+    if count > pairs // 4:
+        # Dense: choose directly among all pairs
+        src, dst = np.triu_indices(n, 1)
+        chosen = np.sort(rng.choice(pairs, count, replace=False))
+        src, dst = src[chosen], dst[chosen]
+    else:
+        # Sparse: sample pairs until enough distinct ones are found
+        keys = np.zeros(0, dtype=np.int64)
+        while len(keys) < count:
+            a = rng.integers(0, n, 2 * (count - len(keys)) + 16)
+            b = rng.integers(0, n, len(a))
+            keep = a != b
+            new = np.minimum(a, b)[keep].astype(np.int64) * n + np.maximum(a, b)[keep]
+            keys = np.unique(np.concatenate([keys, new]))
+        keys = np.sort(rng.choice(keys, count, replace=False))
+        src, dst = keys // n, keys % n
+
+    weights = rng.integers(1, 51, len(src))
+    return {'names': names, 'areas': areas, 'src': src, 'dst': dst, 'weights': weights}
+
+
+def generate_netlist(n, nets_per_node=1.05, terminal_fraction=0.02, seed=0):
+    """Seeded ISPD-like netlist in the read_bookshelf format
+
+    Net degrees follow a geometric distribution (mostly 2 and 3 pins) with
+    a few wide nets of up to 500 pins; pins are drawn near a random anchor
+    node to give the netlist some locality.
+    """
+    rng = np.random.default_rng(seed)
+    widths = np.round(rng.lognormal(np.log(8), 0.5, n))
+    heights = np.full(n, 12.0)
+    terminal = rng.random(n) < terminal_fraction
+    widths[terminal] = np.round(rng.uniform(50, 400, terminal.sum()))
+    heights[terminal] = np.round(rng.uniform(50, 400, terminal.sum()))
+
+    count = int(round(n * nets_per_node))
+    degrees = np.minimum(1 + rng.geometric(0.55, count), n)
+    wide = rng.random(count) < 0.002
+    degrees[wide] = np.minimum(rng.integers(20, 501, wide.sum()), n)
+
+    # Distinct pins per net: anchor plus nearby nodes, duplicates dropped
+    anchors = np.repeat(rng.integers(0, n, count), degrees)
+    spread = np.repeat(np.maximum(degrees * 4, 50), degrees)
+    pins = (anchors + np.round(rng.normal(0, 1, len(anchors)) * spread).astype(np.int64)) % n
+    net_of_pin = np.repeat(np.arange(count), degrees)
+    keys = np.unique(net_of_pin * n + pins)
+    net_of_pin, pins = keys // n, keys % n
+    net_ptr = np.concatenate([[0], np.cumsum(np.bincount(net_of_pin, minlength=count))])
+
+    side = np.sqrt((widths * heights).sum() * 1.4)
+    x = np.round(rng.uniform(0, side, n))
+    y = np.round(rng.uniform(0, side, n) / 12) * 12
+    return {
+        'names': [f"o{i}" for i in range(n)], 'widths': widths, 'heights': heights, 'terminal': terminal,
+        'x': x, 'y': y, 'fixed': terminal.copy(),
+        'net_names': [f"n{i}" for i in range(count)], 'net_ptr': net_ptr, 'net_pins': pins
+    }
+
+
+def design_matrix(design):
+    """Adjacency matrix in the CSV layout: areas on the diagonal, symmetric counts"""
+    n = len(design['names'])
+    matrix = np.zeros((n, n), dtype=np.int64)
+    matrix[np.arange(n), np.arange(n)] = design['areas']
+    matrix[design['src'], design['dst']] = design['weights']
+    matrix[design['dst'], design['src']] = design['weights']
+    return matrix
+
+
+def load_app(design):
+    """Headless tool with the design loaded through the edge-list path"""
+    app = FloorplanToolV2()
+    app.hardmacro_names = design['names']
+    app.process_edge_list(design['areas'].tolist(), design['src'].tolist(),
+                          design['dst'].tolist(), design['weights'].tolist())
+    app.initialize_port_positions()
+    return app
+
+
+def timed(function, repeat):
+    """Run function repeat times; returns the list of wall times in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_process_matrix(design, repeat, limits):
+    n = len(design['names'])
+    if n > limits['dense_blocks']:
+        return None, f"dense matrix above {limits['dense_blocks']} blocks"
+    matrix = design_matrix(design)
+    app = FloorplanToolV2()
+    app.hardmacro_names = design['names']
+    return timed(lambda: app.process_adjacency_matrix(matrix), repeat), None
+
+
+def bench_bookshelf_import(design, repeat, limits):
+    """Parse Bookshelf files of an ISPD-like netlist and expand its nets"""
+    n = len(design['names'])
+    if n > limits['bookshelf_nodes']:
+        return None, f"bookshelf above {limits['bookshelf_nodes']} nodes"
+    netlist = generate_netlist(n)
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, 'synthetic')
+        write_bookshelf(prefix, netlist)
+
+        def run():
+            parsed = read_bookshelf(prefix + '.aux')
+            net_edges(parsed['net_ptr'], parsed['net_pins'], len(parsed['names']))
+        return timed(run, repeat), None
+
+
+def bench_batch_evaluate(app, repeat, limits, seed=0):
+    """Score BATCH_CANDIDATES jittered copies of the placement (time per candidate)"""
+    if BATCH_CANDIDATES * len(app.blocks) > limits['batch_cells']:
+        return None, f"batch above {limits['batch_cells']} candidate blocks"
+    rng = np.random.default_rng(seed)
+    geometry = np.array([(b['x'], b['y'], b['width'], b['height']) for b in app.blocks], dtype=float)
+    positions = geometry[None, :, :2] + rng.normal(0, 50, (BATCH_CANDIDATES, len(geometry), 2))
+
+    def run():
+        app.evaluate_placements(positions)
+    return [t / BATCH_CANDIDATES for t in timed(run, repeat)], None
+
+
+def bench_update_plot(app, repeat, limits):
+    if len(app.blocks) > limits['plot_blocks']:
+        return None, f"plot above {limits['plot_blocks']} blocks"
+    app.update_plot()
+    return timed(app.update_plot, repeat), None
+
+
+def bench_connection_offsets(app, repeat, limits):
+    if len(app.connections) > limits['offset_connections']:
+        return None, f"offsets above {limits['offset_connections']} connections"
+
+    def run():
+        for conn in app.connections:
+            ports = conn['port_positions']
+            app.get_connection_offset(conn, ports['start'], ports['end'], 30)
+    return timed(run, repeat), None
+
+
+def bench_picks(app, repeat, limits, picks=50, seed=0):
+    """Block and port picks at random points inside the design (time per pick)"""
+    rng = np.random.default_rng(seed)
+    x_min, y_min, x_max, y_max = app.get_design_bounds()
+    points = rng.uniform([x_min, y_min], [x_max, y_max], (picks, 2)).tolist()
+
+    def run():
+        for x, y in points:
+            app.get_port_at_position(x, y)
+            app.get_block_at_position(x, y)
+    return [t / picks for t in timed(run, repeat)], None
+
+
+def bench_hover(app, repeat, limits, events=50):
+    """Move the cursor on and off a handle of the selected block (time per hover change)"""
+    if len(app.blocks) > limits['plot_blocks']:
+        return None, f"plot above {limits['plot_blocks']} blocks"
+    block = max(app.blocks, key=lambda b: b['area'])
+    app.selected_block = block
+    app.update_plot()
+    corner = app.handle_config['corner_size'] / 2
+    points = [(block['x'] + corner, block['y'] + corner),
+              (block['x'] + block['width'] / 2, block['y'] + block['height'] / 2)]
+
+    def run():
+        for n in range(events):
+            app.on_mouse_move(mouse_event(app, *points[n % 2]))
+    times = [t / events for t in timed(run, repeat)]
+    app.selected_block = None
+    return times, None
+
+
+def bench_pan_frames(app, repeat, limits, frames=20):
+    """Pan the view in small steps from cached tiles (time per motion event)"""
+    if len(app.blocks) > limits['plot_blocks']:
+        return None, f"plot above {limits['plot_blocks']} blocks"
+    app.update_plot()
+    x_min, x_max = app.ax.get_xlim()
+    y_min, y_max = app.ax.get_ylim()
+    x = (x_min + x_max) / 2
+    y = (y_min + y_max) / 2
+    step = (x_max - x_min) / 200
+    app.pan_var.set(True)
+    app.on_mouse_press(mouse_event(app, x, y))
+    app.on_mouse_move(mouse_event(app, x + step, y))
+    app.tiles.wait()
+
+    def run():
+        # The grabbed point stays under the cursor, so every event is one step from it
+        for _ in range(frames):
+            app.on_mouse_move(mouse_event(app, x + step, y + step))
+    times = [t / frames for t in timed(run, repeat)]
+    app.on_mouse_release(mouse_event(app, x, y))
+    app.pan_var.set(False)
+    return times, None
+
+
+def bench_drag_frames(app, repeat, limits, frames=5):
+    """Move the largest block in small steps (time per motion event)"""
+    if len(app.blocks) > limits['drag_blocks']:
+        return None, f"drag above {limits['drag_blocks']} blocks"
+    block = max(app.blocks, key=lambda b: b['area'])
+
+    def run():
+        x = block['x'] + block['width'] / 2
+        y = block['y'] + block['height'] / 2
+        app.on_mouse_press(mouse_event(app, x, y))
+        for step in range(1, frames + 1):
+            app.on_mouse_move(mouse_event(app, x + 5 * step, y + 3 * step))
+        app.on_mouse_release(mouse_event(app, x + 5 * frames, y + 3 * frames))
+    app.update_plot()
+    return [t / frames for t in timed(run, repeat)], None
+
+
+BENCHMARKS = {
+    'process_adjacency_matrix': bench_process_matrix,
+    'bookshelf_import': bench_bookshelf_import,
+    'update_plot': bench_update_plot,
+    'get_connection_offset': bench_connection_offsets,
+    'pick': bench_picks,
+    'hover': bench_hover,
+    'pan_frame': bench_pan_frames,
+    'drag_frame': bench_drag_frames,
+    'batch_evaluate': bench_batch_evaluate
+}
+
+# Benchmarks that take the design itself instead of a loaded tool
+DESIGN_BENCHMARKS = ('process_adjacency_matrix', 'bookshelf_import')
+
+
+def run_suite(sizes, density=None, area_distribution='lognormal', seed=0, repeat=3,
+              benchmarks=None, limits=None, log=print):
+    """Run the selected benchmarks for every design size; returns the result records"""
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    names = benchmarks or list(BENCHMARKS)
+    results = []
+    for n in sizes:
+        design = generate_design(n, density, area_distribution, seed)
+        app = None
+        for name in names:
+            if name in DESIGN_BENCHMARKS:
+                times, skipped = BENCHMARKS[name](design, repeat, limits)
+            else:
+                if app is None:
+                    app = load_app(design)
+                times, skipped = BENCHMARKS[name](app, repeat, limits)
+
+            record = {'benchmark': name, 'n': n, 'connections': len(design['src'])}
+            if skipped:
+                record['skipped'] = skipped
+                log(f"{name:26s} n={n:<7d} skipped ({skipped})")
+            else:
+                record.update({
+                    'median': float(np.median(times)),
+                    'min': float(np.min(times)),
+                    'repeat': len(times)
+                })
+                log(f"{name:26s} n={n:<7d} median {record['median'] * 1e3:10.3f} ms  "
+                    f"min {record['min'] * 1e3:10.3f} ms")
+            results.append(record)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return (benchmark, n, old, new) for every median slower than baseline by more than threshold"""
+    old = {(r['benchmark'], r['n']): r['median'] for r in baseline['results'] if 'median' in r}
+    regressions = []
+    for r in results:
+        key = (r['benchmark'], r['n'])
+        if 'median' in r and key in old and r['median'] > old[key] * (1 + threshold):
+            regressions.append((r['benchmark'], r['n'], old[key], r['median']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the floorplanning tool on synthetic designs")
+    parser.add_argument('--sizes', default='10,100,1000,10000,100000',
+                        help="Comma-separated block counts")
+    parser.add_argument('--density', type=float, default=None,
+                        help="Fraction of block pairs connected (default: 4 connections per block)")
+    parser.add_argument('--areas', default='lognormal', choices=['uniform', 'lognormal', 'bimodal'],
+                        help="Block area distribution")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help="Comma-separated subset of: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    benchmarks = [b for b in args.benchmarks.split(',') if b]
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = run_suite(sizes, args.density, args.areas, args.seed, args.repeat, benchmarks)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'matplotlib': matplotlib.__version__,
+            'platform': platform.platform(),
+            'density': args.density,
+            'areas': args.areas,
+            'seed': args.seed
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, n, old, new in regressions:
+            print(f"REGRESSION {name} n={n}: {old * 1e3:.3f} ms -> {new * 1e3:.3f} ms "
+                  f"({(new / old - 1) * 100:+.0f}%)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Bookshelf netlist reader for the floorplanning tool
+Streams .nodes/.nets/.pl files into compact arrays and turns multi-pin nets
+into weighted pairwise connections without ever building an N x N matrix
+"""
+
+import os
+from array import array
+
+import numpy as np
+
+# Header keys ignored while parsing (counts are taken from the data itself)
+COUNT_KEYS = ('NumNodes', 'NumTerminals', 'NumNets', 'NumPins', 'NumNonRectangularNodes')
+
+# Pair weight of a net with k distinct blocks
+WEIGHTINGS = {
+    'unit': lambda k: np.ones(len(k)),      # Every pair counts as one connection
+    'inverse': lambda k: 1.0 / (k - 1),     # Classic clique weight 1/(k-1)
+    'normalized': lambda k: 2.0 / k         # Total clique weight k-1, as for a spanning tree
+}
+
+
+def data_lines(filename):
+    """Yield the split data lines of a Bookshelf file (headers, counts and comments skipped)"""
+    with open(filename) as f:
+        for line in f:
+            hash_pos = line.find('#')
+            if hash_pos >= 0:
+                line = line[:hash_pos]
+            tokens = line.split()
+            if not tokens or tokens[0] == 'UCLA' or tokens[0] in COUNT_KEYS:
+                continue
+            yield tokens
+
+
+def find_files(path):
+    """Resolve {'nodes', 'nets', 'pl'} file names from an .aux file or any one of the files"""
+    base, extension = os.path.splitext(path)
+    directory = os.path.dirname(path)
+    files = {}
+    if extension == '.aux':
+        for tokens in data_lines(path):
+            for name in tokens:
+                kind = os.path.splitext(name)[1].lstrip('.')
+                if kind in ('nodes', 'nets', 'pl'):
+                    files[kind] = os.path.join(directory, name)
+    else:
+        for kind in ('nodes', 'nets', 'pl'):
+            if os.path.exists(f"{base}.{kind}"):
+                files[kind] = f"{base}.{kind}"
+    for kind in ('nodes', 'nets'):
+        if kind not in files:
+            raise ValueError(f"No .{kind} file found for {path}")
+    return files
+
+
+def read_nodes(filename):
+    """Node names, widths, heights and terminal flags"""
+    names = []
+    widths = array('d')
+    heights = array('d')
+    terminal = array('b')
+    for tokens in data_lines(filename):
+        names.append(tokens[0])
+        widths.append(float(tokens[1]))
+        heights.append(float(tokens[2]))
+        terminal.append(len(tokens) > 3 and tokens[3].startswith('terminal'))
+    return names, np.array(widths, dtype=float), np.array(heights, dtype=float), np.array(terminal, dtype=bool)
+
+
+def read_nets(filename, index):
+    """Nets in CSR form: (net names, net_ptr, net_pins)
+
+    net_pins[net_ptr[n]:net_ptr[n + 1]] are the distinct node indices of net n,
+    its first output pin (the driver) first.
+    """
+    net_names = []
+    net_ptr = array('q', [0])
+    net_pins = array('q')
+    pins = None
+    driver = None
+
+    def close_net():
+        # Drop repeated pins of a node, keeping the driver in front
+        if driver is not None:
+            pins.insert(0, driver)
+        net_pins.extend(dict.fromkeys(pins))
+        net_ptr.append(len(net_pins))
+
+    for tokens in data_lines(filename):
+        if tokens[0] == 'NetDegree':
+            if pins is not None:
+                close_net()
+            net_names.append(tokens[3] if len(tokens) > 3 else f"net{len(net_names)}")
+            pins = []
+            driver = None
+            continue
+        node = index.get(tokens[0])
+        if node is None:
+            raise ValueError(f"Net pin on unknown node {tokens[0]}")
+        if driver is None and len(tokens) > 1 and tokens[1] == 'O':
+            driver = node
+        else:
+            pins.append(node)
+    if pins is not None:
+        close_net()
+    return net_names, np.array(net_ptr, dtype=np.int64), np.array(net_pins, dtype=np.int64)
+
+
+def read_pl(filename, index, count):
+    """Lower-left positions (NaN for nodes without one) and fixed flags"""
+    x = np.full(count, np.nan)
+    y = np.full(count, np.nan)
+    fixed = np.zeros(count, dtype=bool)
+    for tokens in data_lines(filename):
+        i = index.get(tokens[0])
+        if i is None or len(tokens) < 3:
+            continue
+        x[i] = float(tokens[1])
+        y[i] = float(tokens[2])
+        fixed[i] = tokens[-1].startswith('/FIXED')
+    return x, y, fixed
+
+
+def read_bookshelf(path):
+    """Read a Bookshelf design from its .aux file or any of its .nodes/.nets/.pl files
+
+    Returns a netlist dict: 'names', 'widths', 'heights', 'terminal', 'x', 'y',
+    'fixed' (per node) and 'net_names', 'net_ptr', 'net_pins' (nets in CSR form).
+    """
+    files = find_files(path)
+    names, widths, heights, terminal = read_nodes(files['nodes'])
+    index = {name: i for i, name in enumerate(names)}
+    net_names, net_ptr, net_pins = read_nets(files['nets'], index)
+    if 'pl' in files:
+        x, y, fixed = read_pl(files['pl'], index, len(names))
+    else:
+        x, y, fixed = np.full(len(names), np.nan), np.full(len(names), np.nan), np.zeros(len(names), dtype=bool)
+    return {
+        'names': names, 'widths': widths, 'heights': heights, 'terminal': terminal,
+        'x': x, 'y': y, 'fixed': fixed,
+        'net_names': net_names, 'net_ptr': net_ptr, 'net_pins': net_pins
+    }
+
+
+def net_edges(net_ptr, net_pins, count, model='hybrid', clique_limit=16, weighting='unit'):
+    """Turn CSR nets into weighted pairwise connections (src < dst, one per block pair)
+
+    model is 'clique' (all pairs), 'star' (driver to every other pin) or
+    'hybrid' (clique up to clique_limit pins, star above). weighting is a
+    WEIGHTINGS key applied per pair from the net degree. Pair weights of all
+    nets are summed; returns (src, dst, weights) arrays.
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting: {weighting}")
+    if model not in ('clique', 'star', 'hybrid'):
+        raise ValueError(f"Unknown net model: {model}")
+    degrees = np.diff(net_ptr)
+    starts = net_ptr[:-1]
+    if model == 'clique':
+        clique = degrees >= 2
+    elif model == 'star':
+        clique = degrees == 2
+    else:
+        clique = (degrees >= 2) & (degrees <= clique_limit)
+    star = (degrees > 2) & ~clique
+
+    src_parts = []
+    dst_parts = []
+    weight_parts = []
+    # Clique nets, one batch per degree so every batch is a dense (nets x pairs) array
+    for k in np.unique(degrees[clique]):
+        nets = starts[clique & (degrees == k)]
+        a, b = np.triu_indices(int(k), 1)
+        src_parts.append(net_pins[nets[:, None] + a].ravel())
+        dst_parts.append(net_pins[nets[:, None] + b].ravel())
+        weight_parts.append(np.repeat(WEIGHTINGS[weighting](np.full(len(nets), float(k))), len(a)))
+
+    # Star nets: the first pin (the driver) to every other pin
+    if star.any():
+        spans = degrees[star] - 1
+        first = starts[star]
+        offsets = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans) + 1
+        src_parts.append(np.repeat(net_pins[first], spans))
+        dst_parts.append(net_pins[np.repeat(first, spans) + offsets])
+        weight_parts.append(np.repeat(WEIGHTINGS[weighting](degrees[star].astype(float)), spans))
+
+    if not src_parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    src = np.concatenate(src_parts)
+    dst = np.concatenate(dst_parts)
+    weights = np.concatenate(weight_parts)
+
+    # Merge the pairs of all nets (keys are small integers, never an N x N array)
+    keys = np.minimum(src, dst) * count + np.maximum(src, dst)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=weights)
+    if weighting == 'unit':
+        totals = totals.astype(np.int64)
+    else:
+        totals = np.round(totals, 3)
+    return unique_keys // count, unique_keys % count, totals
+
+
+def write_bookshelf(prefix, netlist):
+    """Write a netlist dict as prefix.aux/.nodes/.nets/.pl (nodes without a position are skipped in .pl)"""
+    directory, design = os.path.split(prefix)
+    names = netlist['names']
+    with open(f"{prefix}.aux", 'w') as f:
+        f.write(f"RowBasedPlacement : {design}.nodes {design}.nets {design}.pl\n")
+
+    with open(f"{prefix}.nodes", 'w', buffering=1 << 20) as f:
+        f.write(f"UCLA nodes 1.0\n\nNumNodes : {len(names)}\n"
+                f"NumTerminals : {int(netlist['terminal'].sum())}\n")
+        for name, width, height, terminal in zip(names, netlist['widths'].tolist(), netlist['heights'].tolist(),
+                                                 netlist['terminal'].tolist()):
+            f.write(f"\t{name}\t{width:g}\t{height:g}{chr(9) + 'terminal' if terminal else ''}\n")
+
+    net_ptr = netlist['net_ptr'].tolist()
+    net_pins = netlist['net_pins'].tolist()
+    with open(f"{prefix}.nets", 'w', buffering=1 << 20) as f:
+        f.write(f"UCLA nets 1.0\n\nNumNets : {len(net_ptr) - 1}\nNumPins : {len(net_pins)}\n")
+        for n, net_name in enumerate(netlist['net_names']):
+            pins = net_pins[net_ptr[n]:net_ptr[n + 1]]
+            f.write(f"NetDegree : {len(pins)}\t{net_name}\n")
+            f.write(''.join(f"\t{names[pin]}\t{'O' if k == 0 else 'I'} : 0 0\n" for k, pin in enumerate(pins)))
+
+    with open(f"{prefix}.pl", 'w', buffering=1 << 20) as f:
+        f.write("UCLA pl 1.0\n\n")
+        for name, x, y, fixed in zip(names, netlist['x'].tolist(), netlist['y'].tolist(), netlist['fixed'].tolist()):
+            if x == x and y == y:
+                f.write(f"{name}\t{x:g}\t{y:g}\t: N{' /FIXED' if fixed else ''}\n")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Edge bundling for the floorplanning tool
+Merges connections whose endpoints fall in the same pair of groups (grid
+cells or clusters) into one bundle drawn as a single path, in one sort of
+the connection keys
+"""
+
+import numpy as np
+
+BUNDLE_STYLES = ('straight', 'manhattan')
+
+
+def grid_keys(points, cell_size):
+    """Grid cell id of every point (N x 2) on a grid of cell_size cells"""
+    cells = np.floor(np.asarray(points, dtype=float) / cell_size).astype(np.int64)
+    return (cells[:, 1] << 32) + cells[:, 0]
+
+
+class Bundles:
+    """Connections grouped by unordered endpoint group pair (and class)
+
+    members[i] is the bundle of connection i; start and end are the
+    weight-averaged port positions of each bundle, weight the summed
+    connection weights and count the number of connections.
+    """
+
+    def __init__(self, start, end, weight, count, members, classes):
+        self.start = start
+        self.end = end
+        self.weight = weight
+        self.count = count
+        self.members = members
+        self.classes = classes
+
+    def __len__(self):
+        return len(self.weight)
+
+    @classmethod
+    def build(cls, starts, ends, weights, start_keys, end_keys, classes=None):
+        """Bundle E connections given their port positions (E x 2) and endpoint group keys
+
+        Connections are merged regardless of direction; classes (optional,
+        small non-negative ints) keep connections of different classes apart.
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        weights = np.asarray(weights, dtype=float)
+        classes = np.zeros(len(weights), dtype=np.int64) if classes is None else np.asarray(classes, dtype=np.int64)
+        if not len(weights):
+            empty = np.zeros((0, 2))
+            return cls(empty, empty, np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                       np.zeros(0, dtype=np.int64))
+
+        # Orient every connection from its lower to its higher group so both directions merge
+        flip = start_keys > end_keys
+        low = np.where(flip, end_keys, start_keys)
+        high = np.where(flip, start_keys, end_keys)
+        a = np.where(flip[:, None], ends, starts)
+        b = np.where(flip[:, None], starts, ends)
+
+        # One sort groups equal (class, low, high) keys
+        order = np.lexsort((high, low, classes))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = ((classes[order][1:] != classes[order][:-1]) | (low[order][1:] != low[order][:-1]) |
+                     (high[order][1:] != high[order][:-1]))
+        members = np.empty(len(order), dtype=np.int64)
+        members[order] = np.cumsum(first) - 1
+        bundles = int(first.sum())
+
+        total = np.bincount(members, weights=weights, minlength=bundles)
+        share = weights / np.where(total > 0, total, 1)[members]
+        start = np.column_stack([np.bincount(members, weights=a[:, k] * share, minlength=bundles)
+                                 for k in range(2)])
+        end = np.column_stack([np.bincount(members, weights=b[:, k] * share, minlength=bundles)
+                               for k in range(2)])
+        count = np.bincount(members, minlength=bundles)
+        return cls(start, end, total, count, members, classes[order][first])
+
+    def paths(self, style='manhattan'):
+        """Bundle polylines: B x 2 x 2 straight segments or B x 4 x 2 horizontal-vertical-horizontal paths"""
+        if style not in BUNDLE_STYLES:
+            raise ValueError(f"Unknown bundle style: {style}")
+        if style == 'straight':
+            return np.stack([self.start, self.end], axis=1)
+        mid_x = (self.start[:, 0] + self.end[:, 0]) / 2
+        return np.stack([self.start,
+                         np.column_stack([mid_x, self.start[:, 1]]),
+                         np.column_stack([mid_x, self.end[:, 1]]),
+                         self.end], axis=1)
+
+    def widths(self, min_width=1.0, max_width=12.0):
+        """Line width of every bundle, growing with the square root of its weight"""
+        if not len(self):
+            return np.zeros(0)
+        scale = np.sqrt(self.weight / self.weight.max())
+        return min_width + (max_width - min_width) * scale
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Multilevel clustering for the floorplanning tool
+Coarsens the connectivity graph by heavy-edge matching and places it level by level
+"""
+
+import numpy as np
+
+from floorplan_shapes import HORIZONTAL, VERTICAL, combine_curves, prune_curve
+
+
+def merge_edges(num_nodes, src, dst, weight):
+    """Symmetrize edges, drop self-loops and sum duplicate weights
+
+    Returns (src, dst, weight) with src < dst for every edge.
+    """
+    a = np.minimum(src, dst)
+    b = np.maximum(src, dst)
+    keep = a != b
+    keys = a[keep].astype(np.int64) * num_nodes + b[keep]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    summed = np.bincount(inverse, weights=weight[keep], minlength=len(unique))
+    return unique // num_nodes, unique % num_nodes, summed
+
+
+def adjacency(num_nodes, src, dst, weight):
+    """CSR adjacency (ptr, neighbors, weights) of an undirected edge list"""
+    both_src = np.concatenate([src, dst])
+    both_dst = np.concatenate([dst, src])
+    both_w = np.concatenate([weight, weight])
+    order = np.argsort(both_src, kind='stable')
+    ptr = np.concatenate([[0], np.cumsum(np.bincount(both_src, minlength=num_nodes))])
+    return ptr, both_dst[order], both_w[order]
+
+
+def heavy_edge_matching(num_nodes, src, dst, weight, areas, max_area, rng):
+    """Match every node with its heaviest unmatched neighbor
+
+    Nodes are visited in random order; a pair is only merged if the merged
+    area stays below max_area. Returns the coarse cluster id of every node.
+    """
+    ptr, neighbors, weights = adjacency(num_nodes, src, dst, weight)
+    match = np.full(num_nodes, -1, dtype=np.int64)
+
+    for node in rng.permutation(num_nodes).tolist():
+        if match[node] >= 0:
+            continue
+        start, end = ptr[node], ptr[node + 1]
+        candidates = neighbors[start:end]
+        if len(candidates):
+            ok = (match[candidates] < 0) & (areas[candidates] + areas[node] <= max_area)
+            if ok.any():
+                # Heaviest edge, ties broken by the smaller merged cluster
+                rating = weights[start:end][ok] / np.maximum(areas[candidates[ok]] + areas[node], 1e-9)
+                mate = int(candidates[ok][np.argmax(rating)])
+                match[node] = mate
+                match[mate] = node
+                continue
+        match[node] = node
+
+    # Pair up leftover singletons (typically unconnected macros) by size
+    singles = np.flatnonzero(match == np.arange(num_nodes))
+    singles = singles[np.argsort(areas[singles], kind='stable')]
+    pairs = len(singles) // 2
+    first, second = singles[0:2 * pairs:2], singles[1:2 * pairs:2]
+    fits = areas[first] + areas[second] <= max_area
+    match[first[fits]] = second[fits]
+    match[second[fits]] = first[fits]
+
+    # Number clusters by their smaller member
+    leader = np.minimum(np.arange(num_nodes), match)
+    _, cluster = np.unique(leader, return_inverse=True)
+    return cluster
+
+
+def build_hierarchy(areas, src, dst, weight, target=64, max_levels=20, seed=0):
+    """Coarsen the graph until it has at most target nodes
+
+    Returns a list of levels; level 0 is the original graph. Each level is a
+    dict with 'areas', 'src', 'dst', 'weight' and, except for the top level,
+    'parent' mapping its nodes to the clusters of the next level.
+    """
+    rng = np.random.default_rng(seed)
+    areas = np.asarray(areas, dtype=float)
+    src, dst, weight = merge_edges(len(areas), np.asarray(src, dtype=np.int64),
+                                   np.asarray(dst, dtype=np.int64), np.asarray(weight, dtype=float))
+    levels = [{'areas': areas, 'src': src, 'dst': dst, 'weight': weight}]
+
+    while len(levels[-1]['areas']) > target and len(levels) < max_levels:
+        level = levels[-1]
+        n = len(level['areas'])
+        # Keep clusters balanced: no cluster above twice the target average area
+        max_area = 2.0 * level['areas'].sum() / max(target, 1)
+        cluster = heavy_edge_matching(n, level['src'], level['dst'], level['weight'],
+                                      level['areas'], max_area, rng)
+        num_clusters = int(cluster.max()) + 1
+        if num_clusters >= n * 0.95:
+            # Matching has stalled (sparse graph or area limit)
+            break
+
+        level['parent'] = cluster
+        coarse_src, coarse_dst, coarse_weight = merge_edges(num_clusters, cluster[level['src']],
+                                                            cluster[level['dst']], level['weight'])
+        levels.append({
+            'areas': np.bincount(cluster, weights=level['areas'], minlength=num_clusters),
+            'src': coarse_src,
+            'dst': coarse_dst,
+            'weight': coarse_weight
+        })
+    return levels
+
+
+def block_clusters(levels):
+    """Cluster id of every original block at every level (levels x blocks)"""
+    mapping = [np.arange(len(levels[0]['areas']))]
+    for level in levels[:-1]:
+        mapping.append(level['parent'][mapping[-1]])
+    return np.array(mapping)
+
+
+def footprint(areas, whitespace, sizes=None):
+    """(width, height) reserved for each block: its shape (default a square of its area) grown by whitespace"""
+    if sizes is None:
+        side = np.sqrt(areas)
+        sizes = np.column_stack([side, side])
+    # Never less than the block itself, or neighbouring footprints would not keep blocks apart
+    return np.asarray(sizes, dtype=float).reshape(-1, 2) * np.sqrt(max(whitespace, 1.0))
+
+
+def initial_layout(areas, src, dst, weight, sizes):
+    """Shelf-pack the coarsest clusters, ordered by a connectivity walk"""
+    n = len(areas)
+    ptr, neighbors, weights = adjacency(n, src, dst, weight)
+    strength = np.bincount(np.concatenate([src, dst]), weights=np.concatenate([weight, weight]), minlength=n)
+
+    if n > 2000:
+        # Too many clusters for the quadratic walk: strongest first
+        order = np.argsort(-strength, kind='stable').tolist()
+    else:
+        order = connectivity_order(n, ptr, neighbors, weights, strength)
+    return shelf_pack(order, sizes)
+
+
+def connectivity_order(n, ptr, neighbors, weights, strength):
+    """Greedy walk: always continue with the unvisited node most tied to the visited set"""
+    order = []
+    visited = np.zeros(n, dtype=bool)
+    pull = np.zeros(n)
+    current = int(np.argmax(strength)) if n else 0
+    for _ in range(n):
+        order.append(current)
+        visited[current] = True
+        start, end = ptr[current], ptr[current + 1]
+        pull[neighbors[start:end]] += weights[start:end]
+        candidates = np.where(visited, -np.inf, pull + 1e-9 * strength)
+        current = int(np.argmax(candidates))
+    return order
+
+
+def shelf_pack(order, sizes):
+    """Pack rectangles into rows of a roughly square outline
+
+    Returns the lower-left corner and the slot (x0, y0, x1, y1) of every
+    rectangle and the (width, height) of the packing, relative to its
+    lower-left corner. A slot spans the rectangle's row and reaches the next
+    rectangle of the row (the outline for the last one), so slots never
+    overlap and a rectangle may move anywhere inside its own.
+    """
+    n = len(sizes)
+    corners = np.zeros((n, 2))
+    slots = np.zeros((n, 4))
+    if not n:
+        return corners, slots, np.zeros(2)
+    row_width = max(np.sqrt((sizes[:, 0] * sizes[:, 1]).sum()), sizes[:, 0].max())
+
+    widths, heights = sizes[:, 0].tolist(), sizes[:, 1].tolist()
+    rows = []   # (members, bottom, height)
+    row, x, y, row_height = [], 0.0, 0.0, 0.0
+    for node in order:
+        if row and x + widths[node] > row_width:
+            rows.append((row, y, row_height))
+            row, x, y, row_height = [], 0.0, y + row_height, 0.0
+        corners[node] = (x, y)
+        x += widths[node]
+        row_height = max(row_height, heights[node])
+        row.append(node)
+    rows.append((row, y, row_height))
+
+    width = max(corners[members[-1], 0] + widths[members[-1]] for members, _, _ in rows)
+    for members, bottom, height in rows:
+        ends = corners[members[1:], 0].tolist() + [width]
+        for node, end in zip(members, ends):
+            slots[node] = (corners[node, 0], bottom, end, bottom + height)
+    return corners, slots, np.array([width, y + row_height])
+
+
+def cluster_curves(parent, curves, num_parents, limit=12):
+    """Shape curves of the clusters of one level from their children's curves
+
+    Heavy-edge matching gives every cluster one or two children; two are
+    combined side by side and stacked (Stockmeyer) and the union is pruned.
+    Returns (curves, choices) where choices[c] = (children, vertical,
+    index_a, index_b) tells how each point of cluster c is realized
+    (vertical is None for a single child, which keeps its own curve).
+    """
+    order = np.argsort(parent, kind='stable')
+    bounds = np.searchsorted(parent[order], np.arange(num_parents + 1))
+    parent_curves = []
+    choices = []
+    for cluster in range(num_parents):
+        children = order[bounds[cluster]:bounds[cluster + 1]].tolist()
+        if len(children) == 1:
+            parent_curves.append(curves[children[0]])
+            choices.append((children, None, None, None))
+            continue
+        a, b = children
+        side = combine_curves(curves[a], curves[b], VERTICAL, limit)
+        stack = combine_curves(curves[a], curves[b], HORIZONTAL, limit)
+        index, widths, heights = prune_curve(np.concatenate([side[0], stack[0]]),
+                                             np.concatenate([side[1], stack[1]]), limit)
+        parent_curves.append((widths, heights))
+        choices.append((children, index < len(side[0]), np.concatenate([side[2], stack[2]])[index],
+                        np.concatenate([side[3], stack[3]])[index]))
+    return parent_curves, choices
+
+
+def block_cluster_curves(parent, sizes, num_parents):
+    """cluster_curves for children with one (width, height) each (the blocks), in closed form
+
+    Stacking two blocks is never wider than placing them side by side, so
+    the side-by-side point is only kept when it is lower.
+    """
+    order = np.argsort(parent, kind='stable')
+    bounds = np.searchsorted(parent[order], np.arange(num_parents + 1))
+    first = order[bounds[:-1]]
+    second = order[np.minimum(bounds[:-1] + 1, len(order) - 1)]
+    pairs = np.diff(bounds) == 2
+    (wa, ha), (wb, hb) = sizes[first].T, sizes[second].T
+    stack = np.column_stack([np.maximum(wa, wb), ha + hb])
+    side = np.column_stack([wa + wb, np.maximum(ha, hb)])
+    both = side[:, 1] < stack[:, 1]
+
+    single = (np.zeros(1, dtype=np.int64),) * 2
+    parent_curves = []
+    choices = []
+    for cluster, (a, b, pair, keep_side) in enumerate(zip(first.tolist(), second.tolist(),
+                                                          pairs.tolist(), both.tolist())):
+        if not pair:
+            parent_curves.append((sizes[a, :1], sizes[a, 1:]))
+            choices.append(([a], None, None, None))
+        elif keep_side:
+            parent_curves.append((np.array([stack[cluster, 0], side[cluster, 0]]),
+                                  np.array([stack[cluster, 1], side[cluster, 1]])))
+            choices.append(([a, b], np.array([False, True]), np.zeros(2, dtype=np.int64),
+                            np.zeros(2, dtype=np.int64)))
+        else:
+            parent_curves.append((stack[cluster, :1], stack[cluster, 1:]))
+            choices.append(([a, b], np.array([False]), *single))
+    return parent_curves, choices
+
+
+def place_children(choices, points, corners, parent_curves, curves, num_children):
+    """Corners, curve points and slots of the children given their clusters' points and corners"""
+    child_points = np.zeros(num_children, dtype=np.int64)
+    child_corners = np.zeros((num_children, 2))
+    slots = np.zeros((num_children, 4))
+    for cluster, (children, vertical, index_a, index_b) in enumerate(choices):
+        point = points[cluster]
+        x, y = corners[cluster]
+        width, height = parent_curves[cluster][0][point], parent_curves[cluster][1][point]
+        if vertical is None:
+            child_points[children[0]] = point
+            child_corners[children[0]] = (x, y)
+            slots[children[0]] = (x, y, x + width, y + height)
+            continue
+        a, b = children
+        child_points[a], child_points[b] = index_a[point], index_b[point]
+        child_corners[a] = (x, y)
+        if vertical[point]:
+            split = x + curves[a][0][index_a[point]]
+            child_corners[b] = (split, y)
+            slots[a] = (x, y, split, y + height)
+            slots[b] = (split, y, x + width, y + height)
+        else:
+            split = y + curves[a][1][index_a[point]]
+            child_corners[b] = (x, split)
+            slots[a] = (x, y, x + width, split)
+            slots[b] = (x, split, x + width, y + height)
+    return child_corners, child_points, slots
+
+
+def curve_sizes(curves, points):
+    """(width, height) of the chosen point of every curve"""
+    return np.array([(widths[point], heights[point]) for (widths, heights), point in zip(curves, points)],
+                    dtype=float).reshape(-1, 2)
+
+
+def refine(centers, boxes, src, dst, weight, iterations=10, step=0.5):
+    """Pull nodes toward their weighted neighbor centroid, clipped to their boxes"""
+    if not len(src):
+        return centers
+    n = len(centers)
+    strength = np.bincount(src, weights=weight, minlength=n) + np.bincount(dst, weights=weight, minlength=n)
+    for _ in range(iterations):
+        pull = np.zeros((n, 2))
+        for axis in range(2):
+            pull[:, axis] = (np.bincount(src, weights=weight * centers[dst, axis], minlength=n) +
+                             np.bincount(dst, weights=weight * centers[src, axis], minlength=n))
+        connected = strength > 0
+        target = centers.copy()
+        target[connected] = pull[connected] / strength[connected, None]
+        centers = centers + step * (target - centers)
+        centers[:, 0] = np.clip(centers[:, 0], boxes[:, 0], boxes[:, 2])
+        centers[:, 1] = np.clip(centers[:, 1], boxes[:, 1], boxes[:, 3])
+    return centers
+
+
+def compact(corners, sizes, axis):
+    """Slide rectangles toward lower coordinates along axis as far as the others allow
+
+    Rectangles are taken in order of their lower edge; a skyline over the
+    other axis (split at the rectangles' edges) holds the highest far edge
+    reached in each band, which is where the next rectangle in the band
+    starts. The result never overlaps and keeps the order along axis.
+    """
+    other = 1 - axis
+    edges = np.unique(np.concatenate([corners[:, other], corners[:, other] + sizes[:, other]]))
+    low = np.searchsorted(edges, corners[:, other]).tolist()
+    high = np.searchsorted(edges, corners[:, other] + sizes[:, other]).tolist()
+    lengths = sizes[:, axis].tolist()
+    origin = corners[:, axis].min() if len(corners) else 0.0
+    skyline = np.full(len(edges), origin)
+    result = corners.copy()
+    for i in np.argsort(corners[:, axis], kind='stable').tolist():
+        start = skyline[low[i]:high[i]].max() if high[i] > low[i] else origin
+        result[i, axis] = start
+        skyline[low[i]:high[i]] = start + lengths[i]
+    return result
+
+
+def slot_boxes(slots, sizes):
+    """Range of centers that keeps each rectangle inside its slot (x_min, y_min, x_max, y_max)"""
+    half = sizes / 2
+    return np.column_stack([slots[:, 0] + half[:, 0], slots[:, 1] + half[:, 1],
+                            slots[:, 2] - half[:, 0], slots[:, 3] - half[:, 1]])
+
+
+def multilevel_place(levels, origin=(100.0, 100.0), whitespace=1.5, iterations=10, sizes=None):
+    """Place clusters from the coarsest level down to the original blocks
+
+    sizes are the (width, height) of the blocks (default squares of their
+    areas). Every cluster gets a shape curve bottom-up from its children, so
+    placing top-down nests each child inside its parent's footprint;
+    refinement only moves a node inside its own slot, and the blocks never
+    overlap. Returns an (N, 2) array of block centers.
+    """
+    # Bottom-up: shape curves of the footprints at every level
+    blocks = footprint(levels[0]['areas'], 1.0, sizes)
+    halos = footprint(levels[0]['areas'], whitespace, sizes)
+    curves = [[(halos[i, :1], halos[i, 1:]) for i in range(len(halos))]]
+    choices = []
+    for depth in range(len(levels) - 1):
+        num_parents = len(levels[depth + 1]['areas'])
+        if depth == 0:
+            parent_curves, parent_choices = block_cluster_curves(levels[0]['parent'], halos, num_parents)
+        else:
+            parent_curves, parent_choices = cluster_curves(levels[depth]['parent'], curves[depth], num_parents)
+        curves.append(parent_curves)
+        choices.append(parent_choices)
+
+    # The coarsest clusters take their most compact, squarest point and are shelf-packed
+    points = np.array([int(np.argmin(widths * heights * np.sqrt(np.maximum(widths / heights, heights / widths))))
+                       for widths, heights in curves[-1]], dtype=np.int64)
+    top = levels[-1]
+    corners, _, _ = initial_layout(top['areas'], top['src'], top['dst'], top['weight'],
+                                   curve_sizes(curves[-1], points))
+    corners = corners + origin
+
+    # Top-down: children follow their (refined) cluster
+    for depth in range(len(levels) - 2, -1, -1):
+        level = levels[depth]
+        corners, points, slots = place_children(choices[depth], points, corners, curves[depth + 1],
+                                                curves[depth], len(level['areas']))
+        sizes = curve_sizes(curves[depth], points)
+
+        # Blocks may also use the whitespace around them; clusters keep their footprint
+        centers = corners + sizes / 2
+        centers = refine(centers, slot_boxes(slots, blocks if depth == 0 else sizes),
+                         level['src'], level['dst'], level['weight'], iterations)
+        corners = centers - sizes / 2
+
+    # Legalize: close the gaps the packings leave, keeping the whitespace around each block
+    for axis in (0, 1, 0, 1):
+        corners = compact(corners, halos, axis)
+    return corners + halos / 2
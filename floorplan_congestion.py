@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Routing congestion map for the floorplanning tool
+Rasterizes route segments onto a grid of bins, weighted by connection count
+"""
+
+import numpy as np
+
+from floorplan_routes import route_segments
+
+
+class CongestionMap:
+    """Grid of routing demand that is updated incrementally per connection"""
+
+    def __init__(self, bin_size=50.0):
+        self.bin_size = float(bin_size)
+        self.origin = (0.0, 0.0)
+        self.shape = (0, 0)  # (nx, ny)
+        self.grid = np.zeros((0, 0))
+
+        # Cached contribution of every connection: key -> (points, cells, weight)
+        self.contributions = {}
+
+        # Per-bin history since the last reset
+        self.peak = np.zeros((0, 0))
+        self.total = np.zeros((0, 0))
+        self.samples = 0
+
+    def reset(self, bounds, bin_size=None):
+        """Reallocate the grid to cover bounds = (x_min, y_min, x_max, y_max)"""
+        if bin_size is not None:
+            self.bin_size = float(bin_size)
+        x_min, y_min, x_max, y_max = bounds
+        nx = max(1, int(np.ceil((x_max - x_min) / self.bin_size)))
+        ny = max(1, int(np.ceil((y_max - y_min) / self.bin_size)))
+
+        self.origin = (float(x_min), float(y_min))
+        self.shape = (nx, ny)
+        self.grid = np.zeros((nx, ny))
+        self.peak = np.zeros((nx, ny))
+        self.total = np.zeros((nx, ny))
+        self.samples = 0
+        self.contributions = {}
+
+    def covers(self, bounds):
+        """Check whether the current grid covers the given bounds"""
+        if not self.grid.size:
+            return False
+        x_min, y_min, x_max, y_max = bounds
+        ox, oy = self.origin
+        nx, ny = self.shape
+        return (x_min >= ox and y_min >= oy and
+                x_max <= ox + nx * self.bin_size and y_max <= oy + ny * self.bin_size)
+
+    @property
+    def extent(self):
+        """Grid extent as (left, right, bottom, top) for imshow"""
+        ox, oy = self.origin
+        nx, ny = self.shape
+        return (ox, ox + nx * self.bin_size, oy, oy + ny * self.bin_size)
+
+    def remap(self, key_map):
+        """Renumber the contributions; those of keys missing from key_map are dropped on the next update"""
+        self.contributions = {key_map.get(key, ('removed', key)): entry
+                              for key, entry in self.contributions.items()}
+
+    def rasterize(self, segments, owners):
+        """Map segments to bin cells, returning unique (owner, flat cell) pairs"""
+        if len(segments) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        nx, ny = self.shape
+        ox, oy = self.origin
+
+        # Segment endpoints in fractional bin coordinates
+        bx0 = (segments[:, 0] - ox) / self.bin_size
+        by0 = (segments[:, 1] - oy) / self.bin_size
+        bx1 = (segments[:, 2] - ox) / self.bin_size
+        by1 = (segments[:, 3] - oy) / self.bin_size
+
+        # DDA sample count: one sample per bin crossed along the major axis
+        steps = np.maximum(np.abs(np.floor(bx1) - np.floor(bx0)),
+                           np.abs(np.floor(by1) - np.floor(by0))).astype(np.int64)
+        counts = steps + 1
+
+        seg_index = np.repeat(np.arange(len(segments)), counts)
+        starts = np.cumsum(counts) - counts
+        k = np.arange(counts.sum()) - np.repeat(starts, counts)
+        t = k / np.maximum(steps, 1)[seg_index]
+
+        cx = np.floor(bx0[seg_index] + t * (bx1 - bx0)[seg_index]).astype(np.int64)
+        cy = np.floor(by0[seg_index] + t * (by1 - by0)[seg_index]).astype(np.int64)
+        np.clip(cx, 0, nx - 1, out=cx)
+        np.clip(cy, 0, ny - 1, out=cy)
+
+        # Each route counts once per bin, even where its segments meet
+        keys = owners[seg_index] * (nx * ny) + cx * ny + cy
+        keys = np.unique(keys)
+        return keys // (nx * ny), keys % (nx * ny)
+
+    def update(self, routes, weights):
+        """Re-rasterize only the routes whose points changed since the last update
+
+        routes maps a connection key to its route points, weights maps the same
+        key to its connection count. Keys missing from routes are dropped.
+        Returns the number of connections that were re-rasterized.
+        """
+        if not self.grid.size:
+            return 0
+
+        flat = self.grid.reshape(-1)
+        changed = []
+
+        # Remove stale contributions (changed or deleted routes)
+        for key in list(self.contributions):
+            points, cells, weight = self.contributions[key]
+            if key not in routes or routes[key] != points or weights[key] != weight:
+                flat -= np.bincount(cells, minlength=flat.size) * weight
+                del self.contributions[key]
+
+        for key, points in routes.items():
+            if key not in self.contributions:
+                changed.append(key)
+
+        if changed:
+            # Rasterize all changed routes in one vectorized pass
+            segments = []
+            owners = []
+            for n, key in enumerate(changed):
+                segs = route_segments(routes[key])
+                segments.append(segs)
+                owners.append(np.full(len(segs), n, dtype=np.int64))
+            owner_index, cells = self.rasterize(np.vstack(segments), np.concatenate(owners))
+            changed_weights = np.array([float(weights[key]) for key in changed])
+            flat += np.bincount(cells, weights=changed_weights[owner_index], minlength=flat.size)
+
+            # Split the cells back out per connection for later removal
+            bounds = np.searchsorted(owner_index, np.arange(len(changed) + 1))
+            for n, key in enumerate(changed):
+                self.contributions[key] = (list(routes[key]),
+                                           cells[bounds[n]:bounds[n + 1]],
+                                           float(weights[key]))
+
+        # Guard against float drift from repeated add/subtract
+        np.maximum(self.grid, 0, out=self.grid)
+
+        np.maximum(self.peak, self.grid, out=self.peak)
+        self.total += self.grid
+        self.samples += 1
+        return len(changed)
+
+    def stats(self):
+        """Return overall peak and mean congestion of the current grid"""
+        if not self.grid.size:
+            return {'peak': 0.0, 'mean': 0.0, 'bins': 0}
+        return {
+            'peak': float(self.grid.max()),
+            'mean': float(self.grid.mean()),
+            'bins': int(self.grid.size)
+        }
+
+    def export_csv(self, filename):
+        """Write current, peak and mean congestion for every bin to a CSV file"""
+        nx, ny = self.shape
+        ox, oy = self.origin
+        ix, iy = np.meshgrid(np.arange(nx), np.arange(ny), indexing='ij')
+        mean = self.total / self.samples if self.samples else self.grid
+
+        table = np.column_stack([
+            (ox + ix * self.bin_size).ravel(),
+            (oy + iy * self.bin_size).ravel(),
+            (ox + (ix + 1) * self.bin_size).ravel(),
+            (oy + (iy + 1) * self.bin_size).ravel(),
+            self.grid.ravel(),
+            self.peak.ravel(),
+            mean.ravel()
+        ])
+        stats = self.stats()
+        header = (f"peak={stats['peak']:.3f} mean={stats['mean']:.3f} samples={self.samples}\n"
+                  "x_min,y_min,x_max,y_max,congestion,peak,mean")
+        np.savetxt(filename, table, delimiter=',', header=header, fmt='%.6g')
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Placement constraints for the floorplanning tool
+Fixed macros, die-boundary containment, keep-out regions and alignment and
+abutment groups. Drag checks only look at the constraints touching the
+moved block (keep-outs through a uniform grid index); the full design is
+checked in one sorted sweep.
+"""
+
+import json
+
+import numpy as np
+
+# Block coordinate compared by each alignment edge
+ALIGN_EDGES = ('left', 'right', 'bottom', 'top', 'center_x', 'center_y')
+ABUT_AXES = ('x', 'y')
+
+
+def edge_value(rect, edge):
+    """Coordinate of an (x, y, width, height) rectangle along one alignment edge"""
+    x, y, w, h = rect
+    return {'left': x, 'right': x + w, 'bottom': y, 'top': y + h,
+            'center_x': x + w / 2, 'center_y': y + h / 2}[edge]
+
+
+def align_to(rect, edge, value):
+    """Rectangle moved (not resized) so its edge lies at value"""
+    x, y, w, h = rect
+    if edge in ('left', 'right', 'center_x'):
+        return (x + value - edge_value(rect, edge), y, w, h)
+    return (x, y + value - edge_value(rect, edge), w, h)
+
+
+def rect_pairs(a, b):
+    """(i, j) pairs where rectangle a[i] overlaps b[j] (both N x 4 x_min, y_min, x_max, y_max)
+
+    Both sets are merged and sorted by x_min; pass d compares each rectangle
+    with its d-th successor and keeps only those still overlapping in x, so
+    after the O(n log n) sort the work is proportional to the x-overlapping
+    pairs. Touching edges do not count as overlap.
+    """
+    a = np.asarray(a, dtype=float).reshape(-1, 4)
+    b = np.asarray(b, dtype=float).reshape(-1, 4)
+    if not len(a) or not len(b):
+        return np.zeros((0, 2), dtype=np.int64)
+    rects = np.vstack([a, b])
+    owner = np.repeat([0, 1], [len(a), len(b)])
+    index = np.concatenate([np.arange(len(a)), np.arange(len(b))])
+    order = np.argsort(rects[:, 0], kind='stable')
+    x0, y0, x1, y1 = rects[order].T
+    owner, index = owner[order], index[order]
+
+    m = len(rects)
+    found = []
+    active = np.arange(m)
+    for d in range(1, m):
+        active = active[active + d < m]
+        partner = active + d
+        keep = x0[partner] < x1[active]
+        active, partner = active[keep], partner[keep]
+        if not len(active):
+            break
+        hit = ((owner[active] != owner[partner]) &
+               (np.maximum(y0[active], y0[partner]) < np.minimum(y1[active], y1[partner])))
+        first, second = active[hit], partner[hit]
+        swap = owner[first] == 1
+        found.append(np.column_stack([index[np.where(swap, second, first)],
+                                      index[np.where(swap, first, second)]]))
+    if not found:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.concatenate(found)
+
+
+class RectGrid:
+    """Uniform grid index of rectangles (cell -> ids) for overlap queries"""
+
+    def __init__(self, cell_size=500.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.rects = {}
+
+    def __len__(self):
+        return len(self.rects)
+
+    def cell_range(self, rect):
+        x0, y0, x1, y1 = rect
+        c = self.cell_size
+        return range(int(x0 // c), int(x1 // c) + 1), range(int(y0 // c), int(y1 // c) + 1)
+
+    def insert(self, key, rect):
+        """Add (x_min, y_min, x_max, y_max) under key"""
+        self.remove(key)
+        self.rects[key] = tuple(map(float, rect))
+        xs, ys = self.cell_range(rect)
+        for cx in xs:
+            for cy in ys:
+                self.cells.setdefault((cx, cy), set()).add(key)
+
+    def remove(self, key):
+        rect = self.rects.pop(key, None)
+        if rect is None:
+            return
+        xs, ys = self.cell_range(rect)
+        for cx in xs:
+            for cy in ys:
+                bucket = self.cells[(cx, cy)]
+                bucket.discard(key)
+                if not bucket:
+                    del self.cells[(cx, cy)]
+
+    def query(self, rect):
+        """Keys of the stored rectangles overlapping rect (touching edges excluded)"""
+        x0, y0, x1, y1 = rect
+        xs, ys = self.cell_range(rect)
+        candidates = set()
+        for cx in xs:
+            for cy in ys:
+                candidates |= self.cells.get((cx, cy), set())
+        return [key for key in candidates
+                if self.rects[key][0] < x1 and x0 < self.rects[key][2] and
+                self.rects[key][1] < y1 and y0 < self.rects[key][3]]
+
+
+class ConstraintSet:
+    """Placement constraints of one design, indexed by block
+
+    die is (x_min, y_min, x_max, y_max) or None; fixed maps block id to the
+    (x, y, width, height) it is pinned at; keep-outs are rectangles no block
+    may overlap; an alignment group shares one edge coordinate; an abutment
+    group is an ordered row (axis 'x') or column (axis 'y') of blocks each
+    starting where the previous one ends.
+    """
+
+    def __init__(self, cell_size=500.0, tolerance=1e-6):
+        self.tolerance = tolerance
+        self.die = None
+        self.fixed = {}
+        self.keepouts = RectGrid(cell_size)
+        self.next_keepout = 0
+        self.groups = []                # {'kind': 'align'|'abut', 'blocks': [...], 'edge'|'axis': ...}
+        self.block_groups = {}          # Block id -> indexes into groups
+
+    def __len__(self):
+        return (self.die is not None) + len(self.fixed) + len(self.keepouts) + len(self.groups)
+
+    def set_die(self, rect):
+        self.die = None if rect is None else tuple(map(float, rect))
+
+    def fix(self, block):
+        self.fixed[block['id']] = (block['x'], block['y'], block['width'], block['height'])
+
+    def unfix(self, block_id):
+        self.fixed.pop(block_id, None)
+
+    def add_keepout(self, rect):
+        """Add an (x_min, y_min, x_max, y_max) keep-out region; returns its id"""
+        key = self.next_keepout
+        self.next_keepout += 1
+        self.keepouts.insert(key, rect)
+        return key
+
+    def add_group(self, kind, blocks, edge=None, axis=None):
+        if kind == 'align' and edge not in ALIGN_EDGES:
+            raise ValueError(f"Unknown alignment edge: {edge}")
+        if kind == 'abut' and axis not in ABUT_AXES:
+            raise ValueError(f"Unknown abutment axis: {axis}")
+        if kind not in ('align', 'abut'):
+            raise ValueError(f"Unknown group kind: {kind}")
+        if len(blocks) < 2:
+            raise ValueError(f"A {kind} group needs at least two blocks")
+        group = {'kind': kind, 'blocks': [int(b) for b in blocks]}
+        group['edge' if kind == 'align' else 'axis'] = edge if kind == 'align' else axis
+        self.groups.append(group)
+        for block_id in group['blocks']:
+            self.block_groups.setdefault(block_id, []).append(len(self.groups) - 1)
+
+    def remap(self, id_map):
+        """Copy with block ids renumbered by id_map (old id -> new id); unmapped blocks are dropped"""
+        constraints = ConstraintSet(self.keepouts.cell_size, self.tolerance)
+        constraints.die = self.die
+        constraints.fixed = {id_map[block_id]: rect for block_id, rect in self.fixed.items() if block_id in id_map}
+        constraints.keepouts = self.keepouts
+        constraints.next_keepout = self.next_keepout
+        for group in self.groups:
+            blocks = [id_map[block_id] for block_id in group['blocks'] if block_id in id_map]
+            if len(blocks) >= 2:
+                constraints.add_group(group['kind'], blocks, edge=group.get('edge'), axis=group.get('axis'))
+        return constraints
+
+    @classmethod
+    def from_dict(cls, data, names, cell_size=500.0, tolerance=1e-6, blocks=None):
+        """Constraints from {'die', 'fixed', 'keepouts', 'align', 'abut'}; blocks are ids or names
+
+        Fixed blocks are pinned at their current geometry in blocks, or at
+        'rect' when given as {'block', 'rect'}.
+        """
+        constraints = cls(cell_size, tolerance)
+        index = {name: i for i, name in enumerate(names)}
+
+        def block_id(ref):
+            if isinstance(ref, str) and ref in index:
+                return index[ref]
+            if isinstance(ref, int) and 0 <= ref < len(names):
+                return ref
+            raise ValueError(f"Unknown block: {ref}")
+
+        if data.get('die') is not None:
+            constraints.set_die(data['die'])
+        for ref in data.get('fixed', []):
+            if isinstance(ref, dict):
+                constraints.fixed[block_id(ref['block'])] = tuple(map(float, ref['rect']))
+            else:
+                constraints.fix(blocks[block_id(ref)])
+        for rect in data.get('keepouts', []):
+            constraints.add_keepout(rect)
+        for group in data.get('align', []):
+            constraints.add_group('align', [block_id(b) for b in group['blocks']], edge=group.get('edge', 'bottom'))
+        for group in data.get('abut', []):
+            constraints.add_group('abut', [block_id(b) for b in group['blocks']], axis=group.get('axis', 'x'))
+        return constraints
+
+    def to_dict(self):
+        """JSON-compatible form read back by from_dict (blocks as ids, fixed blocks with their rects)"""
+        return {
+            'die': list(self.die) if self.die is not None else None,
+            'fixed': [{'block': block_id, 'rect': list(rect)} for block_id, rect in sorted(self.fixed.items())],
+            'keepouts': [list(self.keepouts.rects[key]) for key in sorted(self.keepouts.rects)],
+            'align': [{'blocks': group['blocks'], 'edge': group['edge']}
+                      for group in self.groups if group['kind'] == 'align'],
+            'abut': [{'blocks': group['blocks'], 'axis': group['axis']}
+                     for group in self.groups if group['kind'] == 'abut']
+        }
+
+    @classmethod
+    def load(cls, filename, names, blocks, cell_size=500.0, tolerance=1e-6):
+        with open(filename) as f:
+            return cls.from_dict(json.load(f), names, cell_size, tolerance, blocks)
+
+    # Per-block checks (drag events)
+
+    def group_target(self, group, block_id, rect, geometry):
+        """Rectangle satisfying one group given the other members' geometry (block id -> rect)"""
+        members = group['blocks']
+        if group['kind'] == 'align':
+            other = next(b for b in members if b != block_id)
+            return align_to(rect, group['edge'], edge_value(geometry(other), group['edge']))
+        axis = 0 if group['axis'] == 'x' else 1
+        position = members.index(block_id)
+        x, y, w, h = rect
+        size = rect[axis + 2]
+        if position > 0:
+            prev = geometry(members[position - 1])
+            start = prev[axis] + prev[axis + 2]
+            if position < len(members) - 1:
+                # A middle member also has to end where the next one starts
+                size = geometry(members[position + 1])[axis] - start
+        else:
+            start = geometry(members[1])[axis] - size
+        return (start, y, size, h) if axis == 0 else (x, start, w, size)
+
+    def block_violations(self, block_id, rect, geometry):
+        """Violations of the constraints touching one block placed at rect
+
+        geometry(block id) gives the current (x, y, width, height) of the
+        other blocks. Returns a list of (kind, detail) tuples.
+        """
+        tol = self.tolerance
+        x, y, w, h = rect
+        found = []
+        pinned = self.fixed.get(block_id)
+        if pinned is not None and max(abs(a - b) for a, b in zip(pinned, rect)) > tol:
+            found.append(('fixed', block_id))
+        if self.die is not None:
+            dx0, dy0, dx1, dy1 = self.die
+            if x < dx0 - tol or y < dy0 - tol or x + w > dx1 + tol or y + h > dy1 + tol:
+                found.append(('die', block_id))
+        for key in self.keepouts.query((x + tol, y + tol, x + w - tol, y + h - tol)):
+            found.append(('keepout', key))
+        for group_index in self.block_groups.get(block_id, []):
+            target = self.group_target(self.groups[group_index], block_id, rect, geometry)
+            if max(abs(a - b) for a, b in zip(target, rect)) > tol:
+                found.append((self.groups[group_index]['kind'], group_index))
+        return found
+
+    def resolve(self, block_id, rect, geometry, snap=True):
+        """Nearest valid placement of a block moved to rect, or None if the move is rejected
+
+        With snap the block is aligned to its groups, pushed out of keep-outs
+        and clamped into the die (in that order); it is rejected if any
+        constraint still fails. Without snap any violation rejects the move.
+        """
+        rect = tuple(map(float, rect))
+        if not snap or block_id in self.fixed:
+            return None if self.block_violations(block_id, rect, geometry) else rect
+
+        for group_index in self.block_groups.get(block_id, []):
+            rect = self.group_target(self.groups[group_index], block_id, rect, geometry)
+        if rect[2] <= 0 or rect[3] <= 0:
+            return None
+        rect = self.push_out(rect)
+        if self.die is not None:
+            x, y, w, h = rect
+            dx0, dy0, dx1, dy1 = self.die
+            rect = (min(max(x, dx0), dx1 - w), min(max(y, dy0), dy1 - h), w, h)
+        return None if self.block_violations(block_id, rect, geometry) else rect
+
+    def push_out(self, rect):
+        """Move rect the shortest way out of the keep-outs it overlaps"""
+        tol = self.tolerance
+        for _ in range(4):
+            x, y, w, h = rect
+            hits = self.keepouts.query((x + tol, y + tol, x + w - tol, y + h - tol))
+            if not hits:
+                break
+            kx0, ky0, kx1, ky1 = self.keepouts.rects[hits[0]]
+            moves = [(kx0 - (x + w), 0.0), (kx1 - x, 0.0), (0.0, ky0 - (y + h)), (0.0, ky1 - y)]
+            dx, dy = min(moves, key=lambda move: abs(move[0]) + abs(move[1]))
+            rect = (x + dx, y + dy, w, h)
+        return rect
+
+    # Whole-design check
+
+    def violations(self, geometry):
+        """All violations of an N x 4 (x, y, width, height) design in one pass
+
+        Returns a list of (kind, blocks, detail) tuples: 'fixed', 'die' and
+        'keepout' (detail is the keep-out id) per block, 'align' and 'abut'
+        per group (detail is the group index, blocks the offending members).
+        """
+        geometry = np.asarray(geometry, dtype=float).reshape(-1, 4)
+        tol = self.tolerance
+        x, y, w, h = geometry.T
+        found = []
+
+        for block_id, pinned in self.fixed.items():
+            if np.abs(geometry[block_id] - pinned).max() > tol:
+                found.append(('fixed', [block_id], None))
+
+        if self.die is not None:
+            dx0, dy0, dx1, dy1 = self.die
+            outside = np.flatnonzero((x < dx0 - tol) | (y < dy0 - tol) | (x + w > dx1 + tol) | (y + h > dy1 + tol))
+            found.extend(('die', [int(i)], None) for i in outside)
+
+        if len(self.keepouts):
+            keys = list(self.keepouts.rects)
+            rects = np.array([self.keepouts.rects[key] for key in keys])
+            shrunk = np.column_stack([x + tol, y + tol, x + w - tol, y + h - tol])
+            for i, j in rect_pairs(shrunk, rects):
+                found.append(('keepout', [int(i)], keys[j]))
+
+        for group_index, group in enumerate(self.groups):
+            members = np.array(group['blocks'])
+            rects = geometry[members]
+            if group['kind'] == 'align':
+                values = np.array([edge_value(rect, group['edge']) for rect in rects])
+                bad = np.abs(values - values[0]) > tol
+                if bad.any():
+                    found.append(('align', members.tolist(), group_index))
+            else:
+                axis = 0 if group['axis'] == 'x' else 1
+                gaps = np.abs(rects[1:, axis] - (rects[:-1, axis] + rects[:-1, axis + 2]))
+                bad = np.flatnonzero(gaps > tol)
+                if len(bad):
+                    found.append(('abut', sorted({int(members[i]) for i in bad} | {int(members[i + 1]) for i in bad}),
+                                  group_index))
+        return found
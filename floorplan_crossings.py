@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Route crossing counter for the floorplanning tool
+Counts proper crossings between connection routes with a sweep line
+"""
+
+import numpy as np
+
+
+def collect_segments(routes):
+    """Flatten routes = {key: points} into segment arrays
+
+    Returns (keys, segments, owners) where segments is an (S, 4) array of
+    x0, y0, x1, y1 and owners[s] indexes keys. Zero-length segments are dropped.
+    """
+    keys = list(routes)
+    if not keys:
+        return keys, np.zeros((0, 4)), np.zeros(0, dtype=np.int64)
+
+    points = [np.asarray(routes[key], dtype=float) for key in keys]
+    lengths = np.array([len(p) - 1 for p in points])
+    stacked = np.vstack(points)
+
+    # Segment s joins stacked[s] and stacked[s + 1] unless s is the last point of a route
+    is_start = np.ones(len(stacked), dtype=bool)
+    is_start[np.cumsum(lengths + 1) - 1] = False
+    starts = np.flatnonzero(is_start)
+    segments = np.hstack([stacked[starts], stacked[starts + 1]])
+    owners = np.repeat(np.arange(len(keys)), lengths)
+
+    nonzero = (segments[:, 0] != segments[:, 2]) | (segments[:, 1] != segments[:, 3])
+    return keys, segments[nonzero], owners[nonzero]
+
+
+def sweep_counts(h_x0, h_x1, h_y, v_x, v_y0, v_y1):
+    """Count, for every vertical segment, the horizontals it properly crosses
+
+    Sweeps a vertical line left to right. Horizontals are inserted into a
+    Fenwick tree over their y coordinate at their left end and removed at
+    their right end; each vertical queries the open interval (y0, y1).
+    """
+    counts = np.zeros(len(v_x), dtype=np.int64)
+    if not len(h_y) or not len(v_x):
+        return counts
+
+    ys = np.unique(h_y)
+    size = len(ys)
+    h_rank = (np.searchsorted(ys, h_y) + 1).tolist()
+    q_lo = np.searchsorted(ys, v_y0, side='right').tolist()
+    q_hi = np.searchsorted(ys, v_y1, side='left').tolist()
+
+    # Events at equal x: removals, then queries, then inserts (strict crossings only)
+    nh, nv = len(h_y), len(v_x)
+    event_x = np.concatenate([h_x1, v_x, h_x0])
+    event_type = np.concatenate([np.zeros(nh, dtype=np.int64), np.ones(nv, dtype=np.int64),
+                                 np.full(nh, 2, dtype=np.int64)])
+    event_index = np.concatenate([np.arange(nh), np.arange(nv), np.arange(nh)])
+    order = np.lexsort((event_type, event_x))
+
+    tree = [0] * (size + 1)
+    result = [0] * nv
+    for kind, index in zip(event_type[order].tolist(), event_index[order].tolist()):
+        if kind == 1:
+            # Prefix sums up to q_hi minus up to q_lo
+            total = 0
+            i = q_hi[index]
+            while i > 0:
+                total += tree[i]
+                i -= i & -i
+            i = q_lo[index]
+            while i > 0:
+                total -= tree[i]
+                i -= i & -i
+            result[index] = total
+        else:
+            delta = 1 if kind == 2 else -1
+            i = h_rank[index]
+            while i <= size:
+                tree[i] += delta
+                i += i & -i
+
+    counts[:] = result
+    return counts
+
+
+def orientation(ax, ay, bx, by, cx, cy):
+    """Sign of the turn a -> b -> c"""
+    return np.sign((bx - ax) * (cy - ay) - (by - ay) * (cx - ax))
+
+
+def proper_crossings(a, b):
+    """Vectorized proper-crossing test between segment arrays a and b (N, 4)"""
+    o1 = orientation(a[:, 0], a[:, 1], a[:, 2], a[:, 3], b[:, 0], b[:, 1])
+    o2 = orientation(a[:, 0], a[:, 1], a[:, 2], a[:, 3], b[:, 2], b[:, 3])
+    o3 = orientation(b[:, 0], b[:, 1], b[:, 2], b[:, 3], a[:, 0], a[:, 1])
+    o4 = orientation(b[:, 0], b[:, 1], b[:, 2], b[:, 3], a[:, 2], a[:, 3])
+    return (o1 * o2 < 0) & (o3 * o4 < 0)
+
+
+def diagonal_pairs(segments, diagonal, cell_size=None):
+    """Find crossing pairs (i, j) involving at least one diagonal segment
+
+    Uses a uniform grid as broad phase: every segment is bucketed into the
+    cells its bounding box covers, candidate pairs share a cell.
+    """
+    diag_index = np.flatnonzero(diagonal)
+    if not len(diag_index):
+        return np.zeros((0, 2), dtype=np.int64)
+
+    x_min = np.minimum(segments[:, 0], segments[:, 2])
+    x_max = np.maximum(segments[:, 0], segments[:, 2])
+    y_min = np.minimum(segments[:, 1], segments[:, 3])
+    y_max = np.maximum(segments[:, 1], segments[:, 3])
+    if cell_size is None:
+        extent = max(x_max.max() - x_min.min(), y_max.max() - y_min.min(), 1.0)
+        cell_size = extent / max(1.0, np.sqrt(len(segments)))
+
+    # Cells covered by each segment's bounding box
+    cx0 = ((x_min - x_min.min()) // cell_size).astype(np.int64)
+    cx1 = ((x_max - x_min.min()) // cell_size).astype(np.int64)
+    cy0 = ((y_min - y_min.min()) // cell_size).astype(np.int64)
+    cy1 = ((y_max - y_min.min()) // cell_size).astype(np.int64)
+    ncols = int(cy1.max()) + 1
+    w = cx1 - cx0 + 1
+    h = cy1 - cy0 + 1
+    counts = w * h
+    seg = np.repeat(np.arange(len(segments)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell = (cx0[seg] + k // h[seg]) * ncols + cy0[seg] + k % h[seg]
+
+    # Pair every diagonal entry with every entry in the same cell
+    order = np.argsort(cell, kind='stable')
+    cell_sorted, seg_sorted = cell[order], seg[order]
+    bounds = np.searchsorted(cell_sorted, cell_sorted, side='left')
+    ends = np.searchsorted(cell_sorted, cell_sorted, side='right')
+    is_diag = diagonal[seg_sorted]
+    left = np.flatnonzero(is_diag)
+    span = ends[left] - bounds[left]
+    first = np.repeat(seg_sorted[left], span)
+    offsets = np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+    second = seg_sorted[np.repeat(bounds[left], span) + offsets]
+
+    # Diagonal-diagonal pairs are found twice, keep one ordering
+    keep = (first != second) & (~diagonal[second] | (first < second))
+    pairs = np.unique(np.column_stack([first[keep], second[keep]]), axis=0)
+    if not len(pairs):
+        return pairs
+    crossing = proper_crossings(segments[pairs[:, 0]], segments[pairs[:, 1]])
+    return pairs[crossing]
+
+
+def self_crossings(segments, owners):
+    """Count proper crossings between segments of the same route"""
+    counts = np.bincount(owners, minlength=owners.max() + 1 if len(owners) else 0)
+    starts = np.cumsum(counts) - counts
+    per_owner = counts[owners]
+    base = starts[owners]
+    seg = np.repeat(np.arange(len(owners)), per_owner)
+    k = np.arange(per_owner.sum()) - np.repeat(np.cumsum(per_owner) - per_owner, per_owner)
+    other = base[seg] + k
+    keep = seg < other
+    a, b = seg[keep], other[keep]
+    crossing = proper_crossings(segments[a], segments[b])
+    return np.bincount(owners[a[crossing]], minlength=len(counts))
+
+
+def count_crossings(routes):
+    """Count crossings between connection routes
+
+    Returns {'total': crossings between different routes,
+             'per_connection': {key: crossings involving that route}}.
+    Axis-parallel segments (the vast majority) are handled by a sweep line;
+    diagonal straight-mode legs by a grid broad phase and exact tests.
+    Segments that only touch or overlap collinearly do not count.
+    """
+    keys, segments, owners = collect_segments(routes)
+    per_route = np.zeros(len(keys), dtype=np.int64)
+    if not len(segments):
+        return {'total': 0, 'per_connection': {key: 0 for key in keys}}
+
+    x0, y0, x1, y1 = segments.T
+    horizontal = (y0 == y1)
+    vertical = (x0 == x1)
+    diagonal = ~horizontal & ~vertical
+    h = np.flatnonzero(horizontal)
+    v = np.flatnonzero(vertical)
+
+    h_x0, h_x1 = np.minimum(x0[h], x1[h]), np.maximum(x0[h], x1[h])
+    v_y0, v_y1 = np.minimum(y0[v], y1[v]), np.maximum(y0[v], y1[v])
+
+    # Sweep along x for verticals, then along y (transposed) for horizontals
+    v_counts = sweep_counts(h_x0, h_x1, y0[h], x0[v], v_y0, v_y1)
+    h_counts = sweep_counts(v_y0, v_y1, x0[v], y0[h], h_x0, h_x1)
+    np.add.at(per_route, owners[v], v_counts)
+    np.add.at(per_route, owners[h], h_counts)
+    total = int(v_counts.sum())
+
+    # Crossings involving diagonal segments
+    pairs = diagonal_pairs(segments, diagonal)
+    if len(pairs):
+        np.add.at(per_route, owners[pairs[:, 0]], 1)
+        np.add.at(per_route, owners[pairs[:, 1]], 1)
+        total += len(pairs)
+
+    # A route crossing itself is not a crossing between routes
+    own = self_crossings(segments, owners)
+    per_route -= 2 * own
+    total -= int(own.sum())
+
+    return {'total': total, 'per_connection': dict(zip(keys, per_route.tolist()))}
+
+
+def worst_offenders(per_connection, count=10):
+    """Return the keys with the most crossings, worst first"""
+    ranked = sorted(per_connection.items(), key=lambda item: item[1], reverse=True)
+    return [key for key, crossings in ranked[:count] if crossings > 0]
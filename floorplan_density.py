@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Placement density map for the floorplanning tool
+Rasterizes block coverage onto a grid of bins and keeps a summed-area table
+of it, so the covered area of any rectangle is an O(1) lookup
+"""
+
+import contextlib
+
+import numpy as np
+
+
+def axis_overlap(start, end, origin, bin_size, count):
+    """(first bin, overlap length with each bin from it) of the interval [start, end)"""
+    first = int(np.clip(np.floor((start - origin) / bin_size), 0, count - 1))
+    last = int(np.clip(np.ceil((end - origin) / bin_size), first + 1, count))
+    edges = origin + np.arange(first, last + 1) * bin_size
+    return first, np.clip(np.minimum(edges[1:], end) - np.maximum(edges[:-1], start), 0, None)
+
+
+def largest_rectangle(free):
+    """(i0, j0, i1, j1) bin range of the largest all-True rectangle in a 2D mask (None if none)
+
+    Histogram method: per row i, heights[j] counts the free bins ending at
+    row i in column j, and a monotonic stack finds the widest rectangle
+    under that histogram; O(nx * ny) overall.
+    """
+    nx, ny = free.shape
+    heights = np.zeros(ny, dtype=np.int64)
+    best = (0, None)
+    for i in range(nx):
+        heights = np.where(free[i], heights + 1, 0)
+        stack = []
+        for j in range(ny + 1):
+            h = heights[j] if j < ny else 0
+            start = j
+            while stack and stack[-1][1] >= h:
+                start, top = stack.pop()
+                area = top * (j - start)
+                if area > best[0]:
+                    best = (area, (i - top + 1, start, i + 1, j))
+            stack.append((start, h))
+    return best[1]
+
+
+class DensityMap:
+    """Grid of block coverage with a summed-area table, updated incrementally per block"""
+
+    def __init__(self, bin_size=100.0):
+        self.bin_size = float(bin_size)
+        self.origin = (0.0, 0.0)
+        self.shape = (0, 0)  # (nx, ny)
+        self.grid = np.zeros((0, 0))        # Covered area per bin
+        self.sat = np.zeros((1, 1))         # sat[i, j] = grid[:i, :j].sum()
+
+        # Cached coverage of every block: key -> (rect, first bin x, first bin y, coverage patch)
+        self.contributions = {}
+
+    def reset(self, bounds, bin_size=None):
+        """Reallocate the grid to cover bounds = (x_min, y_min, x_max, y_max)"""
+        if bin_size is not None:
+            self.bin_size = float(bin_size)
+        x_min, y_min, x_max, y_max = bounds
+        nx = max(1, int(np.ceil((x_max - x_min) / self.bin_size)))
+        ny = max(1, int(np.ceil((y_max - y_min) / self.bin_size)))
+        self.origin = (float(x_min), float(y_min))
+        self.shape = (nx, ny)
+        self.grid = np.zeros((nx, ny))
+        self.sat = np.zeros((nx + 1, ny + 1))
+        self.contributions = {}
+
+    def covers(self, bounds):
+        """Check whether the current grid covers the given bounds"""
+        if not self.grid.size:
+            return False
+        x_min, y_min, x_max, y_max = bounds
+        left, right, bottom, top = self.extent
+        return x_min >= left and y_min >= bottom and x_max <= right and y_max <= top
+
+    @property
+    def extent(self):
+        """Grid extent as (left, right, bottom, top) for imshow"""
+        ox, oy = self.origin
+        nx, ny = self.shape
+        return (ox, ox + nx * self.bin_size, oy, oy + ny * self.bin_size)
+
+    def coverage(self, rect):
+        """(first bin x, first bin y, covered area patch) of an (x, y, width, height) rectangle"""
+        x, y, w, h = rect
+        nx, ny = self.shape
+        i0, ox = axis_overlap(x, x + w, self.origin[0], self.bin_size, nx)
+        j0, oy = axis_overlap(y, y + h, self.origin[1], self.bin_size, ny)
+        return i0, j0, np.outer(ox, oy)
+
+    def remap(self, key_map):
+        """Renumber the contributions; those of keys missing from key_map are dropped on the next update"""
+        self.contributions = {key_map.get(key, ('removed', key)): entry
+                              for key, entry in self.contributions.items()}
+
+    def add_patch(self, i0, j0, patch, sign):
+        """Add sign * patch to the grid and patch the summed-area table in place
+
+        Only the table entries at or beyond the patch change: inside it by the
+        patch's own prefix sums, beyond it by its row/column totals.
+        """
+        i1, j1 = i0 + patch.shape[0], j0 + patch.shape[1]
+        self.grid[i0:i1, j0:j1] += sign * patch
+        prefix = sign * patch.cumsum(axis=0).cumsum(axis=1)
+        self.sat[i0 + 1:i1 + 1, j0 + 1:j1 + 1] += prefix
+        self.sat[i1 + 1:, j0 + 1:j1 + 1] += prefix[-1, :]
+        self.sat[i0 + 1:i1 + 1, j1 + 1:] += prefix[:, -1:]
+        self.sat[i1 + 1:, j1 + 1:] += prefix[-1, -1]
+
+    def update(self, rects):
+        """Re-rasterize only the blocks whose rectangle changed since the last update
+
+        rects maps a block key to its (x, y, width, height); keys missing
+        from rects are dropped. Returns the number of blocks re-rasterized.
+        """
+        if not self.grid.size:
+            return 0
+        for key in list(self.contributions):
+            rect, i0, j0, patch = self.contributions[key]
+            if rects.get(key) != rect:
+                self.add_patch(i0, j0, patch, -1)
+                del self.contributions[key]
+
+        changed = 0
+        for key, rect in rects.items():
+            if key not in self.contributions:
+                i0, j0, patch = self.coverage(rect)
+                self.add_patch(i0, j0, patch, 1)
+                self.contributions[key] = (rect, i0, j0, patch)
+                changed += 1
+
+        # Guard against float drift from repeated add/subtract
+        np.maximum(self.grid, 0, out=self.grid)
+        return changed
+
+    @contextlib.contextmanager
+    def excluding(self, key):
+        """Take one block's coverage out of the map for the duration of a with block"""
+        entry = self.contributions.get(key)
+        if entry is not None:
+            self.add_patch(entry[1], entry[2], entry[3], -1)
+        try:
+            yield self
+        finally:
+            if entry is not None:
+                self.add_patch(entry[1], entry[2], entry[3], 1)
+
+    def prefix(self, x, y):
+        """Covered area below and left of (x, y), bilinear within a bin"""
+        nx, ny = self.shape
+        fx = np.clip((x - self.origin[0]) / self.bin_size, 0, nx)
+        fy = np.clip((y - self.origin[1]) / self.bin_size, 0, ny)
+        i = min(int(fx), nx - 1)
+        j = min(int(fy), ny - 1)
+        tx, ty = fx - i, fy - j
+        s = self.sat
+        return ((1 - tx) * (1 - ty) * s[i, j] + tx * (1 - ty) * s[i + 1, j] +
+                (1 - tx) * ty * s[i, j + 1] + tx * ty * s[i + 1, j + 1])
+
+    def covered_area(self, x_min, y_min, x_max, y_max):
+        """Block area inside a rectangle in O(1) (coverage assumed uniform within a bin)"""
+        if not self.grid.size:
+            return 0.0
+        return float(self.prefix(x_max, y_max) - self.prefix(x_min, y_max) -
+                     self.prefix(x_max, y_min) + self.prefix(x_min, y_min))
+
+    def density(self, x_min, y_min, x_max, y_max):
+        """Fraction of a rectangle covered by blocks (above 1 where blocks overlap)"""
+        area = (x_max - x_min) * (y_max - y_min)
+        return self.covered_area(x_min, y_min, x_max, y_max) / area if area > 0 else 0.0
+
+    def utilization(self):
+        """Covered fraction of every bin"""
+        return self.grid / self.bin_size ** 2
+
+    def window_sums(self, bins_x, bins_y):
+        """Covered area of every bins_x x bins_y window of bins, all at once from the table"""
+        s = self.sat
+        return s[bins_x:, bins_y:] - s[:-bins_x, bins_y:] - s[bins_x:, :-bins_y] + s[:-bins_x, :-bins_y]
+
+    def find_slot(self, width, height):
+        """(x, y, covered area) of the bin-aligned width x height window with the least coverage"""
+        nx, ny = self.shape
+        bins_x = int(np.ceil(width / self.bin_size))
+        bins_y = int(np.ceil(height / self.bin_size))
+        if not self.grid.size or bins_x > nx or bins_y > ny:
+            return None
+        sums = self.window_sums(bins_x, bins_y)
+        i, j = map(int, np.unravel_index(np.argmin(sums), sums.shape))
+        return (self.origin[0] + i * self.bin_size, self.origin[1] + j * self.bin_size, float(sums[i, j]))
+
+    def largest_empty(self, count=3, threshold=0.0):
+        """Up to count largest disjoint empty rectangles as (x_min, y_min, x_max, y_max)
+
+        A bin is empty when its covered fraction is at most threshold.
+        """
+        if not self.grid.size:
+            return []
+        free = self.utilization() <= threshold
+        found = []
+        for _ in range(count):
+            rect = largest_rectangle(free)
+            if rect is None:
+                break
+            i0, j0, i1, j1 = map(int, rect)
+            free[i0:i1, j0:j1] = False
+            ox, oy = self.origin
+            found.append((ox + i0 * self.bin_size, oy + j0 * self.bin_size,
+                          ox + i1 * self.bin_size, oy + j1 * self.bin_size))
+        return found
+
+    def stats(self):
+        """Overall, peak and over-packed statistics of the current grid"""
+        if not self.grid.size:
+            return {'utilization': 0.0, 'peak': 0.0, 'overfull_bins': 0, 'bins': 0}
+        utilization = self.utilization()
+        return {
+            'utilization': float(self.sat[-1, -1] / (self.grid.size * self.bin_size ** 2)),
+            'peak': float(utilization.max()),
+            'overfull_bins': int((utilization > 1 + 1e-9).sum()),
+            'bins': int(self.grid.size)
+        }
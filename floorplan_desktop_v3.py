@@ -4,26 +4,60 @@ Floorplanning Tool - Version 2.0
 Enhanced desktop application with improved handles and non-rectilinear shapes
 """
 
+import copy
+import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import pandas as pd
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection, PolyCollection
 import matplotlib.patches as patches
 
+from floorplan_routes import build_route_points, connection_offsets, route_midpoint, z_connector
+from floorplan_congestion import CongestionMap
+from floorplan_maze import MazeRouter
+from floorplan_ports import PortAssigner
+from floorplan_crossings import count_crossings, worst_offenders
+from floorplan_shapes import optimize_shapes
+from floorplan_clustering import build_hierarchy, block_clusters, multilevel_place
+from floorplan_history import EditHistory
+from floorplan_journal import EditJournal, load_session
+from floorplan_profiler import FrameProfiler, profiled
+from floorplan_replay import InteractionRecorder
+from floorplan_export import EXPORTERS, export_floorplan, net_routes
+from floorplan_bookshelf import read_bookshelf, net_edges
+from floorplan_nets import NetList, block_geometry
+from floorplan_evaluate import evaluate_candidates, best_candidate
+from floorplan_tiles import TileCache, TileSnapshot
+from floorplan_bundling import Bundles, grid_keys
+from floorplan_constraints import ConstraintSet
+from floorplan_eco import read_matrix, row_hashes, diff_design
+from floorplan_density import DensityMap
+from floorplan_filter import WeightIndex
+
 class FloorplanToolV2:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Floorplanning Tool - Version 3.0")
-        self.root.geometry("1400x900")
+    def __init__(self, root=None):
+        # Without a root window the tool runs headless on an Agg canvas
+        # (benchmarks, replays); Tk variables then live in a bare Tcl interpreter
+        self.headless = root is None
+        self.root = tk.Tcl() if self.headless else root
+        if not self.headless:
+            self.root.title("Floorplanning Tool - Version 3.0")
+            self.root.geometry("1400x900")
         
         # Data storage
         self.blocks = []
         self.connections = []
         self.hardmacro_names = []
+        self.nets = None                # Multi-pin nets (NetList), drawn as route trees
+        self.property_frames = []       # Per block: its frame in the Properties tab
+        self.property_vars = []         # Per block: the Properties tab editor variables
+        self.connection_rows = []       # Per connection: (frame, names label, weight label) in the Connections tab
         
         # Interactive state
         self.selected_block = None
@@ -35,10 +69,202 @@ class FloorplanToolV2:
         self.last_mouse_pos = None
         self.hover_handle = None
         
+        # Multi-selection: rubber-band or shift-click selected blocks move and scale as a group
+        self.selected_blocks = set()    # Block ids of the multi-selection
+        self.rubber_band = None         # {'start', 'end', 'extend'} while a rubber band is dragged
+        self.band_artist = None
+        self.group_drag = None          # Blocks, ports and routes of a group move in progress
+        self.kept_routes = {}           # Routes the next redraw may reuse (undo/redo)
+        
+        # Selection overlay: the design is drawn once into a cached background and the
+        # selection highlight and handles are blitted on top of it
+        self.background = None          # Canvas pixels of the last full draw
+        self.selection_background = None   # Background with the selection highlight, below the handles
+        self.overlay_artists = []       # Animated artists of the selection overlay
+        self.overlay_handles = {}       # Handle id -> handle patch
+        
+        # Crash recovery journal (written by a background thread)
+        self.journal_config = {
+            'directory': None if self.headless else os.path.join(os.path.expanduser('~'), '.floorplan_journal'),
+            'compact_records': 200000,  # Journal records before compacting into a snapshot
+            'sync_interval': 1.0        # Seconds between fsyncs of the journal
+        }
+        self.journal = EditJournal(self.journal_config['directory'], self.journal_config['compact_records'],
+                                   self.journal_config['sync_interval'])
+        self.journal_error_reported = None  # Writer error already shown to the user
+        
+        # Undo/redo of edit gestures (one step per drag or property update)
+        self.history = EditHistory(max_steps=200, max_records=100000, listener=self.journal.record_step)
+        
+        # Frame-time profiler (per-phase timers of redraws and mouse handlers, off by default)
+        self.profiler = FrameProfiler(capacity=100000, frame_capacity=1000)
+        
+        # Mouse event recorder for headless replay (floorplan_replay.py)
+        self.recorder = InteractionRecorder()
+        
         # Port configuration
         self.PORT_RADIUS = 15  # Larger radius for port bubbles
+        self.port_assigner = PortAssigner(margin=20)  # Spreads ports evenly per block edge
+        
+        # View management: wheel zoom and panning show composed tiles of the last
+        # redraw and redraw fully once the view settles
+        self.view_config = {
+            'wheel_step': 1.25,         # Zoom factor per mouse wheel notch
+            'settle_ms': 300,           # Idle time after panning or zooming before the full redraw
+            'poll_ms': 50,              # Interval for showing tiles finished in the background
+            'tile_size': 256,           # Tile side in pixels
+            'cache_tiles': 256,         # Rendered tiles kept (least recently used dropped)
+            'max_level': 12             # Finest zoom level of the tile pyramid
+        }
+        self.tiles = TileCache(self.view_config['tile_size'], self.view_config['cache_tiles'],
+                               self.view_config['max_level'])
+        self.tiles_shown = False        # The canvas shows composed tiles, not a full draw
+        self.settle_job = None
+        self.tile_poll_job = None
+        self.net_segments = None        # Net route segments of the last redraw
+        
+        # Route geometry from the last redraw (connection index -> polyline points)
+        self.connection_routes = {}
+        self.connection_artists = {}    # Connection index -> its line, port bubble and label artists
+        
+        # Weight filter: connections sorted by weight once, so a threshold change is one
+        # binary search and only the connections crossing it are drawn or removed
+        self.weight_index = WeightIndex()
+        
+        # Congestion map configuration
+        self.congestion_config = {
+            'bin_size': 50,         # Grid bin size in μm
+            'padding': 200,         # Extra margin around the blocks
+            'cmap': 'hot_r',
+            'alpha': 0.5
+        }
+        self.congestion_map = CongestionMap(self.congestion_config['bin_size'])
+        
+        # Placement density map (block coverage with a summed-area table)
+        self.density_config = {
+            'bin_size': 100,            # Grid bin size in μm
+            'padding': 200,             # Extra margin around the blocks (the die is used when set)
+            'cmap': 'RdYlGn_r',
+            'alpha': 0.5,
+            'whitespace_count': 3,      # Largest empty rectangles shown
+            'empty_threshold': 0.0,     # Bins covered up to this fraction count as empty
+            'whitespace_color': 'green'
+        }
+        self.density_map = DensityMap(self.density_config['bin_size'])
+        
+        # Maze router configuration (used by the "Maze" connection mode)
+        self.maze_config = {
+            'cell_size': 25,            # Routing grid pitch in μm
+            'clearance': 10,            # Keep-away distance around blocks
+            'padding': 100,             # Routable margin required around the blocks
+            'margin': 400,              # Extra margin allocated when the grid is rebuilt
+            'capacity': 4,              # Routes per cell before rip-up
+            'rrr_iterations': 5,        # Rip-up-and-reroute passes
+            'processes': None,          # Worker processes for full reroutes (None = all CPUs)
+            'parallel_threshold': 200   # Connections needed before using the process pool
+        }
+        self.maze_router = self.create_maze_router()
+        
+        # Route crossing analysis
+        self.crossing_config = {
+            'highlight_count': 10,      # Number of worst offenders to highlight
+            'color': 'darkorange'
+        }
+        self.crossing_result = None
+        self.crossing_offenders = []
+        
+        # Shape optimizer configuration (per-block 'aspect_min'/'aspect_max'/'soft' override)
+        self.shape_config = {
+            'aspect_min': 0.5,          # Minimum height / width of soft macros
+            'aspect_max': 2.0,          # Maximum height / width of soft macros
+            'samples': 16,              # Shape curve points per soft macro
+            'curve_points': 24,         # Shape curve points kept per slicing node
+            'wl_weight': 1.0,           # Wirelength weight relative to outline area
+            'wl_candidates': 8          # Smallest-area outlines evaluated for wirelength
+        }
+        
+        # Bookshelf (.nodes/.nets/.pl) import
+        self.bookshelf_config = {
+            'net_model': 'nets',        # 'nets' keeps multi-pin nets; 'clique', 'star' and 'hybrid'
+                                        # (clique up to clique_limit pins, then star) expand them to pairs
+            'clique_limit': 16,         # Largest net expanded as a clique in hybrid mode
+            'weighting': 'unit'         # Pair weight: 'unit', 'inverse' (1/(k-1)) or 'normalized' (2/k)
+        }
+        
+        # Multi-pin net drawing
+        self.net_config = {
+            'port_margin': 10,          # Minimum port distance from a block corner
+            'port_size': 12             # Port marker size (points)
+        }
+        
+        # Edge bundling: connections between the same pair of groups are drawn as one path
+        self.bundle_config = {
+            'group_by': 'grid',         # 'grid' (cells of the port positions) or 'cluster'
+            'cell_size': 1000,          # Grid cell size in μm
+            'cluster_level': 2,         # Hierarchy level grouped by 'cluster' (after Cluster Place)
+            'min_width': 1.0,           # Line width of the lightest bundle
+            'max_width': 12.0,          # Line width of the heaviest bundle
+            'color': 'darkred',
+            'alpha': 0.6
+        }
+        self.bundle_cache = None        # (key, bundles, layers) until ports or grouping change
+        self.bundle_paths = None        # Bundle polylines of the last redraw
+        
+        # Placement constraints (fixed macros, die boundary, keep-outs, alignment/abutment groups)
+        self.constraint_config = {
+            'snap': True,               # Snap drags to the nearest valid position (False rejects them)
+            'cell_size': 500,           # Keep-out grid index cell size in μm
+            'tolerance': 1e-6,          # Allowed coordinate error in μm
+            'die_color': 'black',
+            'keepout_color': 'gray'
+        }
+        self.constraints = ConstraintSet(self.constraint_config['cell_size'], self.constraint_config['tolerance'])
+        self.constraint_violations = []    # (kind, blocks, detail) of the last full check
         
-        # View management
+        # ECO reload of a revised adjacency matrix CSV
+        self.eco_config = {
+            'watch_ms': 1000,           # Interval for checking the watched CSV for changes
+            'spacing': 200              # Gap between blocks added by an ECO (placed above the design)
+        }
+        self.eco_source = None          # {'filename', 'mtime', 'hashes'} of the loaded CSV
+        self.eco_watch_job = None
+        
+        # Batch evaluation of candidate placements
+        self.evaluate_config = {
+            'memory': 256 * 2**20,      # Scratch memory per chunk of candidates (bytes)
+            'processes': None,          # Worker processes (None = all CPUs, 1 = in process)
+            'parallel_threshold': 4     # Chunks needed before using the process pool
+        }
+        
+        # Layers (tiers) of blocks; every block and connection artist is registered
+        # with its layers so visibility, dimming and order change without a rebuild
+        self.layer_config = {
+            'dim_alpha': 0.25,          # Opacity factor of dimmed layers
+            'zorder_step': 10,          # Drawing order distance between adjacent layers
+            'via_size': 60,             # Via marker size (points)
+            'via_color': 'darkorange'
+        }
+        self.layer_state = {0: {'visible': True, 'dim': False}}
+        self.layer_order = [0]          # Bottom to top
+        self.layer_artists = []         # (artist, layers, base alpha, base zorder) from the last redraw
+        
+        # Multilevel clustering
+        self.cluster_config = {
+            'target': 64,               # Coarsen until at most this many clusters
+            'whitespace': 1.5,          # Footprint area per unit of block area
+            'iterations': 10            # Refinement passes per level
+        }
+        self.cluster_levels = []        # Coarsening hierarchy (level 0 = blocks)
+        self.cluster_members = None     # Cluster id of every block at every level
+        self.expanded_clusters = set()  # (level, cluster) pairs expanded in the collapsed view
+        self.hidden_blocks = set()      # Blocks currently drawn as part of a collapsed cluster
+        self.collapsed_clusters = []    # Collapsed cluster rectangles from the last redraw
+        
+        # Group editing of the multi-selection
+        self.selection_config = {
+            'scale': 1.25,              # Default spread factor of Scale Group
+            'color': 'darkred'          # Highlight of the multi-selection and the rubber band
+        }
         
         # Handle configuration
         self.handle_config = {
@@ -54,8 +280,73 @@ class FloorplanToolV2:
         }
         
         # Create GUI
+        self.create_variables()
+        if self.headless:
+            self.create_figure()
+            self.update_plot()
+            return
         self.create_widgets()
         
+        # Keep the journal on crashes, remove it on a normal exit
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        if self.journal.has_session():
+            self.root.after(100, self.offer_recovery)
+    
+    def create_variables(self):
+        """Create the Tk variables holding UI modes and status texts"""
+        self.interactive_var = tk.BooleanVar(self.root, value=True)
+        self.shape_mode_var = tk.StringVar(self.root, value="rectangle")
+        self.connection_mode_var = tk.StringVar(self.root, value="straight")
+        self.pan_var = tk.BooleanVar(self.root, value=False)
+        self.info_text_var = tk.StringVar(self.root, value="No data loaded")
+        self.congestion_var = tk.BooleanVar(self.root, value=False)
+        self.congestion_bin_var = tk.StringVar(self.root, value=str(self.congestion_config['bin_size']))
+        self.density_var = tk.BooleanVar(self.root, value=False)
+        self.whitespace_var = tk.BooleanVar(self.root, value=False)
+        self.auto_ports_var = tk.BooleanVar(self.root, value=True)
+        self.crossings_var = tk.BooleanVar(self.root, value=False)
+        self.bundle_var = tk.BooleanVar(self.root, value=False)
+        self.crossings_text_var = tk.StringVar(self.root, value="Total: -")
+        self.collapse_var = tk.BooleanVar(self.root, value=False)
+        self.net_style_var = tk.StringVar(self.root, value="steiner")
+        self.layer_var = tk.StringVar(self.root, value="0")
+        self.layer_visible_var = tk.BooleanVar(self.root, value=True)
+        self.layer_dim_var = tk.BooleanVar(self.root, value=False)
+        self.layer_text_var = tk.StringVar(self.root, value="")
+        self.nets_text_var = tk.StringVar(self.root, value="HPWL: -")
+        self.profile_var = tk.BooleanVar(self.root, value=False)
+        self.profile_overlay_var = tk.BooleanVar(self.root, value=False)
+        self.record_var = tk.BooleanVar(self.root, value=False)
+        self.constraints_text_var = tk.StringVar(self.root, value="")
+        self.eco_watch_var = tk.BooleanVar(self.root, value=False)
+        self.selection_scale_var = tk.StringVar(self.root, value=str(self.selection_config['scale']))
+        self.weight_filter_var = tk.StringVar(self.root, value="all")
+        self.weight_threshold_var = tk.DoubleVar(self.root, value=0.0)
+        self.weight_filter_text_var = tk.StringVar(self.root, value="")
+        self.selection_text_var = tk.StringVar(self.root, value="")
+    
+    def create_figure(self, master=None):
+        """Create the matplotlib figure, embedded in master or on an Agg canvas when headless"""
+        self.fig = Figure(figsize=(12, 8))
+        self.ax = self.fig.add_subplot(111)
+        if self.headless:
+            self.canvas = FigureCanvasAgg(self.fig)
+        else:
+            self.canvas = FigureCanvasTkAgg(self.fig, master)
+            self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        # Set up dynamic canvas sizing
+        self.auto_resize_view = True  # Control when to auto-resize view
+        self.ax.set_xlim(0, 1000)
+        self.ax.set_ylim(0, 1000)
+        
+        # Connect mouse events
+        self.canvas.mpl_connect('button_press_event', self.on_mouse_press)
+        self.canvas.mpl_connect('button_release_event', self.on_mouse_release)
+        self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('scroll_event', self.on_scroll)
+        
     def create_widgets(self):
         # Main frame
         main_frame = ttk.Frame(self.root)
@@ -68,15 +359,20 @@ class FloorplanToolV2:
         # Upload button
         self.upload_btn = ttk.Button(control_frame, text="Upload CSV", command=self.upload_csv)
         self.upload_btn.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(control_frame, text="Import Bookshelf", command=self.import_bookshelf).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(control_frame, text="ECO Reload", command=self.eco_reload).pack(side=tk.LEFT, padx=(0, 2))
+        ttk.Checkbutton(control_frame, text="Watch", variable=self.eco_watch_var,
+                        command=self.toggle_eco_watch).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Export button
+        ttk.Button(control_frame, text="Export...", command=self.export_geometry).pack(side=tk.LEFT, padx=(0, 10))
         
         # Interactive controls
-        self.interactive_var = tk.BooleanVar(value=True)
         self.interactive_cb = ttk.Checkbutton(control_frame, text="Interactive Mode", 
                                             variable=self.interactive_var)
         self.interactive_cb.pack(side=tk.LEFT, padx=(0, 10))
         
         # Shape mode controls
-        self.shape_mode_var = tk.StringVar(value="rectangle")
         shape_frame = ttk.LabelFrame(control_frame, text="Shape Mode")
         shape_frame.pack(side=tk.LEFT, padx=(0, 10))
         
@@ -89,11 +385,15 @@ class FloorplanToolV2:
         conn_frame = ttk.LabelFrame(control_frame, text="Connection Mode")
         conn_frame.pack(side=tk.LEFT, padx=(0, 10))
         
-        self.connection_mode_var = tk.StringVar(value="straight")
         ttk.Radiobutton(conn_frame, text="Straight", variable=self.connection_mode_var, 
                        value="straight").pack(side=tk.LEFT, padx=5)
         ttk.Radiobutton(conn_frame, text="Manhattan", variable=self.connection_mode_var, 
                        value="manhattan").pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(conn_frame, text="Maze", variable=self.connection_mode_var, 
+                       value="maze", command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(conn_frame, text="Reroute", command=self.reroute_all_connections).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(conn_frame, text="Bundle", variable=self.bundle_var,
+                        command=self.update_plot).pack(side=tk.LEFT, padx=5)
         
         # Reset view button
         self.reset_btn = ttk.Button(control_frame, text="Reset View", command=self.reset_view)
@@ -115,14 +415,158 @@ class FloorplanToolV2:
         self.fit_btn.pack(side=tk.LEFT, padx=2)
         
         # Pan mode toggle
-        self.pan_var = tk.BooleanVar(value=False)
         self.pan_btn = ttk.Checkbutton(zoom_frame, text="Pan Mode", variable=self.pan_var)
         self.pan_btn.pack(side=tk.LEFT, padx=(10, 2))
         
+        # Undo/redo controls
+        history_frame = ttk.Frame(control_frame)
+        history_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(history_frame, text="Undo", width=5, command=self.undo).pack(side=tk.LEFT, padx=2)
+        ttk.Button(history_frame, text="Redo", width=5, command=self.redo).pack(side=tk.LEFT, padx=2)
+        self.root.bind('<Control-z>', lambda e: self.on_history_key(self.undo))
+        self.root.bind('<Control-y>', lambda e: self.on_history_key(self.redo))
+        
         # Info labels
-        self.info_label = ttk.Label(control_frame, text="No data loaded")
+        self.info_label = ttk.Label(control_frame, textvariable=self.info_text_var)
         self.info_label.pack(side=tk.LEFT)
         
+        # Analysis controls
+        analysis_frame = ttk.Frame(main_frame)
+        analysis_frame.pack(fill=tk.X, pady=(0, 10))
+        self.analysis_frame = analysis_frame
+        
+        congestion_frame = ttk.LabelFrame(analysis_frame, text="Congestion")
+        congestion_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Checkbutton(congestion_frame, text="Show Map", variable=self.congestion_var,
+                       command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(congestion_frame, text="Bin:").pack(side=tk.LEFT)
+        bin_entry = ttk.Entry(congestion_frame, textvariable=self.congestion_bin_var, width=6)
+        bin_entry.pack(side=tk.LEFT, padx=2)
+        bin_entry.bind('<Return>', lambda e: self.set_congestion_bin_size())
+        
+        ttk.Button(congestion_frame, text="Export", 
+                  command=self.export_congestion).pack(side=tk.LEFT, padx=5)
+        
+        density_frame = ttk.LabelFrame(analysis_frame, text="Density")
+        density_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Checkbutton(density_frame, text="Heatmap", variable=self.density_var,
+                       command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(density_frame, text="Whitespace", variable=self.whitespace_var,
+                       command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(density_frame, text="Best Slot", 
+                  command=self.move_to_best_slot).pack(side=tk.LEFT, padx=5)
+        
+        ports_frame = ttk.LabelFrame(analysis_frame, text="Ports")
+        ports_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Checkbutton(ports_frame, text="Auto Spread", 
+                       variable=self.auto_ports_var).pack(side=tk.LEFT, padx=5)
+        ttk.Button(ports_frame, text="Spread All", 
+                  command=self.spread_all_ports).pack(side=tk.LEFT, padx=5)
+        
+        crossings_frame = ttk.LabelFrame(analysis_frame, text="Crossings")
+        crossings_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(crossings_frame, text="Count", 
+                  command=self.count_route_crossings).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(crossings_frame, text="Highlight Worst", variable=self.crossings_var,
+                       command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        self.crossings_label = ttk.Label(crossings_frame, textvariable=self.crossings_text_var)
+        self.crossings_label.pack(side=tk.LEFT, padx=5)
+        
+        nets_frame = ttk.LabelFrame(analysis_frame, text="Nets")
+        nets_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Radiobutton(nets_frame, text="Steiner", variable=self.net_style_var, 
+                       value="steiner", command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(nets_frame, text="Star", variable=self.net_style_var, 
+                       value="star", command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        ttk.Label(nets_frame, textvariable=self.nets_text_var).pack(side=tk.LEFT, padx=5)
+        
+        layers_frame = ttk.LabelFrame(analysis_frame, text="Layers")
+        layers_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.layer_combo = ttk.Combobox(layers_frame, textvariable=self.layer_var, values=["0"], width=4)
+        self.layer_combo.pack(side=tk.LEFT, padx=5)
+        self.layer_combo.bind('<<ComboboxSelected>>', lambda e: self.select_layer())
+        ttk.Checkbutton(layers_frame, text="Visible", variable=self.layer_visible_var,
+                       command=self.toggle_layer_visible).pack(side=tk.LEFT, padx=2)
+        ttk.Checkbutton(layers_frame, text="Dim", variable=self.layer_dim_var,
+                       command=self.toggle_layer_dim).pack(side=tk.LEFT, padx=2)
+        ttk.Button(layers_frame, text="To Front", 
+                  command=self.raise_layer).pack(side=tk.LEFT, padx=2)
+        ttk.Button(layers_frame, text="Assign Block", 
+                  command=self.assign_block_layer).pack(side=tk.LEFT, padx=2)
+        ttk.Label(layers_frame, textvariable=self.layer_text_var).pack(side=tk.LEFT, padx=5)
+        
+        shapes_frame = ttk.LabelFrame(analysis_frame, text="Shapes")
+        shapes_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(shapes_frame, text="Optimize Shapes", 
+                  command=self.optimize_block_shapes).pack(side=tk.LEFT, padx=5)
+        ttk.Button(shapes_frame, text="Evaluate Candidates", 
+                  command=self.evaluate_candidate_file).pack(side=tk.LEFT, padx=5)
+        
+        constraints_frame = ttk.LabelFrame(analysis_frame, text="Constraints")
+        constraints_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(constraints_frame, text="Load...", 
+                  command=self.load_constraints).pack(side=tk.LEFT, padx=5)
+        ttk.Button(constraints_frame, text="Fix Block", 
+                  command=self.toggle_fixed_block).pack(side=tk.LEFT, padx=5)
+        ttk.Button(constraints_frame, text="Check", 
+                  command=self.check_constraints).pack(side=tk.LEFT, padx=5)
+        ttk.Label(constraints_frame, textvariable=self.constraints_text_var).pack(side=tk.LEFT, padx=5)
+        
+        filter_frame = ttk.LabelFrame(analysis_frame, text="Weight Filter")
+        filter_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        for text, mode in (("All", "all"), ("Top-K", "top"), ("Min Count", "min")):
+            ttk.Radiobutton(filter_frame, text=text, variable=self.weight_filter_var, value=mode,
+                           command=self.set_weight_filter_mode).pack(side=tk.LEFT, padx=2)
+        self.weight_scale = ttk.Scale(filter_frame, orient=tk.HORIZONTAL, length=120, from_=0, to=1,
+                                      variable=self.weight_threshold_var,
+                                      command=lambda value: self.apply_weight_filter())
+        self.weight_scale.pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, textvariable=self.weight_filter_text_var).pack(side=tk.LEFT, padx=5)
+        
+        selection_frame = ttk.LabelFrame(analysis_frame, text="Selection")
+        selection_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Label(selection_frame, text="Scale:").pack(side=tk.LEFT)
+        scale_entry = ttk.Entry(selection_frame, textvariable=self.selection_scale_var, width=5)
+        scale_entry.pack(side=tk.LEFT, padx=2)
+        scale_entry.bind('<Return>', lambda e: self.scale_selection())
+        ttk.Button(selection_frame, text="Scale Group", 
+                  command=self.scale_selection).pack(side=tk.LEFT, padx=5)
+        ttk.Label(selection_frame, textvariable=self.selection_text_var).pack(side=tk.LEFT, padx=5)
+        
+        clusters_frame = ttk.LabelFrame(analysis_frame, text="Clusters")
+        clusters_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(clusters_frame, text="Cluster Place", 
+                  command=self.cluster_place).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(clusters_frame, text="Collapse", variable=self.collapse_var,
+                       command=self.toggle_cluster_view).pack(side=tk.LEFT, padx=5)
+        ttk.Button(clusters_frame, text="Collapse All", 
+                  command=self.collapse_all_clusters).pack(side=tk.LEFT, padx=5)
+        
+        profiling_frame = ttk.LabelFrame(analysis_frame, text="Profiling")
+        profiling_frame.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Checkbutton(profiling_frame, text="Timers", variable=self.profile_var,
+                       command=self.toggle_profiling).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(profiling_frame, text="Overlay", variable=self.profile_overlay_var,
+                       command=self.update_plot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(profiling_frame, text="Export Trace", 
+                  command=self.export_trace).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(profiling_frame, text="Record", variable=self.record_var,
+                       command=self.toggle_recording).pack(side=tk.LEFT, padx=5)
+        
         # Create notebook for tabs
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True)
@@ -132,20 +576,7 @@ class FloorplanToolV2:
         self.notebook.add(self.floorplan_frame, text="Interactive Floorplan")
         
         # Create matplotlib figure for floorplan with full-screen canvas
-        self.fig = Figure(figsize=(12, 8))
-        self.ax = self.fig.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.fig, self.floorplan_frame)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        # Set up dynamic canvas sizing
-        self.auto_resize_view = True  # Control when to auto-resize view
-        self.ax.set_xlim(0, 1000)
-        self.ax.set_ylim(0, 1000)
-        
-        # Connect mouse events
-        self.canvas.mpl_connect('button_press_event', self.on_mouse_press)
-        self.canvas.mpl_connect('button_release_event', self.on_mouse_release)
-        self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
+        self.create_figure(self.floorplan_frame)
         
         # Properties tab
         self.properties_frame = ttk.Frame(self.notebook)
@@ -178,8 +609,10 @@ class FloorplanToolV2:
         • Drag RED corner handles to reshape aspect ratio (area stays constant)
         • Drag TEAL edge handles to change width/height (area stays constant)
         • Hover over handles for visual feedback
+        • Scroll the mouse wheel to zoom around the cursor
         • Use Shape Mode to switch between rectangle and L-shape
         • Use Properties tab for precise editing
+        • Fixed blocks (hatched) stay put; drags snap to the die, keep-outs and alignment groups
         """
         
         ttk.Label(instruction_frame, text=instructions, justify=tk.LEFT).pack(padx=5, pady=5)
@@ -252,14 +685,24 @@ class FloorplanToolV2:
         
         return None
         
+    @profiled('on_mouse_press')
     def on_mouse_press(self, event):
         """Handle mouse press events with improved handle detection"""
+        self.recorder.capture(self, 'press', event)
         if not self.interactive_var.get() or not self.blocks:
             return
             
         if event.inaxes != self.ax:
             return
         
+        # Double-click on a collapsed cluster expands it one level
+        if event.dblclick and self.collapse_var.get():
+            cluster = self.get_collapsed_cluster_at_position(event.xdata, event.ydata)
+            if cluster is not None:
+                self.expanded_clusters.add(cluster)
+                self.update_plot()
+                return
+        
         # Check if pan mode is enabled
         if self.pan_var.get():
             self.panning = True
@@ -271,14 +714,27 @@ class FloorplanToolV2:
         if port_conn_index is not None:
             self.selected_port = (port_conn_index, port_type)
             self.port_dragging = True
+            self.history.begin('port')
             self.last_mouse_pos = (event.xdata, event.ydata)
-            self.update_plot()
+            self.refresh_overlay()
             return
             
         # Find clicked block
         clicked_block = self.get_block_at_position(event.xdata, event.ydata)
+        shift = 'shift' in (getattr(event, 'key', None) or '')
+        
+        # Shift-click adds a block to the multi-selection or removes it
+        if clicked_block and shift:
+            self.set_selection(self.selected_blocks ^ {clicked_block['id']})
+            return
+        
+        # Dragging any block of a multi-selection moves the whole group
+        if clicked_block and len(self.selected_blocks) > 1 and clicked_block['id'] in self.selected_blocks:
+            self.start_group_move(event.xdata, event.ydata)
+            return
         
         if clicked_block:
+            self.selected_blocks = {clicked_block['id']}
             self.selected_block = clicked_block
             self.dragging = True
             self.last_mouse_pos = (event.xdata, event.ydata)
@@ -298,18 +754,28 @@ class FloorplanToolV2:
                     self.resize_mode = 'move'
             else:
                 self.resize_mode = 'move'
-                
-            self.update_plot()
+            
+            # Everything until the mouse is released is one undo step
+            self.history.begin(self.resize_mode)
+            self.refresh_overlay()
         else:
             self.selected_block = None
             self.dragging = False
             self.resize_mode = None
             self.selected_port = None
             self.port_dragging = False
-            self.update_plot()
+            if not shift:
+                self.selected_blocks = set()
             
+            # Dragging over empty space selects the blocks inside the rubber band
+            self.rubber_band = {'start': (event.xdata, event.ydata), 'end': (event.xdata, event.ydata),
+                                'extend': shift}
+            self.refresh_overlay()
+            
+    @profiled('on_mouse_move')
     def on_mouse_move(self, event):
         """Handle mouse move events with improved feedback"""
+        self.recorder.capture(self, 'move', event)
         if not self.interactive_var.get():
             return
             
@@ -321,11 +787,12 @@ class FloorplanToolV2:
             handle_type = self.get_handle_at_position(event.xdata, event.ydata, self.selected_block)
             if handle_type != self.hover_handle:
                 self.hover_handle = handle_type
-                self.update_plot()
+                self.update_hover()
         
         # Handle panning
         if self.panning:
             if self.last_mouse_pos is not None:
+                # Keep the grabbed point under the cursor (last_mouse_pos stays the press point)
                 dx = event.xdata - self.last_mouse_pos[0]
                 dy = event.ydata - self.last_mouse_pos[1]
                 
@@ -337,8 +804,15 @@ class FloorplanToolV2:
                 self.ax.set_xlim(x_min - dx, x_max - dx)
                 self.ax.set_ylim(y_min - dy, y_max - dy)
                 
-                self.last_mouse_pos = (event.xdata, event.ydata)
-                self.canvas.draw()
+                self.show_tiles()
+            return
+        
+        if self.rubber_band is not None:
+            self.draw_rubber_band(event.xdata, event.ydata)
+            return
+        
+        if self.group_drag is not None:
+            self.move_group(event.xdata, event.ydata)
             return
         
         # Handle port dragging
@@ -358,7 +832,11 @@ class FloorplanToolV2:
         dx = event.xdata - self.last_mouse_pos[0]
         dy = event.ydata - self.last_mouse_pos[1]
         
+        self.history.touch_block(self.selected_block)
         if self.resize_mode == 'move':
+            # Snap or reject the move against the constraints touching this block
+            dx, dy = self.constrain_move(self.selected_block, dx, dy)
+            
             # Move block
             self.selected_block['x'] += dx
             self.selected_block['y'] += dy
@@ -368,7 +846,8 @@ class FloorplanToolV2:
         elif self.resize_mode == 'width':
             # Resize width (maintain area)
             new_width = self.selected_block['width'] + dx
-            if new_width > 10:  # Minimum size
+            if new_width > 10 and self.constraints_allow(self.selected_block, new_width,
+                                                         self.selected_block['area'] / new_width):
                 old_area = self.selected_block['area']
                 old_width = self.selected_block['width']
                 self.selected_block['width'] = new_width
@@ -376,11 +855,12 @@ class FloorplanToolV2:
                 
                 # Update port positions for width resize
                 self.update_ports_for_block_resize(self.selected_block, 'width', old_width, new_width)
-                print(f"Width resize: {new_width:.1f} × {self.selected_block['height']:.1f} = {old_area:.1f}")
+                self.info_text_var.set(f"Width resize: {new_width:.1f} × {self.selected_block['height']:.1f} = {old_area:.1f}")
         elif self.resize_mode == 'height':
             # Resize height (maintain area)
             new_height = self.selected_block['height'] + dy
-            if new_height > 10:  # Minimum size
+            if new_height > 10 and self.constraints_allow(self.selected_block,
+                                                          self.selected_block['area'] / new_height, new_height):
                 old_area = self.selected_block['area']
                 old_height = self.selected_block['height']
                 self.selected_block['height'] = new_height
@@ -388,12 +868,13 @@ class FloorplanToolV2:
                 
                 # Update port positions for height resize
                 self.update_ports_for_block_resize(self.selected_block, 'height', old_height, new_height)
-                print(f"Height resize: {self.selected_block['width']:.1f} × {new_height:.1f} = {old_area:.1f}")
+                self.info_text_var.set(f"Height resize: {self.selected_block['width']:.1f} × {new_height:.1f} = {old_area:.1f}")
         elif self.resize_mode == 'corner':
             # Reshape by changing aspect ratio while maintaining area
             new_width = self.selected_block['width'] + dx
             new_height = self.selected_block['height'] + dy
-            if new_width > 10 and new_height > 10:
+            if (new_width > 10 and new_height > 10 and
+                    self.constraints_allow(self.selected_block, new_width, self.selected_block['area'] / new_width)):
                 old_area = self.selected_block['area']
                 old_width = self.selected_block['width']
                 old_height = self.selected_block['height']
@@ -402,13 +883,28 @@ class FloorplanToolV2:
                 
                 # Update port positions for corner resize
                 self.update_ports_for_block_resize(self.selected_block, 'corner', old_width, new_width, old_height, new_height)
-                print(f"Corner reshape: {new_width:.1f} × {self.selected_block['height']:.1f} = {old_area:.1f}")
+                self.info_text_var.set(f"Corner reshape: {new_width:.1f} × {self.selected_block['height']:.1f} = {old_area:.1f}")
+        
+        # Re-spread ports on the edges touched by this move or resize
+        self.respread_ports_for_block(self.selected_block)
         
         self.last_mouse_pos = (event.xdata, event.ydata)
         self.update_plot()
         
+    @profiled('on_mouse_release')
     def on_mouse_release(self, event):
         """Handle mouse release events"""
+        self.recorder.capture(self, 'release', event)
+        if self.rubber_band is not None:
+            self.finish_rubber_band()
+        
+        # Re-spread the group's ports once, while the group move is still one undo step
+        if self.group_drag is not None:
+            self.finish_group_move()
+        
+        edited = self.dragging or self.port_dragging
+        panned = self.panning
+        
         self.dragging = False
         self.port_dragging = False
         self.panning = False
@@ -416,13 +912,234 @@ class FloorplanToolV2:
         self.last_mouse_pos = None
         self.hover_handle = None
         
+        # Close the undo step of this drag
+        if edited:
+            self.history.end(self.blocks, self.connections)
+            self.check_journal()
+        
+        # Replace the panning tiles with a full redraw of the new view
+        if panned:
+            self.settle_view()
+        
+        # Refresh crossing highlights once the edit is finished
+        if edited and self.crossings_var.get():
+            self.count_route_crossings()
+        
+        # Keep reported constraint violations current
+        if edited and self.constraint_violations:
+            self.check_constraints()
+        
     def get_block_at_position(self, x, y):
         """Find block at given position"""
         for block in self.blocks:
+            if block['id'] in self.hidden_blocks or self.layer_hidden(block):
+                continue
             if (x >= block['x'] and x <= block['x'] + block['width'] and
                 y >= block['y'] and y <= block['y'] + block['height']):
                 return block
         return None
+    
+    def blocks_in_rect(self, x_min, y_min, x_max, y_max):
+        """Ids of the visible blocks lying entirely inside a rectangle"""
+        geometry = block_geometry(self.blocks)
+        x, y, w, h = geometry.T
+        inside = (x >= x_min) & (y >= y_min) & (x + w <= x_max) & (y + h <= y_max)
+        return {block_id for block_id in np.flatnonzero(inside).tolist()
+                if block_id not in self.hidden_blocks and not self.layer_hidden(self.blocks[block_id])}
+    
+    def set_selection(self, block_ids):
+        """Make block_ids the multi-selection (a single block is also the selected block)"""
+        self.selected_blocks = set(block_ids)
+        if len(self.selected_blocks) == 1:
+            self.selected_block = self.blocks[next(iter(self.selected_blocks))]
+        else:
+            self.selected_block = None
+        self.selection_text_var.set(f"{len(self.selected_blocks)} selected" if self.selected_blocks else "")
+        self.refresh_overlay()
+    
+    def draw_rubber_band(self, x, y):
+        """Stretch the rubber band to (x, y) and blit it over the cached background"""
+        band = self.rubber_band
+        band['end'] = (x, y)
+        (x0, y0) = band['start']
+        if self.band_artist is None or self.band_artist.axes is None:
+            self.band_artist = plt.Rectangle((x0, y0), 0, 0, linewidth=1, linestyle='--', fill=False,
+                                             edgecolor=self.selection_config['color'], animated=True)
+            self.ax.add_patch(self.band_artist)
+        self.band_artist.set_bounds(min(x0, x), min(y0, y), abs(x - x0), abs(y - y0))
+        
+        background = self.selection_background if self.selection_background is not None else self.background
+        if background is None:
+            return
+        self.canvas.restore_region(background)
+        self.ax.draw_artist(self.band_artist)
+        self.canvas.blit(self.fig.bbox)
+    
+    def finish_rubber_band(self):
+        """Select the blocks inside the released rubber band"""
+        band = self.rubber_band
+        self.rubber_band = None
+        if self.band_artist is not None and self.band_artist.axes is not None:
+            self.band_artist.remove()
+        self.band_artist = None
+        
+        (x0, y0), (x1, y1) = band['start'], band['end']
+        found = self.blocks_in_rect(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        self.set_selection(self.selected_blocks | found if band['extend'] else found)
+    
+    def incident_ports(self, block_ids):
+        """Ports on the given blocks and the connections they belong to
+        
+        Returns (ports as (conn index, port type), owning block of each port,
+        connections with both ends on the blocks, connections with one end).
+        """
+        if self.port_assigner.is_built(self.connections):
+            endpoints = self.port_assigner.endpoints_of(block_ids)
+            count = self.port_assigner.num_connections
+            conn_index, owner = endpoints % count, self.port_assigner.block[endpoints]
+            port_types = np.where(endpoints < count, 'start', 'end')
+        else:
+            from_ids = np.array([conn['from'] for conn in self.connections], dtype=np.int64)
+            to_ids = np.array([conn['to'] for conn in self.connections], dtype=np.int64)
+            ids = np.asarray(sorted(block_ids), dtype=np.int64)
+            on_start = np.flatnonzero(np.isin(from_ids, ids))
+            on_end = np.flatnonzero(np.isin(to_ids, ids))
+            conn_index = np.concatenate([on_start, on_end])
+            owner = np.concatenate([from_ids[on_start], to_ids[on_end]])
+            port_types = np.array(['start'] * len(on_start) + ['end'] * len(on_end))
+        
+        ports = [(i, port_type) for i, port_type in zip(conn_index.tolist(), port_types.tolist())
+                 if 'port_positions' in self.connections[i]]
+        owners = [block_id for i, block_id in zip(conn_index.tolist(), owner.tolist())
+                  if 'port_positions' in self.connections[i]]
+        ends = np.bincount(conn_index, minlength=len(self.connections))
+        return ports, owners, set(np.flatnonzero(ends == 2).tolist()), set(np.flatnonzero(ends == 1).tolist())
+    
+    def start_group_move(self, x, y):
+        """Start moving the multi-selection; the whole drag is one undo step"""
+        ids = sorted(self.selected_blocks)
+        blocks = [self.blocks[block_id] for block_id in ids]
+        ports, _, inside, boundary = self.incident_ports(ids)
+        
+        self.history.begin('group move')
+        for block in blocks:
+            self.history.touch_block(block)
+        port_dicts = []
+        for i, port_type in ports:
+            port = self.connections[i]['port_positions'][port_type]
+            self.history.touch_port(i, port_type, port)
+            port_dicts.append(port)
+        
+        # Positions are kept relative to the press, so every frame is one translation of the arrays
+        self.group_drag = {
+            'ids': ids,
+            'blocks': blocks,
+            'block_xy': np.array([(block['x'], block['y']) for block in blocks], dtype=float),
+            'ports': port_dicts,
+            'port_xy': np.array([(port['x'], port['y']) for port in port_dicts], dtype=float).reshape(-1, 2),
+            'inside': {i: np.asarray(self.connection_routes[i], dtype=float)
+                       for i in inside if i in self.connection_routes},
+            'boundary': boundary,
+            'origin': (x, y),
+            'routes': {}
+        }
+        self.dragging = True
+        self.resize_mode = 'group'
+        self.last_mouse_pos = (x, y)
+    
+    def group_allowed(self, dx, dy):
+        """Whether the multi-selection may be translated by (dx, dy) from where the drag started"""
+        if not len(self.constraints):
+            return True
+        drag = self.group_drag
+        for block, (x, y) in zip(drag['blocks'], drag['block_xy'].tolist()):
+            # Alignment groups inside the selection move together, so only hard limits apply
+            rect = (x + dx, y + dy, block['width'], block['height'])
+            if any(kind in ('fixed', 'die', 'keepout')
+                   for kind, _ in self.constraints.block_violations(block['id'], rect, self.block_rect)):
+                return False
+        return True
+    
+    def move_group(self, x, y):
+        """Translate the multi-selection and its ports to follow the mouse"""
+        drag = self.group_drag
+        dx, dy = x - drag['origin'][0], y - drag['origin'][1]
+        if not self.group_allowed(dx, dy):
+            return
+        
+        for block, (bx, by) in zip(drag['blocks'], (drag['block_xy'] + (dx, dy)).tolist()):
+            block['x'], block['y'] = bx, by
+        for port, (px, py) in zip(drag['ports'], (drag['port_xy'] + (dx, dy)).tolist()):
+            port['x'], port['y'] = px, py
+        
+        # Routes with both ends in the group move rigidly and routes outside it do not change;
+        # update_plot rebuilds only the routes crossing the group boundary
+        routes = {i: route for i, route in self.connection_routes.items() if i not in drag['boundary']}
+        routes.update((i, (route + (dx, dy)).tolist()) for i, route in drag['inside'].items())
+        drag['routes'] = routes
+        
+        self.last_mouse_pos = (x, y)
+        self.info_text_var.set(f"Group move: {len(drag['ids'])} blocks by ({dx:.1f}, {dy:.1f})")
+        self.update_plot()
+    
+    def finish_group_move(self):
+        """Re-spread the ports on the edges touched by the group move and redraw every route"""
+        drag = self.group_drag
+        self.group_drag = None
+        if self.auto_ports_var.get() and self.connections:
+            self.apply_port_updates(self.port_assigner.update(self.blocks, self.connections, set(drag['ids'])))
+        self.update_plot()
+    
+    def scale_selection(self, factor=None):
+        """Spread (factor > 1) or compact (factor < 1) the multi-selection about its center
+        
+        Block centers are scaled about the center of the selection's bounding
+        box while block sizes keep their areas; ports move with their blocks.
+        """
+        if len(self.selected_blocks) < 2:
+            messagebox.showinfo("Scale Group", "Select two or more blocks first")
+            return
+        if factor is None:
+            try:
+                factor = float(self.selection_scale_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Scale must be a number")
+                return
+        if factor <= 0:
+            messagebox.showerror("Error", "Scale must be positive")
+            return
+        
+        ids = sorted(self.selected_blocks)
+        geometry = block_geometry(self.blocks)[ids]
+        centers = geometry[:, :2] + geometry[:, 2:] / 2
+        middle = (geometry[:, :2].min(axis=0) + (geometry[:, :2] + geometry[:, 2:]).max(axis=0)) / 2
+        delta = (middle + (centers - middle) * factor) - centers
+        
+        # Reject the whole scale if any block would break a hard constraint
+        if len(self.constraints):
+            for block_id, (x, y, w, h), (dx, dy) in zip(ids, geometry.tolist(), delta.tolist()):
+                if any(kind in ('fixed', 'die', 'keepout') for kind, _ in
+                       self.constraints.block_violations(block_id, (x + dx, y + dy, w, h), self.block_rect)):
+                    messagebox.showinfo("Scale Group", "Scaling would violate a placement constraint")
+                    return
+        
+        self.history.begin('group scale')
+        for block_id, (dx, dy) in zip(ids, delta.tolist()):
+            block = self.blocks[block_id]
+            self.history.touch_block(block)
+            block['x'] += dx
+            block['y'] += dy
+        ports, owners, _, _ = self.incident_ports(ids)
+        shift = dict(zip(ids, delta.tolist()))
+        for (i, port_type), block_id in zip(ports, owners):
+            port = self.connections[i]['port_positions'][port_type]
+            self.history.touch_port(i, port_type, port)
+            port['x'] += shift[block_id][0]
+            port['y'] += shift[block_id][1]
+        if self.auto_ports_var.get() and self.connections:
+            self.apply_port_updates(self.port_assigner.update(self.blocks, self.connections, set(ids)))
+        self.history.end(self.blocks, self.connections)
+        self.update_plot()
         
     def reset_view(self):
         """Reset the plot view to fit all blocks"""
@@ -459,26 +1176,379 @@ class FloorplanToolV2:
                 
             # Process data
             self.process_adjacency_matrix(adjacency_matrix)
+            self.load_design()
             
-            # Update UI
-            self.update_info()
-            self.update_plot()
-            self.update_properties()
-            self.update_connections()
+            # Row hashes let a revised version of this file be applied as an ECO
+            self.eco_source = {'filename': filename, 'mtime': os.path.getmtime(filename),
+                               'hashes': row_hashes(self.hardmacro_names, adjacency_matrix)}
             
             messagebox.showinfo("Success", f"Loaded {len(self.blocks)} hardmacros with {len(self.connections)} connections")
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load CSV: {str(e)}")
             
+    def import_bookshelf(self):
+        """Import a Bookshelf design from its .aux, .nodes, .nets or .pl file"""
+        filename = filedialog.askopenfilename(
+            title="Select Bookshelf design",
+            filetypes=[("Bookshelf files", "*.aux *.nodes *.nets *.pl"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        try:
+            self.load_netlist(read_bookshelf(filename))
+            messagebox.showinfo("Success", f"Loaded {len(self.blocks)} hardmacros with {len(self.connections)} connections")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load Bookshelf design: {str(e)}")
+    
+    def load_netlist(self, netlist):
+        """Load a netlist read by read_bookshelf as multi-pin nets or expanded pairwise connections"""
+        config = self.bookshelf_config
+        if config['net_model'] == 'nets':
+            src, dst, weights = [], [], []
+        else:
+            src, dst, weights = net_edges(netlist['net_ptr'], netlist['net_pins'], len(netlist['names']),
+                                          config['net_model'], config['clique_limit'], config['weighting'])
+            src, dst, weights = src.tolist(), dst.tolist(), weights.tolist()
+        self.hardmacro_names = netlist['names']
+        self.process_edge_list((netlist['widths'] * netlist['heights']).tolist(), src, dst, weights,
+                               sizes=np.column_stack([netlist['widths'], netlist['heights']]).tolist(),
+                               positions=np.column_stack([netlist['x'], netlist['y']]).tolist())
+        if config['net_model'] == 'nets':
+            self.nets = NetList.from_bookshelf(netlist)
+        self.load_design()
+    
+    def reset_design_state(self):
+        """Drop the caches and history derived from the previous design"""
+        self.congestion_map = CongestionMap(self.congestion_config['bin_size'])
+        self.density_map = DensityMap(self.density_config['bin_size'])
+        self.maze_router = self.create_maze_router()
+        self.port_assigner = PortAssigner(self.port_assigner.margin)
+        self.crossing_result = None
+        self.crossing_offenders = []
+        self.cluster_levels = []
+        self.cluster_members = None
+        self.expanded_clusters = set()
+        self.constraints = ConstraintSet(self.constraint_config['cell_size'], self.constraint_config['tolerance'])
+        self.constraint_violations = []
+        self.eco_source = None
+        self.selected_blocks = set()
+        self.group_drag = None
+        self.weight_index = WeightIndex()
+        self.history.clear()
+    
+    def start_journal(self):
+        """Journal edits from here on, starting from a snapshot of the current design"""
+        if self.journal.directory is not None:
+            self.journal.start(copy.deepcopy({
+                'hardmacro_names': self.hardmacro_names,
+                'blocks': self.blocks,
+                'connections': self.connections,
+                'nets': self.nets.to_dict() if self.nets is not None else None
+            }))
+    
+    def load_design(self):
+        """Reset derived state for a newly loaded design and refresh the UI"""
+        self.reset_design_state()
+        self.nets_text_var.set("HPWL: -")
+        self.reset_layers()
+        
+        # Update UI (the first redraw places the ports)
+        self.update_info()
+        self.update_plot()
+        self.update_properties()
+        self.update_connections()
+        self.start_journal()
+    
+    def eco_reload(self, filename=None):
+        """Apply a revised adjacency matrix CSV as an ECO, keeping placement and ports"""
+        if self.eco_source is None:
+            messagebox.showerror("Error", "ECO reload needs a design loaded from an adjacency matrix CSV")
+            return None
+        if filename is None:
+            filename = self.eco_source['filename']
+        try:
+            mtime = os.path.getmtime(filename)
+            names, matrix = read_matrix(filename)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load CSV: {str(e)}")
+            return None
+        
+        diff = diff_design(self.eco_source['hashes'], self.connections, names, matrix)
+        self.apply_eco(diff)
+        self.eco_source = {'filename': filename, 'mtime': mtime, 'hashes': diff['hashes']}
+        
+        self.info_text_var.set(f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)} | "
+                               f"ECO: +{len(diff['added'])}/-{len(diff['removed'])} blocks, "
+                               f"+{len(diff['add'])}/-{len(diff['remove'])}/~{len(diff['update'])} connections")
+        return diff
+    
+    @profiled('eco')
+    def apply_eco(self, diff):
+        """Add, remove and update the blocks and connections of an ECO diff in place
+        
+        Surviving blocks keep their position (and shape, unless their area
+        changed) and surviving connections keep their ports; only ports on
+        the blocks the ECO touched are re-spread. The caches, the undo history
+        and the Properties/Connections rows of survivors are renumbered rather
+        than rebuilt, and only the routes on affected blocks are recomputed.
+        """
+        removed = set(diff['removed'])
+        dropped = set(diff['remove'])
+        
+        # Surviving connections, re-oriented to the row that now contributes them
+        flipped = set()
+        for conn_index, (from_name, to_name, weight) in diff['update'].items():
+            conn = self.connections[conn_index]
+            conn['connections'] = weight
+            if conn['from_name'] != from_name:
+                flipped.add(conn_index)
+                conn['from_name'], conn['to_name'] = from_name, to_name
+                ports = conn.get('port_positions')
+                if ports:
+                    ports['start'], ports['end'] = ports['end'], ports['start']
+        conn_map = {}
+        connections = []
+        for i, conn in enumerate(self.connections):
+            if i not in dropped:
+                conn_map[i] = len(connections)
+                connections.append(conn)
+        
+        # Ports of each block, collected once for the resized blocks below
+        ports_by_name = {}
+        for conn in connections:
+            if 'port_positions' in conn:
+                ports_by_name.setdefault(conn['from_name'], []).append(conn['port_positions']['start'])
+                ports_by_name.setdefault(conn['to_name'], []).append(conn['port_positions']['end'])
+        
+        # Surviving blocks keep their order; resized ones keep their aspect ratio and ports
+        id_map = {}
+        blocks = []
+        touched = set()
+        for block in self.blocks:
+            if block['name'] in removed:
+                continue
+            id_map[block['id']] = len(blocks)
+            block['id'] = len(blocks)
+            blocks.append(block)
+            area = diff['areas'].get(block['name'])
+            if area is not None and area != block['area']:
+                touched.add(block['id'])
+                old_width, old_height = block['width'], block['height']
+                block['area'] = area
+                block['width'] = np.sqrt(area * old_width / old_height)
+                block['height'] = area / block['width']
+                for port in ports_by_name.get(block['name'], []):
+                    self.update_port_for_resize(port, block, 'corner',
+                                                old_width, block['width'], old_height, block['height'])
+        
+        # Added blocks go in a row above the design
+        if diff['added']:
+            x = min((block['x'] for block in blocks), default=100)
+            y = max((block['y'] + block['height'] for block in blocks), default=100 - self.eco_config['spacing'])
+            y += self.eco_config['spacing']
+            for name in diff['added']:
+                area = diff['areas'][name]
+                side_length = np.sqrt(area)
+                blocks.append({'id': len(blocks), 'name': name, 'area': area, 'width': side_length,
+                               'height': side_length, 'x': x, 'y': y, 'shape_type': 'rectangle'})
+                touched.add(len(blocks) - 1)
+                x += side_length + self.eco_config['spacing']
+        
+        index = {block['name']: block['id'] for block in blocks}
+        for from_name, to_name, weight in diff['add']:
+            connections.append({'from_name': from_name, 'to_name': to_name, 'connections': weight})
+            touched.update((index[from_name], index[to_name]))
+        for conn in connections:
+            conn['from'] = index[conn['from_name']]
+            conn['to'] = index[conn['to_name']]
+        
+        # Removed connections change the port offsets on the surviving blocks they ended on
+        affected = set(touched)
+        for i in dropped:
+            conn = self.connections[i]
+            affected.update(index[name] for name in (conn['from_name'], conn['to_name']) if name in index)
+        kept_routes = {}
+        for i, route in self.connection_routes.items():
+            new_index = conn_map.get(i)
+            if new_index is not None and i not in flipped:
+                conn = connections[new_index]
+                if conn['from'] not in affected and conn['to'] not in affected:
+                    kept_routes[new_index] = route
+        
+        if self.selected_block is not None and self.selected_block['name'] in removed:
+            self.selected_block = None
+        self.selected_port = None
+        self.selected_blocks = {id_map[block_id] for block_id in self.selected_blocks if block_id in id_map}
+        self.group_drag = None
+        
+        old_connections = self.connections
+        self.constraints = self.constraints.remap(id_map)
+        self.blocks = blocks
+        self.connections = connections
+        self.hardmacro_names = [block['name'] for block in blocks]
+        self.remap_design_state(id_map, conn_map, flipped)
+        
+        # Place the new ports and re-spread only the edges of touched blocks
+        if self.auto_ports_var.get() and connections:
+            self.port_assigner.sync_edges(connections, [(i, port_type) for i, conn in enumerate(connections)
+                                                        if 'port_positions' in conn
+                                                        for port_type in ('start', 'end')])
+            self.apply_port_updates(self.port_assigner.update(blocks, connections, touched))
+        else:
+            self.initialize_port_positions()
+        
+        self.update_info()
+        self.kept_routes = kept_routes
+        self.update_plot()
+        if self.crossings_var.get() and self.connection_routes and self.refresh_crossings():
+            self.kept_routes = dict(self.connection_routes)
+            self.update_plot()
+        self.update_eco_rows(id_map, conn_map, touched, len(old_connections), diff)
+        self.start_journal()
+    
+    def remap_design_state(self, id_map, conn_map, flipped):
+        """Renumber the caches and history after an ECO (old id -> new id maps)
+        
+        Derived state that depends on the whole design (clustering, crossing
+        counts, the weight order, the last constraint check) is dropped.
+        """
+        port_map = {(i, port_type): (new_index, {'start': 'end', 'end': 'start'}[port_type] if i in flipped
+                                                else port_type)
+                    for i, new_index in conn_map.items() for port_type in ('start', 'end')}
+        self.maze_router.remap(id_map, conn_map)
+        self.congestion_map.remap(conn_map)
+        self.density_map.remap(id_map)
+        self.history.remap(id_map, port_map)
+        self.port_assigner.build(self.blocks, self.connections)
+        self.crossing_result = None
+        self.crossing_offenders = []
+        self.cluster_levels = []
+        self.cluster_members = None
+        self.expanded_clusters = set()
+        self.constraint_violations = []
+        self.weight_index = WeightIndex()
+    
+    def update_eco_rows(self, id_map, conn_map, touched, old_count, diff):
+        """Bring the Properties and Connections tabs in line with an applied ECO row by row"""
+        if self.headless:
+            return
+        
+        # Properties: drop removed blocks, renumber survivors, refresh resized ones, append added ones
+        if len(self.property_frames) != len(id_map) + len(diff['removed']) or not self.property_frames or not self.blocks:
+            self.update_properties()
+        else:
+            frames, variables = [], []
+            for old_id, (frame, block_vars) in enumerate(zip(self.property_frames, self.property_vars)):
+                if old_id not in id_map:
+                    frame.destroy()
+                    continue
+                block = self.blocks[id_map[old_id]]
+                if id_map[old_id] != old_id:
+                    frame.configure(text=f"Block {block['id'] + 1}: {block['name']}")
+                frames.append(frame)
+                variables.append(block_vars)
+            self.property_frames, self.property_vars = frames, variables
+            for block in self.blocks[len(frames):]:
+                self.add_block_properties(block)
+            self.refresh_block_properties(touched)
+        
+        # Connections: drop removed rows, relabel updated ones, append added ones
+        if len(self.connection_rows) != old_count or not self.connection_rows or not self.connections:
+            self.update_connections()
+            return
+        rows = []
+        for old_index, row in enumerate(self.connection_rows):
+            if old_index not in conn_map:
+                row[0].destroy()
+                continue
+            if old_index in diff['update']:
+                conn = self.connections[conn_map[old_index]]
+                row[1].configure(text=f"{conn['from_name']} ↔ {conn['to_name']}")
+                row[2].configure(text=f"Connections: {conn['connections']}")
+            rows.append(row)
+        self.connection_rows = rows
+        for conn in self.connections[len(rows):]:
+            self.add_connection_row(conn)
+    
+    def toggle_eco_watch(self):
+        """Start or stop watching the loaded CSV for revisions"""
+        if self.eco_watch_job is not None:
+            self.root.after_cancel(self.eco_watch_job)
+            self.eco_watch_job = None
+        if self.eco_watch_var.get() and not self.headless:
+            self.eco_watch_job = self.root.after(self.eco_config['watch_ms'], self.poll_eco_file)
+    
+    def poll_eco_file(self):
+        """Apply the watched CSV as an ECO whenever it changes on disk"""
+        self.eco_watch_job = None
+        if self.eco_source is not None and not (self.dragging or self.port_dragging):
+            try:
+                mtime = os.path.getmtime(self.eco_source['filename'])
+            except OSError:
+                mtime = self.eco_source['mtime']
+            if mtime != self.eco_source['mtime']:
+                self.eco_reload()
+        self.toggle_eco_watch()
+    
+    def offer_recovery(self):
+        """Offer to restore the session left behind by a crash"""
+        if not messagebox.askyesno("Recover Session",
+                                   "The previous session did not exit normally.\n"
+                                   "Restore its floorplan from the edit journal?"):
+            self.journal.remove_files()
+            return
+        
+        try:
+            state = load_session(self.journal_config['directory'])
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            messagebox.showerror("Error", f"Failed to recover session: {str(e)}")
+            return
+        if state is None:
+            return
+        
+        self.hardmacro_names = state['hardmacro_names']
+        self.blocks = state['blocks']
+        self.connections = state['connections']
+        self.nets = NetList.from_dict(state['nets']) if state.get('nets') else None
+        self.load_design()
+    
+    def check_journal(self):
+        """Warn once per failure of the journal writer thread"""
+        error = self.journal.error
+        if error is None or error is self.journal_error_reported:
+            return
+        self.journal_error_reported = error
+        messagebox.showwarning("Journal", f"The crash recovery journal failed: {error}\n"
+                               "Edits made from now on may not be recoverable.")
+    
+    def on_close(self):
+        """Stop the journal writer and discard the journal on a normal exit"""
+        self.journal.close(discard=True)
+        self.root.destroy()
+    
     def process_adjacency_matrix(self, matrix):
         """Process adjacency matrix into blocks and connections"""
+        matrix = np.asarray(matrix)
+        
+        # Diagonal holds the areas, the upper triangle the connection counts
+        src, dst = np.nonzero(np.triu(matrix, 1) > 0)
+        self.process_edge_list(np.diagonal(matrix).tolist(), src.tolist(), dst.tolist(),
+                               matrix[src, dst].tolist())
+    
+    def process_edge_list(self, areas, src, dst, weights, sizes=None, positions=None):
+        """Build blocks and connections from block areas and (src, dst, weight) connections
+        
+        sizes optionally gives (width, height) per block instead of squares, and
+        positions a lower-left (x, y) per block (NaN keeps the default spread).
+        """
         self.blocks = []
         self.connections = []
+        self.nets = None
         
-        for i in range(len(matrix)):
+        for i, area in enumerate(areas):
             # Create block
-            area = matrix[i][i]
             side_length = np.sqrt(area)
             
             block = {
@@ -491,27 +1561,32 @@ class FloorplanToolV2:
                 'y': 100 + (i // 3) * 400,
                 'shape_type': 'rectangle'  # Default shape type
             }
+            if sizes is not None:
+                block['width'], block['height'] = sizes[i]
+            if positions is not None and positions[i][0] == positions[i][0]:
+                block['x'], block['y'] = positions[i]
             self.blocks.append(block)
             
-        # Find connections
-        for i in range(len(matrix)):
-            for j in range(i+1, len(matrix)):
-                if matrix[i][j] > 0:
-                    connection = {
-                        'from': i,
-                        'to': j,
-                        'from_name': self.hardmacro_names[i],
-                        'to_name': self.hardmacro_names[j],
-                        'connections': matrix[i][j]
-                    }
-                    self.connections.append(connection)
+        # Create connections
+        for i, j, weight in zip(src, dst, weights):
+            connection = {
+                'from': i,
+                'to': j,
+                'from_name': self.hardmacro_names[i],
+                'to_name': self.hardmacro_names[j],
+                'connections': weight
+            }
+            self.connections.append(connection)
                     
     def update_info(self):
         """Update info label"""
         if self.blocks:
-            self.info_label.config(text=f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)}")
+            text = f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)}"
+            if self.nets is not None:
+                text += f" | Nets: {len(self.nets)}"
+            self.info_text_var.set(text)
         else:
-            self.info_label.config(text="No data loaded")
+            self.info_text_var.set("No data loaded")
             
     def find_edge_connection_points(self, from_block, to_block, connection_index=0):
         """Find the best edge points for connecting two blocks with spread positioning"""
@@ -619,7 +1694,18 @@ class FloorplanToolV2:
         """Find if a port bubble is at the given position"""
         port_radius = self.PORT_RADIUS
         
+        # Ports are not drawn while connections are bundled
+        if self.bundle_var.get():
+            return None, None
+        
+        filtered = self.weight_index.visible if self.weight_index.is_built(self.connections) else None
         for i, conn in enumerate(self.connections):
+            if filtered is not None and not filtered[i]:
+                continue
+            if conn['from'] in self.hidden_blocks or conn['to'] in self.hidden_blocks:
+                continue
+            if self.layer_hidden(self.blocks[conn['from']]) or self.layer_hidden(self.blocks[conn['to']]):
+                continue
             if 'port_positions' in conn:
                 start_port = conn['port_positions']['start']
                 end_port = conn['port_positions']['end']
@@ -638,6 +1724,7 @@ class FloorplanToolV2:
         """Move a port along the full perimeter of its block"""
         conn = self.connections[conn_index]
         port = conn['port_positions'][port_type]
+        self.history.touch_port(conn_index, port_type, port)
         
         # Determine which block this port belongs to
         if port_type == 'start':
@@ -678,22 +1765,27 @@ class FloorplanToolV2:
             port['x'] = max(block_x, min(block_x + block_w, new_x))
             port['y'] = block_y + block_h
             port['edge'] = 'top'
+        
+        # Hand-placed ports are left alone by automatic port spreading
+        port['pinned'] = True
     
     def update_ports_for_block_movement(self, block, dx, dy):
         """Update port positions when a block is moved"""
         block_id = block['id']
         
-        for conn in self.connections:
+        for i, conn in enumerate(self.connections):
             if 'port_positions' in conn:
                 # Update start port if it belongs to this block
                 if conn['from'] == block_id:
                     start_port = conn['port_positions']['start']
+                    self.history.touch_port(i, 'start', start_port)
                     start_port['x'] += dx
                     start_port['y'] += dy
                 
                 # Update end port if it belongs to this block
                 if conn['to'] == block_id:
                     end_port = conn['port_positions']['end']
+                    self.history.touch_port(i, 'end', end_port)
                     end_port['x'] += dx
                     end_port['y'] += dy
     
@@ -701,14 +1793,16 @@ class FloorplanToolV2:
         """Update port positions when a block is resized"""
         block_id = block['id']
         
-        for conn in self.connections:
+        for i, conn in enumerate(self.connections):
             if 'port_positions' in conn:
                 # Update start port if it belongs to this block
                 if conn['from'] == block_id:
+                    self.history.touch_port(i, 'start', conn['port_positions']['start'])
                     self.update_port_for_resize(conn['port_positions']['start'], block, resize_type, old_width, new_width, old_height, new_height)
                 
                 # Update end port if it belongs to this block
                 if conn['to'] == block_id:
+                    self.history.touch_port(i, 'end', conn['port_positions']['end'])
                     self.update_port_for_resize(conn['port_positions']['end'], block, resize_type, old_width, new_width, old_height, new_height)
     
     def get_connection_offset(self, conn, start_port, end_port, base_offset):
@@ -742,58 +1836,1109 @@ class FloorplanToolV2:
         offset_multiplier = max(same_start_edge_count, same_end_edge_count)
         return base_offset + (offset_multiplier * 20)  # Add 20 units per overlapping connection
     
-    def update_port_for_resize(self, port, block, resize_type, old_width, new_width, old_height=None, new_height=None):
-        """Update a single port position during block resize"""
-        edge = port['edge']
-        block_x, block_y = block['x'], block['y']
-        block_w, block_h = block['width'], block['height']
+    def initialize_port_positions(self):
+        """Place ports for connections that do not have port positions yet"""
+        if self.auto_ports_var.get():
+            if any('port_positions' not in conn for conn in self.connections):
+                self.assign_ports()
+            return
         
-        if resize_type == 'width':
-            if edge == 'right':
-                # Port stays on right edge, update x position
-                port['x'] = block_x + block_w
-            elif edge == 'left':
-                # Port stays on left edge, no change needed
-                port['x'] = block_x
-            elif edge == 'top':
-                # Port on top edge - adjust x position proportionally
-                if old_width > 0:
-                    old_relative_x = (port['x'] - block_x) / old_width
-                    port['x'] = block_x + (old_relative_x * new_width)
-                # Ensure port stays on top edge
-                port['y'] = block_y + block_h
-            elif edge == 'bottom':
-                # Port on bottom edge - adjust x position proportionally
-                if old_width > 0:
-                    old_relative_x = (port['x'] - block_x) / old_width
-                    port['x'] = block_x + (old_relative_x * new_width)
-                # Ensure port stays on bottom edge
-                port['y'] = block_y
+        for i, conn in enumerate(self.connections):
+            if 'port_positions' not in conn:
+                from_block = self.blocks[conn['from']]
+                to_block = self.blocks[conn['to']]
+                start_point, end_point = self.find_edge_connection_points(from_block, to_block, i)
+                conn['port_positions'] = {
+                    'start': {'x': start_point[0], 'y': start_point[1], 'edge': self.get_edge_type(start_point, from_block)},
+                    'end': {'x': end_point[0], 'y': end_point[1], 'edge': self.get_edge_type(end_point, to_block)}
+                }
+    
+    def apply_port_updates(self, updates):
+        """Write (conn index, port type, x, y, edge) port updates into the connections"""
+        for conn_index, port_type, x, y, edge in updates:
+            ports = self.connections[conn_index].setdefault('port_positions', {})
+            self.history.touch_port(conn_index, port_type, ports.get(port_type))
+            port = ports.setdefault(port_type, {})
+            port['x'] = x
+            port['y'] = y
+            port['edge'] = edge
+    
+    def assign_ports(self):
+        """Spread all unpinned ports evenly along their block edges"""
+        self.port_assigner.build(self.blocks, self.connections)
+        self.apply_port_updates(self.port_assigner.assign_all(self.blocks, self.connections))
+    
+    def respread_ports_for_block(self, block):
+        """Re-spread only the edges touched by moving or resizing a block"""
+        if self.auto_ports_var.get() and self.connections:
+            self.apply_port_updates(self.port_assigner.update(self.blocks, self.connections, {block['id']}))
+    
+    def spread_all_ports(self):
+        """Release hand-placed ports and re-spread every port in the design"""
+        if not self.connections:
+            return
+        self.history.begin('spread')
+        for i, conn in enumerate(self.connections):
+            for port_type, port in conn.get('port_positions', {}).items():
+                self.history.touch_port(i, port_type, port)
+                port.pop('pinned', None)
+        self.assign_ports()
+        self.history.end(self.blocks, self.connections)
+        self.update_plot()
+    
+    def build_connection_route(self, conn, connection_offset=None, path=None):
+        """Build the double Z route polyline for a connection"""
+        start_port = conn['port_positions']['start']
+        end_port = conn['port_positions']['end']
         
-        elif resize_type == 'height':
-            if edge == 'top':
-                # Port stays on top edge, update y position
-                port['y'] = block_y + block_h
-            elif edge == 'bottom':
-                # Port stays on bottom edge, no change needed
-                port['y'] = block_y
-            elif edge == 'right':
-                # Port on right edge - adjust y position proportionally
-                if old_height and old_height > 0:
-                    old_relative_y = (port['y'] - block_y) / old_height
-                    port['y'] = block_y + (old_relative_y * new_height)
-                # Ensure port stays on right edge
-                port['x'] = block_x + block_w
-            elif edge == 'left':
-                # Port on left edge - adjust y position proportionally
-                if old_height and old_height > 0:
-                    old_relative_y = (port['y'] - block_y) / old_height
-                    port['y'] = block_y + (old_relative_y * new_height)
-                # Ensure port stays on left edge
-                port['x'] = block_x
+        t = self.profiler.tick()
+        if connection_offset is None:
+            # Calculate perpendicular offset from edge
+            offset = 50  # Increased distance to move perpendicular to edge for better separation
+            
+            # First, determine the offset for this specific connection to avoid overlap
+            connection_offset = self.get_connection_offset(conn, start_port, end_port, offset)
+            t = self.profiler.add('offsets', t)
         
-        elif resize_type == 'corner':
-            # Handle both width and height changes
+        route = build_route_points(start_port, end_port, connection_offset,
+                                   self.connection_mode_var.get(), path)
+        self.profiler.add('routes', t)
+        return route
+    
+    def create_maze_router(self):
+        """Create a maze router from the current maze configuration"""
+        return MazeRouter(cell_size=self.maze_config['cell_size'],
+                          clearance=self.maze_config['clearance'],
+                          capacity=self.maze_config['capacity'])
+    
+    def visible_offsets(self, mask):
+        """Z-connector offsets of every connection, with only the connections in mask counted as neighbours"""
+        offsets = np.full(len(self.connections), 50.0)
+        keys = np.flatnonzero(mask)
+        if len(keys):
+            offsets[keys] = connection_offsets([self.connections[i] for i in keys.tolist()], 50)
+        return offsets
+    
+    def get_maze_requests(self, mask=None):
+        """Compute Z-connector offsets and middle-leg endpoints for the connections in mask (default all)"""
+        if mask is None:
+            mask = np.ones(len(self.connections), dtype=bool)
+        offsets = {}
+        requests = {}
+        all_offsets = self.visible_offsets(mask).tolist()
+        for i in np.flatnonzero(mask).tolist():
+            conn = self.connections[i]
+            start_port = conn['port_positions']['start']
+            end_port = conn['port_positions']['end']
+            connection_offset = all_offsets[i]
+            
+            # The maze router connects the second points of both Z-connectors
+            _, s2 = z_connector(start_port, end_port, connection_offset)
+            _, d2 = z_connector(end_port, start_port, connection_offset)
+            offsets[i] = connection_offset
+            requests[i] = (s2, d2)
+        return offsets, requests
+    
+    def update_maze_routes(self, mask=None):
+        """Reroute middle legs (of the connections in mask) whose endpoints or corridor changed"""
+        self.maze_router.set_obstacles(self.blocks, self.get_design_bounds(self.maze_config['padding']),
+                                       self.maze_config['margin'])
+        offsets, requests = self.get_maze_requests(mask)
+        
+        paths = self.maze_router.route_connections(requests, self.maze_config['processes'],
+                                                   self.maze_config['parallel_threshold'])
+        return {i: (offsets[i], paths[i]) for i in requests}
+    
+    def reroute_all_connections(self):
+        """Rip up every maze route and reroute the whole design with congestion negotiation"""
+        if not self.blocks:
+            return
+        
+        self.connection_mode_var.set("maze")
+        self.initialize_port_positions()
+        self.maze_router = self.create_maze_router()
+        self.maze_router.set_obstacles(self.blocks, self.get_design_bounds(self.maze_config['padding']),
+                                       self.maze_config['margin'])
+        offsets, requests = self.get_maze_requests(self.weight_filter_mask())
+        
+        self.maze_router.reroute_all(requests, self.maze_config['processes'],
+                                     self.maze_config['parallel_threshold'])
+        overflow = self.maze_router.rip_up_and_reroute(requests, self.maze_config['rrr_iterations'])
+        
+        self.info_text_var.set(f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)} | "
+                                    f"Maze overflow: {overflow:.0f}")
+        self.update_plot()
+    
+    def get_design_bounds(self, padding=0):
+        """Get (x_min, y_min, x_max, y_max) of all blocks plus padding"""
+        x_min = min(block['x'] for block in self.blocks) - padding
+        y_min = min(block['y'] for block in self.blocks) - padding
+        x_max = max(block['x'] + block['width'] for block in self.blocks) + padding
+        y_max = max(block['y'] + block['height'] for block in self.blocks) + padding
+        return x_min, y_min, x_max, y_max
+    
+    def update_congestion_map(self):
+        """Bring the congestion map up to date with the current routes"""
+        bounds = self.get_design_bounds()
+        
+        # Regrow the grid only when not dragging, so drags stay incremental
+        if not self.congestion_map.covers(bounds) and not (self.dragging or self.port_dragging):
+            self.congestion_map.reset(self.get_design_bounds(self.congestion_config['padding']),
+                                      self.congestion_config['bin_size'])
+        
+        weights = {i: self.connections[i]['connections'] for i in self.connection_routes}
+        self.congestion_map.update(self.connection_routes, weights)
+    
+    def draw_congestion_overlay(self):
+        """Draw the congestion map as a semi-transparent image"""
+        self.update_congestion_map()
+        grid = self.congestion_map.grid
+        if not grid.size:
+            return
+        
+        # Hide empty bins so the floorplan stays visible underneath
+        image = np.ma.masked_equal(grid.T, 0)
+        self.ax.imshow(image, extent=self.congestion_map.extent, origin='lower',
+                      cmap=self.congestion_config['cmap'], alpha=self.congestion_config['alpha'],
+                      interpolation='nearest', zorder=3)
+        
+        stats = self.congestion_map.stats()
+        self.ax.text(0.01, 0.99, f"Congestion peak: {stats['peak']:.0f} | mean: {stats['mean']:.1f}",
+                    transform=self.ax.transAxes, ha='left', va='top', fontsize=8,
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8))
+    
+    def density_bounds(self):
+        """Area covered by the density map: the die, or the blocks plus padding"""
+        if self.constraints.die is not None:
+            return self.constraints.die
+        return self.get_design_bounds(self.density_config['padding'])
+    
+    @profiled('density')
+    def update_density_map(self):
+        """Bring the density map up to date with the current block geometry"""
+        # Regrow the grid only when not dragging, so drags stay incremental
+        needed = self.get_design_bounds() if self.constraints.die is None else self.constraints.die
+        if not self.density_map.covers(needed) and not (self.dragging or self.port_dragging):
+            self.density_map.reset(self.density_bounds(), self.density_config['bin_size'])
+        self.density_map.update({block['id']: self.block_rect(block['id']) for block in self.blocks})
+    
+    def move_to_best_slot(self):
+        """Move the selected block into the least covered window of its size"""
+        block = self.selected_block
+        if block is None:
+            messagebox.showinfo("Best Slot", "Select a block first")
+            return
+        
+        self.update_density_map()
+        x, y, w, h = self.block_rect(block['id'])
+        with self.density_map.excluding(block['id']) as density:
+            slot = density.find_slot(w, h)
+            if slot is None:
+                messagebox.showinfo("Best Slot", f"No {int(w)}×{int(h)} window fits the density map")
+                return
+            rect = self.constrain_geometry(block, slot[0], slot[1], w, h)
+            if rect is None:
+                messagebox.showinfo("Best Slot", "The best slot violates a placement constraint")
+                return
+            before = density.density(x, y, x + w, y + h)
+            after = density.density(rect[0], rect[1], rect[0] + w, rect[1] + h)
+        
+        dx, dy = rect[0] - x, rect[1] - y
+        self.history.begin('slot')
+        self.history.touch_block(block)
+        block['x'] += dx
+        block['y'] += dy
+        self.update_ports_for_block_movement(block, dx, dy)
+        self.respread_ports_for_block(block)
+        self.history.end(self.blocks, self.connections)
+        self.update_plot()
+        self.update_properties()
+        self.info_text_var.set(f"Moved {block['name']} to ({rect[0]:.0f}, {rect[1]:.0f}): "
+                               f"footprint covered by other blocks {before:.0%} → {after:.0%}")
+    
+    def draw_density_overlay(self):
+        """Draw the utilization heatmap and the largest whitespace rectangles"""
+        self.update_density_map()
+        config = self.density_config
+        if self.density_var.get():
+            self.ax.imshow(self.density_map.utilization().T, extent=self.density_map.extent, origin='lower',
+                          cmap=config['cmap'], alpha=config['alpha'], vmin=0, vmax=1,
+                          interpolation='nearest', zorder=3)
+        text = ""
+        if self.whitespace_var.get():
+            empty = self.density_map.largest_empty(config['whitespace_count'], config['empty_threshold'])
+            for x0, y0, x1, y1 in empty:
+                self.ax.add_patch(plt.Rectangle((x0, y0), x1 - x0, y1 - y0, fill=False, linestyle='--',
+                                                linewidth=2, edgecolor=config['whitespace_color'], zorder=4))
+                self.ax.text((x0 + x1) / 2, (y0 + y1) / 2, f"{int(x1 - x0)}×{int(y1 - y0)}", ha='center',
+                            va='center', fontsize=8, color=config['whitespace_color'], zorder=4)
+            if empty:
+                x0, y0, x1, y1 = empty[0]
+                text = f" | largest whitespace: {int(x1 - x0)}×{int(y1 - y0)}"
+        
+        stats = self.density_map.stats()
+        self.ax.text(0.01, 0.01, f"Utilization: {stats['utilization']:.1%} | peak bin: {stats['peak']:.0%} | "
+                    f"overfull bins: {stats['overfull_bins']}{text}",
+                    transform=self.ax.transAxes, ha='left', va='bottom', fontsize=8,
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8))
+    
+    def set_congestion_bin_size(self):
+        """Apply the bin size entered in the congestion controls"""
+        try:
+            bin_size = float(self.congestion_bin_var.get())
+            if bin_size <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Bin size must be a positive number")
+            return
+        
+        self.congestion_config['bin_size'] = bin_size
+        if self.blocks:
+            self.congestion_map.reset(self.get_design_bounds(self.congestion_config['padding']), bin_size)
+        self.update_plot()
+    
+    def export_congestion(self):
+        """Export per-bin congestion (current, peak and mean) to CSV"""
+        if not self.blocks:
+            messagebox.showerror("Error", "No data loaded")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export congestion map",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        try:
+            if not self.congestion_var.get():
+                self.update_congestion_map()
+            self.congestion_map.export_csv(filename)
+            stats = self.congestion_map.stats()
+            messagebox.showinfo("Success", f"Exported {stats['bins']} bins "
+                                f"(peak {stats['peak']:.0f}, mean {stats['mean']:.1f})")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export congestion: {str(e)}")
+    
+    def toggle_profiling(self):
+        """Switch the frame timers on or off (collected frames are kept)"""
+        self.profiler.enabled = self.profile_var.get()
+        if not self.profiler.enabled:
+            self.profile_overlay_var.set(False)
+        self.update_plot()
+    
+    def draw_profile_overlay(self):
+        """Show p50/p95 frame times of the redraws and mouse handlers on the canvas"""
+        lines = []
+        for name, (count, p50, p95) in sorted(self.profiler.summary().items()):
+            lines.append(f"{name}: p50 {p50:.1f} ms  p95 {p95:.1f} ms  ({count})")
+        if not self.profiler.enabled:
+            lines.append("Timers off")
+        self.ax.text(0.01, 0.99, '\n'.join(lines) or "No frames yet", transform=self.ax.transAxes,
+                    ha='left', va='top', fontsize=8, family='monospace',
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="lightyellow", alpha=0.9))
+    
+    def toggle_recording(self):
+        """Start recording mouse events, or stop and save the recording"""
+        if self.record_var.get():
+            if not self.blocks:
+                messagebox.showerror("Error", "No data loaded")
+                self.record_var.set(False)
+                return
+            self.recorder.start(self)
+            self.info_text_var.set("Recording interaction...")
+            return
+        
+        count = self.recorder.stop(self)
+        self.update_info()
+        filename = filedialog.asksaveasfilename(
+            title="Save interaction recording",
+            defaultextension=".npz",
+            filetypes=[("Recordings", "*.npz"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        try:
+            self.recorder.save(filename)
+            messagebox.showinfo("Success", f"Saved {count} mouse events\n"
+                                f"Replay with: python floorplan_replay.py {filename}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save recording: {str(e)}")
+    
+    def export_geometry(self):
+        """Export blocks, ports and routes (current connection mode) as SVG, JSON lines or DEF"""
+        if not self.blocks:
+            messagebox.showerror("Error", "No design loaded")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export floorplan",
+            defaultextension=".svg",
+            filetypes=[("SVG drawing", "*.svg"), ("JSON lines", "*.jsonl"), ("DEF placement", "*.def")]
+        )
+        if not filename:
+            return
+        if os.path.splitext(filename)[1].lower() not in EXPORTERS:
+            messagebox.showerror("Error", f"Unsupported export format: {filename}")
+            return
+        
+        try:
+            self.initialize_port_positions()
+            mode = self.connection_mode_var.get()
+            maze_routes = self.update_maze_routes() if mode == "maze" else None
+            # Multi-pin nets are exported with the same ports and route trees as drawn
+            nets = (net_routes(self.nets, self.blocks, self.net_style_var.get(), self.net_config['port_margin'])
+                    if self.nets is not None else None)
+            count = export_floorplan(filename, self.blocks, self.connections, mode, maze_routes, nets,
+                                     port_radius=self.PORT_RADIUS)
+            messagebox.showinfo("Success", f"Exported {len(self.blocks)} blocks, "
+                                f"{len(self.connections)} connections and "
+                                f"{len(self.nets) if self.nets is not None else 0} nets ({count} lines)")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export floorplan: {str(e)}")
+    
+    def export_trace(self):
+        """Export the buffered frame timings as a Chrome trace JSON file"""
+        if not self.profiler.events:
+            messagebox.showerror("Error", "No timings recorded (enable Timers first)")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export frame trace",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        try:
+            count = self.profiler.export_chrome_trace(filename)
+            messagebox.showinfo("Success", f"Exported {count} trace events")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export trace: {str(e)}")
+    
+    def count_route_crossings(self):
+        """Count crossings between the drawn routes and highlight the worst offenders"""
+        if not self.connection_routes:
+            self.crossings_text_var.set("Total: -")
+            return
+        
+        self.refresh_crossings()
+        self.crossings_var.set(True)
+        self.update_plot()
+    
+    def refresh_crossings(self):
+        """Recount the crossings of the drawn routes; returns whether the worst offenders changed"""
+        offenders = self.crossing_offenders
+        self.crossing_result = count_crossings(self.connection_routes)
+        self.crossing_offenders = worst_offenders(self.crossing_result['per_connection'],
+                                                  self.crossing_config['highlight_count'])
+        
+        text = f"Total: {self.crossing_result['total']}"
+        if self.crossing_offenders:
+            worst = self.crossing_offenders[0]
+            conn = self.connections[worst]
+            text += (f" | Worst: {conn['from_name']} ↔ {conn['to_name']} "
+                     f"({self.crossing_result['per_connection'][worst]})")
+        self.crossings_text_var.set(text)
+        return list(self.crossing_offenders) != list(offenders)
+    
+    def optimize_block_shapes(self):
+        """Pick width/height of every soft macro at once with shape curves"""
+        if not self.blocks:
+            return
+        
+        config = self.shape_config
+        placement, summary = optimize_shapes(self.blocks, self.connections,
+                                             config['aspect_min'], config['aspect_max'],
+                                             config['samples'], config['curve_points'],
+                                             config['wl_weight'], config['wl_candidates'])
+        self.history.begin('shapes')
+        held = self.apply_block_geometry(placement)
+        self.history.end(self.blocks, self.connections)
+        
+        self.auto_resize_view = True
+        self.update_plot()
+        self.update_properties()
+        self.info_text_var.set(f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)} | "
+                                    f"Outline: {summary['width']:.0f}×{summary['height']:.0f}" +
+                                    self.held_text(held))
+    
+    def constrained_geometry(self, geometry):
+        """Resolve a proposed {block index: rect} through the constraints
+        
+        Fixed blocks are left out and blocks the constraints reject keep their
+        current rectangle. Groups are snapped against the proposed geometry of
+        the other members. Returns (resolved geometry, number of blocks held).
+        """
+        proposed = {i: rect for i, rect in geometry.items() if i not in self.constraints.fixed}
+        held = len(geometry) - len(proposed)
+        snap = self.constraint_config['snap']
+        
+        def rect_of(block_id):
+            return proposed[block_id] if block_id in proposed else self.block_rect(block_id)
+        
+        for block_index in list(proposed):
+            rect = self.constraints.resolve(block_index, proposed[block_index], rect_of, snap)
+            if rect is None:
+                rect = self.block_rect(block_index)
+                held += 1
+            proposed[block_index] = rect
+        return proposed, held
+    
+    def apply_block_geometry(self, geometry):
+        """Apply {block index: (x, y, width, height)} with ports following each block
+        
+        With constraints loaded the geometry is resolved first; returns the
+        number of blocks the constraints held in place.
+        """
+        held = 0
+        if len(self.constraints):
+            geometry, held = self.constrained_geometry(geometry)
+        
+        # Collect each block's ports once instead of scanning connections per block
+        ports_by_block = {}
+        for i, conn in enumerate(self.connections):
+            if 'port_positions' in conn:
+                ports_by_block.setdefault(conn['from'], []).append((i, 'start'))
+                ports_by_block.setdefault(conn['to'], []).append((i, 'end'))
+        
+        for block_index, (x, y, width, height) in geometry.items():
+            block = self.blocks[block_index]
+            self.history.touch_block(block)
+            ports = []
+            for conn_index, port_type in ports_by_block.get(block['id'], []):
+                port = self.connections[conn_index]['port_positions'][port_type]
+                self.history.touch_port(conn_index, port_type, port)
+                ports.append(port)
+            
+            # Move the block and translate its ports
+            dx, dy = x - block['x'], y - block['y']
+            block['x'], block['y'] = x, y
+            for port in ports:
+                port['x'] += dx
+                port['y'] += dy
+            
+            # Reshape it and keep ports on their edges (same as a corner resize)
+            old_width, old_height = block['width'], block['height']
+            block['width'], block['height'] = width, height
+            for port in ports:
+                self.update_port_for_resize(port, block, 'corner', old_width, width, old_height, height)
+        
+        if self.auto_ports_var.get() and self.connections:
+            self.assign_ports()
+        return held
+    
+    def held_text(self, held):
+        """Status suffix for blocks the constraints kept in place"""
+        return f" | Held by constraints: {held}" if held else ""
+    
+    def on_history_key(self, action):
+        """Run undo/redo from the keyboard unless a text field has the focus"""
+        try:
+            focus = self.root.focus_get()
+        except KeyError:
+            # Tk popdown menus (combobox lists) have no Python widget
+            focus = None
+        if isinstance(focus, (tk.Entry, ttk.Entry, tk.Text)):
+            return
+        action()
+    
+    def undo(self):
+        """Revert the last edit gesture"""
+        self.apply_history_step('Undo', self.history.undo(self.blocks, self.connections))
+    
+    def redo(self):
+        """Re-apply the last undone edit gesture"""
+        self.apply_history_step('Redo', self.history.redo(self.blocks, self.connections))
+    
+    def apply_history_step(self, action, step):
+        """Refresh caches and the view after an undo or redo touched the model"""
+        if step is None:
+            return
+        self.check_journal()
+        self.port_assigner.sync_edges(self.connections, [key for key, _, _ in step['ports']])
+        
+        # Only the routes on the touched blocks change (a moved port also shifts the
+        # offsets of the other ports on its block)
+        block_ids = [block_id for block_id, _, _ in step['blocks']]
+        owners = set(block_ids)
+        for (conn_index, port_type), _, _ in step['ports']:
+            owners.add(self.connections[conn_index]['from' if port_type == 'start' else 'to'])
+        changed = {conn_index for (conn_index, _), _, _ in step['ports']}
+        if owners:
+            _, _, inside, boundary = self.incident_ports(owners)
+            changed |= inside | boundary
+        self.kept_routes = {i: route for i, route in self.connection_routes.items() if i not in changed}
+        self.update_plot()
+        if self.crossings_var.get() and self.connection_routes and self.refresh_crossings():
+            # The highlighted offenders moved; every route is already up to date
+            self.kept_routes = dict(self.connection_routes)
+            self.update_plot()
+        self.refresh_block_properties(block_ids)
+        self.info_text_var.set(f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)} | "
+                                    f"{action}: {step['label']}")
+    
+    def block_rect(self, block_id):
+        """(x, y, width, height) of a block"""
+        block = self.blocks[block_id]
+        return (block['x'], block['y'], block['width'], block['height'])
+    
+    def constrain_geometry(self, block, x, y, width, height, snap=None):
+        """Nearest (x, y, width, height) allowed by the block's constraints, or None if rejected"""
+        if not len(self.constraints):
+            return (x, y, width, height)
+        if snap is None:
+            snap = self.constraint_config['snap']
+        return self.constraints.resolve(block['id'], (x, y, width, height), self.block_rect, snap)
+    
+    def constrain_move(self, block, dx, dy):
+        """Allowed (dx, dy) of a block move; (0, 0) if the move is rejected"""
+        if not len(self.constraints):
+            return dx, dy
+        rect = self.constrain_geometry(block, block['x'] + dx, block['y'] + dy, block['width'], block['height'])
+        if rect is None:
+            return 0.0, 0.0
+        return rect[0] - block['x'], rect[1] - block['y']
+    
+    def constraints_allow(self, block, width, height):
+        """Whether resizing a block in place to width x height satisfies its constraints"""
+        if not len(self.constraints):
+            return True
+        return self.constrain_geometry(block, block['x'], block['y'], width, height, snap=False) is not None
+    
+    def load_constraints(self):
+        """Load placement constraints from a JSON file"""
+        if not self.blocks:
+            messagebox.showerror("Error", "No design loaded")
+            return
+        
+        filename = filedialog.askopenfilename(
+            title="Select constraints",
+            filetypes=[("JSON (die, fixed, keepouts, align, abut)", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        try:
+            self.constraints = ConstraintSet.load(filename, self.hardmacro_names, self.blocks,
+                                                  self.constraint_config['cell_size'],
+                                                  self.constraint_config['tolerance'])
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load constraints: {str(e)}")
+            return
+        self.check_constraints()
+    
+    def toggle_fixed_block(self):
+        """Pin the selected block at its current geometry, or release it"""
+        block = self.selected_block
+        if block is None:
+            messagebox.showinfo("Fix Block", "Select a block first")
+            return
+        if block['id'] in self.constraints.fixed:
+            self.constraints.unfix(block['id'])
+        else:
+            self.constraints.fix(block)
+        self.update_plot()
+    
+    @profiled('constraints')
+    def check_constraints(self):
+        """Check every constraint on the whole design and report the violations"""
+        if not self.blocks:
+            return []
+        self.constraint_violations = self.constraints.violations(block_geometry(self.blocks))
+        counts = {}
+        for kind, _, _ in self.constraint_violations:
+            counts[kind] = counts.get(kind, 0) + 1
+        summary = ", ".join(f"{kind}: {count}" for kind, count in sorted(counts.items()))
+        self.constraints_text_var.set(f"Violations: {summary}" if counts else
+                                      f"{len(self.constraints)} constraints, no violations")
+        self.update_plot()
+        return self.constraint_violations
+    
+    def draw_constraints(self):
+        """Draw the die boundary, keep-out regions and blocks violating the last check"""
+        config = self.constraint_config
+        if self.constraints.die is not None:
+            x0, y0, x1, y1 = self.constraints.die
+            self.ax.add_patch(plt.Rectangle((x0, y0), x1 - x0, y1 - y0, fill=False, linestyle='--',
+                                            linewidth=2, edgecolor=config['die_color']))
+        for x0, y0, x1, y1 in self.constraints.keepouts.rects.values():
+            self.ax.add_patch(plt.Rectangle((x0, y0), x1 - x0, y1 - y0, facecolor=config['keepout_color'],
+                                            edgecolor=config['keepout_color'], hatch='xx', alpha=0.4))
+        violating = {block_id for _, blocks, _ in self.constraint_violations for block_id in blocks}
+        for block_id in violating:
+            x, y, w, h = self.block_rect(block_id)
+            self.ax.add_patch(plt.Rectangle((x, y), w, h, fill=False, linewidth=3, edgecolor='red', linestyle=':'))
+    
+    def build_cluster_hierarchy(self):
+        """Coarsen the connectivity graph by heavy-edge matching"""
+        areas = [block['width'] * block['height'] for block in self.blocks]
+        src = [conn['from'] for conn in self.connections]
+        dst = [conn['to'] for conn in self.connections]
+        weight = [float(conn['connections']) for conn in self.connections]
+        if self.nets is not None:
+            # Multi-pin nets contribute their clique/star pairs at 1/(k-1) each
+            nets = self.nets
+            net_src, net_dst, net_weight = net_edges(nets.net_ptr, nets.net_pins, len(self.blocks), 'hybrid',
+                                                     self.bookshelf_config['clique_limit'], 'inverse')
+            src += net_src.tolist()
+            dst += net_dst.tolist()
+            weight += net_weight.tolist()
+        
+        self.cluster_levels = build_hierarchy(areas, src, dst, weight, self.cluster_config['target'])
+        self.cluster_members = block_clusters(self.cluster_levels)
+        self.expanded_clusters = set()
+    
+    def cluster_place(self):
+        """Place the design multilevel: coarsest clusters first, then refine level by level"""
+        if not self.blocks:
+            return
+        
+        self.build_cluster_hierarchy()
+        centers = multilevel_place(self.cluster_levels, (100.0, 100.0),
+                                   self.cluster_config['whitespace'], self.cluster_config['iterations'],
+                                   block_geometry(self.blocks)[:, 2:])
+        
+        geometry = {}
+        for i, block in enumerate(self.blocks):
+            geometry[i] = (float(centers[i, 0]) - block['width'] / 2, float(centers[i, 1]) - block['height'] / 2,
+                           block['width'], block['height'])
+        self.history.begin('cluster place')
+        held = self.apply_block_geometry(geometry)
+        self.history.end(self.blocks, self.connections)
+        
+        self.auto_resize_view = True
+        self.update_plot()
+        self.update_properties()
+        self.info_text_var.set(f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)} | "
+                                    f"Cluster levels: {len(self.cluster_levels)}" + self.held_text(held))
+    
+    def evaluate_placements(self, positions, shapes=None):
+        """Score K candidate placements (K x N x 2 lower-left corners) of the loaded design
+        
+        shapes defaults to the current block sizes. Returns the per-candidate
+        score arrays of evaluate_candidates.
+        """
+        if shapes is None:
+            shapes = block_geometry(self.blocks)[:, 2:]
+        config = self.evaluate_config
+        return evaluate_candidates(positions, shapes,
+                                   [conn['from'] for conn in self.connections],
+                                   [conn['to'] for conn in self.connections],
+                                   [float(conn['connections']) for conn in self.connections],
+                                   self.nets, config['memory'], config['processes'], config['parallel_threshold'])
+    
+    def evaluate_candidate_file(self):
+        """Score the candidate placements of an .npz file and optionally apply the best one"""
+        if not self.blocks:
+            messagebox.showerror("Error", "No design loaded")
+            return
+        
+        filename = filedialog.askopenfilename(
+            title="Select candidate placements",
+            filetypes=[("NumPy archive (positions, optional shapes)", "*.npz"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        try:
+            with np.load(filename) as data:
+                positions = data['positions']
+                shapes = data['shapes'] if 'shapes' in data else None
+            if positions.ndim != 3 or positions.shape[1:] != (len(self.blocks), 2):
+                raise ValueError(f"positions must be K x {len(self.blocks)} x 2, got {positions.shape}")
+            scores = self.evaluate_placements(positions, shapes)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to evaluate candidates: {str(e)}")
+            return
+        
+        best = best_candidate(scores)
+        summary = (f"Evaluated {len(positions)} candidates\n\n"
+                   f"Best: #{best}\n"
+                   f"Wirelength: {scores['wirelength'][best]:.0f} "
+                   f"(min {scores['wirelength'].min():.0f}, median {np.median(scores['wirelength']):.0f})\n"
+                   f"Outline area: {scores['outline_area'][best]:.0f}\n"
+                   f"Overlap: {scores['overlap_area'][best]:.0f} in {scores['overlap_pairs'][best]} pairs\n\n"
+                   f"Apply the best candidate?")
+        if not messagebox.askyesno("Candidate Placements", summary):
+            return
+        
+        widths_heights = (np.broadcast_to(shapes, positions.shape)[best] if shapes is not None
+                          else block_geometry(self.blocks)[:, 2:])
+        geometry = {i: (float(x), float(y), float(w), float(h))
+                    for i, ((x, y), (w, h)) in enumerate(zip(positions[best], widths_heights))}
+        self.history.begin('apply candidate')
+        held = self.apply_block_geometry(geometry)
+        self.history.end(self.blocks, self.connections)
+        
+        self.auto_resize_view = True
+        self.update_plot()
+        self.update_properties()
+        self.info_text_var.set(f"Blocks: {len(self.blocks)} | Connections: {len(self.connections)} | "
+                                    f"Applied candidate #{best}" + self.held_text(held))
+    
+    def toggle_cluster_view(self):
+        """Switch between the full design and the collapsed cluster view"""
+        if self.collapse_var.get() and self.blocks and not self.cluster_levels:
+            self.build_cluster_hierarchy()
+        self.update_plot()
+    
+    def collapse_all_clusters(self):
+        """Fold every cluster back to the coarsest level"""
+        if self.blocks and not self.cluster_levels:
+            self.build_cluster_hierarchy()
+        self.expanded_clusters = set()
+        self.collapse_var.set(True)
+        self.update_plot()
+    
+    def get_collapsed_view(self):
+        """Find which clusters are shown collapsed and how they are connected"""
+        if self.cluster_members is None or self.cluster_members.shape[1] != len(self.blocks):
+            return None
+        
+        members = self.cluster_members
+        num_blocks = len(self.blocks)
+        
+        # Walk down from the top: a block shows as its highest unexpanded cluster
+        item_level = np.zeros(num_blocks, dtype=np.int64)
+        undecided = np.ones(num_blocks, dtype=bool)
+        for level in range(len(members) - 1, 0, -1):
+            expanded = [cluster for (lvl, cluster) in self.expanded_clusters if lvl == level]
+            collapsed = undecided & ~np.isin(members[level], expanded)
+            item_level[collapsed] = level
+            undecided &= ~collapsed
+        item_cluster = members[item_level, np.arange(num_blocks)]
+        item_key = item_level * num_blocks + item_cluster
+        
+        # Bounding box of the member blocks of every collapsed cluster
+        hidden = np.flatnonzero(item_level > 0)
+        geom = np.array([(b['x'], b['y'], b['x'] + b['width'], b['y'] + b['height']) for b in self.blocks])
+        keys, inverse = np.unique(item_key[hidden], return_inverse=True)
+        boxes = np.tile([np.inf, np.inf, -np.inf, -np.inf], (len(keys), 1))
+        np.minimum.at(boxes[:, 0], inverse, geom[hidden, 0])
+        np.minimum.at(boxes[:, 1], inverse, geom[hidden, 1])
+        np.maximum.at(boxes[:, 2], inverse, geom[hidden, 2])
+        np.maximum.at(boxes[:, 3], inverse, geom[hidden, 3])
+        counts = np.bincount(inverse, minlength=len(keys))
+        
+        # Center of every shown item: collapsed cluster box or visible block
+        centers = {}
+        for n, key in enumerate(keys.tolist()):
+            centers[key] = ((boxes[n, 0] + boxes[n, 2]) / 2, (boxes[n, 1] + boxes[n, 3]) / 2)
+        for block_index in np.flatnonzero(item_level == 0).tolist():
+            x0, y0, x1, y1 = geom[block_index]
+            centers[int(item_key[block_index])] = ((x0 + x1) / 2, (y0 + y1) / 2)
+        
+        # Connections touching a collapsed cluster, summed per pair of shown items
+        edges = []
+        if self.connections:
+            src = np.array([conn['from'] for conn in self.connections])
+            dst = np.array([conn['to'] for conn in self.connections])
+            weight = np.array([float(conn['connections']) for conn in self.connections])
+            a, b = item_key[src], item_key[dst]
+            folded = (a != b) & ((item_level[src] > 0) | (item_level[dst] > 0))
+            if folded.any():
+                pairs = np.column_stack([np.minimum(a, b)[folded], np.maximum(a, b)[folded]])
+                pairs, pair_index = np.unique(pairs, axis=0, return_inverse=True)
+                pair_weight = np.bincount(pair_index.ravel(), weights=weight[folded], minlength=len(pairs))
+                for (key_a, key_b), w in zip(pairs.tolist(), pair_weight.tolist()):
+                    edges.append((centers[key_a], centers[key_b], w))
+        
+        clusters = []
+        for n, key in enumerate(keys.tolist()):
+            clusters.append({
+                'level': key // num_blocks,
+                'cluster': key % num_blocks,
+                'box': tuple(boxes[n].tolist()),
+                'count': int(counts[n])
+            })
+        return {'hidden': set(hidden.tolist()), 'clusters': clusters, 'edges': edges}
+    
+    def reset_layers(self):
+        """Rebuild the layer list from the blocks of a newly loaded design"""
+        layers = sorted({block.get('layer', 0) for block in self.blocks} | {0})
+        self.layer_state = {layer: {'visible': True, 'dim': False} for layer in layers}
+        self.layer_order = layers
+        self.layer_var.set(str(layers[0]))
+        self.select_layer()
+    
+    def layer_hidden(self, block):
+        return not self.layer_state.get(block.get('layer', 0), {'visible': True})['visible']
+    
+    def connection_layers(self, conn):
+        """Layers a connection lives on: one layer, or the sorted pair of an inter-layer connection"""
+        from_layer = self.blocks[conn['from']].get('layer', 0)
+        to_layer = self.blocks[conn['to']].get('layer', 0)
+        return (from_layer,) if from_layer == to_layer else tuple(sorted((from_layer, to_layer)))
+    
+    def add_layer_artists(self, layers, *artists):
+        """Register artists with their layers, remembering their own alpha and zorder"""
+        for artist in artists:
+            alpha = artist.get_alpha()
+            self.layer_artists.append((artist, layers, 1.0 if alpha is None else alpha, artist.get_zorder()))
+    
+    def apply_layer_styles(self, entries=None):
+        """Apply layer visibility, dimming and order to the registered artists (or only to entries)"""
+        rank = {layer: n for n, layer in enumerate(self.layer_order)}
+        dim_alpha = self.layer_config['dim_alpha']
+        step = self.layer_config['zorder_step']
+        for artist, layers, alpha, zorder in (self.layer_artists if entries is None else entries):
+            states = [self.layer_state[layer] for layer in layers]
+            artist.set_visible(all(state['visible'] for state in states))
+            artist.set_alpha(alpha * (dim_alpha if any(state['dim'] for state in states) else 1.0))
+            artist.set_zorder(zorder + step * max(rank[layer] for layer in layers))
+    
+    def composite_layers(self):
+        """Re-composite the cached layer artists (no rebuild of the design)"""
+        self.apply_layer_styles()
+        self.tiles.invalidate()
+        self.canvas.draw()
+        self.select_layer()
+    
+    def current_layer(self):
+        """Layer number typed or picked in the layer box (None if not a number)"""
+        try:
+            return int(self.layer_var.get())
+        except ValueError:
+            return None
+    
+    def select_layer(self):
+        """Show the state and metrics of the layer in the layer box"""
+        layer = self.current_layer()
+        if layer not in self.layer_state:
+            self.layer_text_var.set("")
+            return
+        self.layer_visible_var.set(self.layer_state[layer]['visible'])
+        self.layer_dim_var.set(self.layer_state[layer]['dim'])
+        metrics = self.layer_metrics(layer)
+        self.layer_text_var.set(f"{metrics['blocks']} blocks | {metrics['connections']} conns | "
+                                f"WL {metrics['wirelength']:.0f} | {metrics['vias']} vias")
+        if not self.headless:
+            self.layer_combo['values'] = [str(layer) for layer in self.layer_order]
+    
+    def toggle_layer_visible(self):
+        layer = self.current_layer()
+        if layer not in self.layer_state:
+            return
+        self.layer_state[layer]['visible'] = self.layer_visible_var.get()
+        if self.selected_block is not None and self.layer_hidden(self.selected_block):
+            # The selection overlay is not layered; drop the selection with its layer
+            self.selected_block = None
+            self.build_selection_overlay()
+        self.composite_layers()
+    
+    def toggle_layer_dim(self):
+        layer = self.current_layer()
+        if layer not in self.layer_state:
+            return
+        self.layer_state[layer]['dim'] = self.layer_dim_var.get()
+        self.composite_layers()
+    
+    def raise_layer(self):
+        """Draw the layer in the layer box above all others"""
+        layer = self.current_layer()
+        if layer not in self.layer_state:
+            return
+        self.layer_order.remove(layer)
+        self.layer_order.append(layer)
+        self.composite_layers()
+    
+    def assign_block_layer(self):
+        """Move the selected block to the layer in the layer box (creating the layer if needed)"""
+        layer = self.current_layer()
+        if self.selected_block is None or layer is None or layer < 0 or layer > 255:
+            messagebox.showerror("Error", "Select a block and enter a layer number (0-255)")
+            return
+        if layer not in self.layer_state:
+            self.layer_state[layer] = {'visible': True, 'dim': False}
+            self.layer_order.append(layer)
+        
+        self.history.begin('layer')
+        self.history.touch_block(self.selected_block)
+        self.selected_block['layer'] = layer
+        self.history.end(self.blocks, self.connections)
+        self.update_plot()
+        self.select_layer()
+    
+    def layer_metrics(self, layer):
+        """Metrics of one layer: blocks, area, intra-layer connections and wirelength, vias"""
+        geometry = block_geometry(self.blocks)
+        layers = np.array([block.get('layer', 0) for block in self.blocks], dtype=np.int64)
+        on_layer = layers == layer
+        metrics = {
+            'blocks': int(on_layer.sum()),
+            'area': float((geometry[on_layer, 2] * geometry[on_layer, 3]).sum()),
+            'connections': 0,
+            'wirelength': 0.0,
+            'vias': 0
+        }
+        if not self.connections:
+            return metrics
+        
+        src = np.array([conn['from'] for conn in self.connections], dtype=np.int64)
+        dst = np.array([conn['to'] for conn in self.connections], dtype=np.int64)
+        weights = np.array([conn['connections'] for conn in self.connections], dtype=float)
+        centers = geometry[:, :2] + geometry[:, 2:] / 2
+        intra = on_layer[src] & on_layer[dst]
+        metrics['connections'] = int(intra.sum())
+        metrics['wirelength'] = float((np.abs(centers[src[intra]] - centers[dst[intra]]).sum(axis=1) *
+                                       weights[intra]).sum())
+        metrics['vias'] = int(((layers[src] != layers[dst]) & (on_layer[src] | on_layer[dst])).sum())
+        return metrics
+    
+    def draw_nets(self):
+        """Draw every multi-pin net as a Steiner or star tree with one port per block"""
+        nets = self.nets
+        if self.hidden_blocks:
+            visible = np.ones(len(self.blocks), dtype=bool)
+            visible[list(self.hidden_blocks)] = False
+            nets = nets.restrict(visible)
+        
+        px, py, _ = nets.assign_ports(block_geometry(self.blocks), self.net_config['port_margin'])
+        segments = nets.route_segments(px, py, self.net_style_var.get())
+        self.net_segments = segments
+        self.ax.add_collection(LineCollection(segments, colors='red', linewidths=1, linestyles='dashed', alpha=0.7))
+        self.ax.scatter(px, py, s=self.net_config['port_size'], c='blue', edgecolors='black',
+                        linewidths=0.5, alpha=0.8, zorder=3)
+        self.nets_text_var.set(f"HPWL: {nets.total_hpwl(px, py):.0f}")
+    
+    def get_bundles(self):
+        """Bundles of the visible connections and the layers of every bundle class
+        
+        Connections are grouped by the grid cells of their ports, or by the
+        clusters of their blocks, and never across layers. The result is
+        cached until a port moves or the grouping changes.
+        """
+        config = self.bundle_config
+        filtered = self.weight_filter_mask()
+        visible = [i for i, conn in enumerate(self.connections)
+                   if filtered[i] and conn['from'] not in self.hidden_blocks and conn['to'] not in self.hidden_blocks]
+        ports = np.array([(conn['port_positions']['start']['x'], conn['port_positions']['start']['y'],
+                           conn['port_positions']['end']['x'], conn['port_positions']['end']['y'])
+                          for conn in (self.connections[i] for i in visible)], dtype=float).reshape(-1, 4)
+        weights = np.array([self.connections[i]['connections'] for i in visible], dtype=float)
+        layer_ids = {}
+        classes = np.array([layer_ids.setdefault(self.connection_layers(self.connections[i]), len(layer_ids))
+                            for i in visible], dtype=np.int64)
+        clustered = (config['group_by'] == 'cluster' and self.cluster_members is not None and
+                     self.cluster_members.shape[1] == len(self.blocks))
+        
+        key = (config['group_by'], config['cell_size'], config['cluster_level'], clustered,
+               hash(ports.tobytes()), hash(weights.tobytes()), hash(classes.tobytes()), tuple(layer_ids),
+               hash(filtered.tobytes()))
+        if self.bundle_cache is not None and self.bundle_cache[0] == key:
+            return self.bundle_cache[1], self.bundle_cache[2]
+        
+        if clustered:
+            level = min(config['cluster_level'], len(self.cluster_members) - 1)
+            members = self.cluster_members[level]
+            start_keys = members[[self.connections[i]['from'] for i in visible]]
+            end_keys = members[[self.connections[i]['to'] for i in visible]]
+        else:
+            start_keys = grid_keys(ports[:, :2], config['cell_size'])
+            end_keys = grid_keys(ports[:, 2:], config['cell_size'])
+        bundles = Bundles.build(ports[:, :2], ports[:, 2:], weights, start_keys, end_keys, classes)
+        self.bundle_cache = (key, bundles, list(layer_ids))
+        return bundles, list(layer_ids)
+    
+    def draw_bundles(self):
+        """Draw every bundle as one path whose width grows with its summed connection count"""
+        config = self.bundle_config
+        bundles, layer_list = self.get_bundles()
+        paths = bundles.paths('straight' if self.connection_mode_var.get() == 'straight' else 'manhattan')
+        widths = bundles.widths(config['min_width'], config['max_width'])
+        for layer_class, layers in enumerate(layer_list):
+            chosen = bundles.classes == layer_class
+            collection = LineCollection(paths[chosen], linewidths=widths[chosen], colors=config['color'],
+                                        alpha=config['alpha'], capstyle='round', joinstyle='round')
+            self.ax.add_collection(collection)
+            self.add_layer_artists(layers, collection)
+        self.bundle_paths = paths
+    
+    def draw_collapsed_clusters(self, view):
+        """Draw collapsed clusters as single blocks with aggregated connections"""
+        self.collapsed_clusters = view['clusters']
+        
+        for cluster in view['clusters']:
+            x0, y0, x1, y1 = cluster['box']
+            rect = Rectangle((x0, y0), x1 - x0, y1 - y0, linewidth=2, edgecolor='darkgreen',
+                             facecolor='palegreen', alpha=0.6)
+            self.ax.add_patch(rect)
+            self.ax.text((x0 + x1) / 2, (y0 + y1) / 2,
+                        f"L{cluster['level']}.{cluster['cluster']}\n{cluster['count']} blocks",
+                        ha='center', va='center', fontsize=8, weight='bold')
+        
+        if view['edges']:
+            # One collection for all aggregated connections, width by summed weight
+            weights = np.array([w for _, _, w in view['edges']])
+            widths = 1 + 3 * np.log1p(weights) / np.log1p(max(weights.max(), 1.0))
+            lines = LineCollection([(a, b) for a, b, _ in view['edges']], colors='darkgreen',
+                                   linewidths=widths, alpha=0.6)
+            self.ax.add_collection(lines)
+    
+    def get_collapsed_cluster_at_position(self, x, y):
+        """Find the collapsed cluster drawn at the given position"""
+        for cluster in self.collapsed_clusters:
+            x0, y0, x1, y1 = cluster['box']
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                return cluster['level'], cluster['cluster']
+        return None
+    
+    def update_port_for_resize(self, port, block, resize_type, old_width, new_width, old_height=None, new_height=None):
+        """Update a single port position during block resize"""
+        edge = port['edge']
+        block_x, block_y = block['x'], block['y']
+        block_w, block_h = block['width'], block['height']
+        
+        if resize_type == 'width':
+            if edge == 'right':
+                # Port stays on right edge, update x position
+                port['x'] = block_x + block_w
+            elif edge == 'left':
+                # Port stays on left edge, no change needed
+                port['x'] = block_x
+            elif edge == 'top':
+                # Port on top edge - adjust x position proportionally
+                if old_width > 0:
+                    old_relative_x = (port['x'] - block_x) / old_width
+                    port['x'] = block_x + (old_relative_x * new_width)
+                # Ensure port stays on top edge
+                port['y'] = block_y + block_h
+            elif edge == 'bottom':
+                # Port on bottom edge - adjust x position proportionally
+                if old_width > 0:
+                    old_relative_x = (port['x'] - block_x) / old_width
+                    port['x'] = block_x + (old_relative_x * new_width)
+                # Ensure port stays on bottom edge
+                port['y'] = block_y
+        
+        elif resize_type == 'height':
+            if edge == 'top':
+                # Port stays on top edge, update y position
+                port['y'] = block_y + block_h
+            elif edge == 'bottom':
+                # Port stays on bottom edge, no change needed
+                port['y'] = block_y
+            elif edge == 'right':
+                # Port on right edge - adjust y position proportionally
+                if old_height and old_height > 0:
+                    old_relative_y = (port['y'] - block_y) / old_height
+                    port['y'] = block_y + (old_relative_y * new_height)
+                # Ensure port stays on right edge
+                port['x'] = block_x + block_w
+            elif edge == 'left':
+                # Port on left edge - adjust y position proportionally
+                if old_height and old_height > 0:
+                    old_relative_y = (port['y'] - block_y) / old_height
+                    port['y'] = block_y + (old_relative_y * new_height)
+                # Ensure port stays on left edge
+                port['x'] = block_x
+        
+        elif resize_type == 'corner':
+            # Handle both width and height changes
             if edge == 'right':
                 # Port on right edge - adjust y position proportionally
                 if old_height and old_height > 0:
@@ -823,9 +2968,19 @@ class FloorplanToolV2:
                 # Ensure port stays on bottom edge
                 port['y'] = block_y
     
+    @profiled('update_plot')
     def update_plot(self):
         """Update the floorplan visualization with improved handles"""
+        profiler = self.profiler
+        t = profiler.tick()
         self.ax.clear()
+        self.layer_artists = []
+        self.overlay_artists = []
+        self.overlay_handles = {}
+        self.net_segments = None
+        self.bundle_paths = None
+        self.tiles.invalidate()
+        t = profiler.record('clear', t)
         
         # Auto-resize view to fit all blocks if enabled
         if self.auto_resize_view and self.blocks:
@@ -844,6 +2999,7 @@ class FloorplanToolV2:
             # Set view limits
             self.ax.set_xlim(x_min, x_max)
             self.ax.set_ylim(y_min, y_max)
+        t = profiler.record('auto_resize', t)
         
         if not self.blocks:
             self.ax.text(0.5, 0.5, 'Upload CSV to see floorplan', 
@@ -851,240 +3007,120 @@ class FloorplanToolV2:
             self.canvas.draw()
             return
             
+        # Work out which blocks are folded into collapsed clusters
+        collapsed_view = self.get_collapsed_view() if self.collapse_var.get() else None
+        self.hidden_blocks = collapsed_view['hidden'] if collapsed_view else set()
+        self.collapsed_clusters = []
+        
         # Draw blocks with improved handles
         for i, block in enumerate(self.blocks):
-            # Determine color based on selection
-            if block == self.selected_block:
-                facecolor = 'lightcoral'
-                edgecolor = 'red'
-                linewidth = 3
-            else:
-                facecolor = 'lightblue'
-                edgecolor = 'blue'
-                linewidth = 2
-                
-            # Draw main rectangle
+            if i in self.hidden_blocks:
+                continue
+            
+            # Draw main rectangle (the selection is drawn by the overlay)
             rect = plt.Rectangle((block['x'], block['y']), 
                                block['width'], block['height'],
-                               linewidth=linewidth, edgecolor=edgecolor, 
-                               facecolor=facecolor, alpha=0.7)
+                               linewidth=2, edgecolor='blue', 
+                               facecolor='lightblue', alpha=0.7,
+                               hatch='//' if block['id'] in self.constraints.fixed else None)
             self.ax.add_patch(rect)
-            
-            # Draw improved handles for selected block
-            if block == self.selected_block and self.interactive_var.get():
-                self.draw_improved_handles(block)
+            layers = (block.get('layer', 0),)
             
             # Add label with area info
             calculated_area = int(block['width'] * block['height'])
             area_text = f"{block['name']}\n{int(block['area'])} μm²\n{int(block['width'])}×{int(block['height'])}"
-            self.ax.text(block['x'] + block['width']/2, 
+            label = self.ax.text(block['x'] + block['width']/2, 
                         block['y'] + block['height']/2,
                         area_text,
                         ha='center', va='center', fontsize=8, weight='bold')
+            self.add_layer_artists(layers, rect, label)
+        
+        if len(self.constraints):
+            self.draw_constraints()
+        t = profiler.record('blocks', t)
                         
-        # Draw Manhattan connections with draggable port bubbles
-        for i, conn in enumerate(self.connections):
-            from_block = self.blocks[conn['from']]
-            to_block = self.blocks[conn['to']]
-            
-            # Initialize port positions if not set
-            if 'port_positions' not in conn:
-                start_point, end_point = self.find_edge_connection_points(from_block, to_block, i)
-                conn['port_positions'] = {
-                    'start': {'x': start_point[0], 'y': start_point[1], 'edge': self.get_edge_type(start_point, from_block)},
-                    'end': {'x': end_point[0], 'y': end_point[1], 'edge': self.get_edge_type(end_point, to_block)}
-                }
-            
-            start_port = conn['port_positions']['start']
-            end_port = conn['port_positions']['end']
-            
-            # Draw Z-shaped connection (perpendicular to edge, then bend)
-            # Calculate perpendicular offset from edge
-            offset = 50  # Increased distance to move perpendicular to edge for better separation
-            
-            # Determine connection direction based on edge types
-            start_edge = start_port['edge']
-            end_edge = end_port['edge']
-            
-            # Calculate double Z-path points (Z at source, Z at destination, connected by straight line)
-            # First, determine the offset for this specific connection to avoid overlap
-            connection_offset = self.get_connection_offset(conn, start_port, end_port, offset)
-            
-            # Source Z-connector points
-            if start_edge in ['left', 'right']:
-                # Start port is on left or right edge
-                if start_edge == 'left':
-                    # First perpendicular line going left from port
-                    s1_x = start_port['x'] - connection_offset
-                    s1_y = start_port['y']
-                    # Second perpendicular line going up/down
-                    s2_x = s1_x
-                    s2_y = start_port['y'] + (connection_offset if start_port['y'] < end_port['y'] else -connection_offset)
-                else:  # right
-                    # First perpendicular line going right from port
-                    s1_x = start_port['x'] + connection_offset
-                    s1_y = start_port['y']
-                    # Second perpendicular line going up/down
-                    s2_x = s1_x
-                    s2_y = start_port['y'] + (connection_offset if start_port['y'] < end_port['y'] else -connection_offset)
-            else:  # start_edge is 'top' or 'bottom'
-                # Start port is on top or bottom edge
-                if start_edge == 'bottom':
-                    # First perpendicular line going down from port
-                    s1_x = start_port['x']
-                    s1_y = start_port['y'] - connection_offset
-                    # Second perpendicular line going left/right
-                    s2_x = start_port['x'] + (connection_offset if start_port['x'] < end_port['x'] else -connection_offset)
-                    s2_y = s1_y
-                else:  # top
-                    # First perpendicular line going up from port
-                    s1_x = start_port['x']
-                    s1_y = start_port['y'] + connection_offset
-                    # Second perpendicular line going left/right
-                    s2_x = start_port['x'] + (connection_offset if start_port['x'] < end_port['x'] else -connection_offset)
-                    s2_y = s1_y
-            
-            # Destination Z-connector points
-            if end_edge in ['left', 'right']:
-                # End port is on left or right edge
-                if end_edge == 'left':
-                    # First perpendicular line going left from port
-                    d1_x = end_port['x'] - connection_offset
-                    d1_y = end_port['y']
-                    # Second perpendicular line going up/down
-                    d2_x = d1_x
-                    d2_y = end_port['y'] + (connection_offset if end_port['y'] < start_port['y'] else -connection_offset)
-                else:  # right
-                    # First perpendicular line going right from port
-                    d1_x = end_port['x'] + connection_offset
-                    d1_y = end_port['y']
-                    # Second perpendicular line going up/down
-                    d2_x = d1_x
-                    d2_y = end_port['y'] + (connection_offset if end_port['y'] < start_port['y'] else -connection_offset)
-            else:  # end_edge is 'top' or 'bottom'
-                # End port is on top or bottom edge
-                if end_edge == 'bottom':
-                    # First perpendicular line going down from port
-                    d1_x = end_port['x']
-                    d1_y = end_port['y'] - connection_offset
-                    # Second perpendicular line going left/right
-                    d2_x = end_port['x'] + (connection_offset if end_port['x'] < start_port['x'] else -connection_offset)
-                    d2_y = d1_y
-                else:  # top
-                    # First perpendicular line going up from port
-                    d1_x = end_port['x']
-                    d1_y = end_port['y'] + connection_offset
-                    # Second perpendicular line going left/right
-                    d2_x = end_port['x'] + (connection_offset if end_port['x'] < start_port['x'] else -connection_offset)
-                    d2_y = d1_y
-            
-            # Draw double Z-shaped connection
-            # Source Z: from port to first perpendicular point
-            self.ax.plot([start_port['x'], s1_x], [start_port['y'], s1_y], 'r--', linewidth=1, alpha=0.7)
-            # Source Z: from first to second perpendicular point
-            self.ax.plot([s1_x, s2_x], [s1_y, s2_y], 'r--', linewidth=1, alpha=0.7)
-            
-            # Middle connection between the two Z's (straight or Manhattan)
-            if self.connection_mode_var.get() == "straight":
-                # Straight line connecting the two Z's
-                self.ax.plot([s2_x, d2_x], [s2_y, d2_y], 'r--', linewidth=1, alpha=0.7)
-            else:  # manhattan
-                # Manhattan connection between the two Z's
-                # First go horizontal, then vertical
-                mid_x = s2_x
-                mid_y = d2_y
-                self.ax.plot([s2_x, mid_x], [s2_y, mid_y], 'r--', linewidth=1, alpha=0.7)
-                self.ax.plot([mid_x, d2_x], [mid_y, d2_y], 'r--', linewidth=1, alpha=0.7)
-            
-            # Destination Z: from second perpendicular point to first perpendicular point
-            self.ax.plot([d2_x, d1_x], [d2_y, d1_y], 'r--', linewidth=1, alpha=0.7)
-            # Destination Z: from first perpendicular point to end port
-            self.ax.plot([d1_x, end_port['x']], [d1_y, end_port['y']], 'r--', linewidth=1, alpha=0.7)
-            
-            # Draw port bubbles (bigger for easier selection)
-            start_bubble = plt.Circle((start_port['x'], start_port['y']), self.PORT_RADIUS, 
-                                    facecolor='blue', edgecolor='black', linewidth=1, alpha=0.8)
-            end_bubble = plt.Circle((end_port['x'], end_port['y']), self.PORT_RADIUS, 
-                                  facecolor='red', edgecolor='black', linewidth=1, alpha=0.8)
-            self.ax.add_patch(start_bubble)
-            self.ax.add_patch(end_bubble)
-            
-            # Calculate the middle point of the entire connection path
-            # Total path length = source Z + middle connection + destination Z
-            source_z_length = abs(s1_x - start_port['x']) + abs(s1_y - start_port['y']) + abs(s2_x - s1_x) + abs(s2_y - s1_y)
-            
-            if self.connection_mode_var.get() == "straight":
-                middle_line_length = abs(d2_x - s2_x) + abs(d2_y - s2_y)
-            else:  # manhattan
-                # Manhattan middle connection has two segments
-                mid_x = s2_x
-                mid_y = d2_y
-                middle_line_length = abs(mid_x - s2_x) + abs(mid_y - s2_y) + abs(d2_x - mid_x) + abs(d2_y - mid_y)
-            
-            dest_z_length = abs(d1_x - d2_x) + abs(d1_y - d2_y) + abs(end_port['x'] - d1_x) + abs(end_port['y'] - d1_y)
-            total_length = source_z_length + middle_line_length + dest_z_length
-            
-            # Find the middle point along the path
-            target_length = total_length / 2
-            current_length = 0
-            
-            # Check each segment to find where the middle point falls
-            if current_length + source_z_length >= target_length:
-                # Middle point is in source Z
-                ratio = (target_length - current_length) / source_z_length
-                if ratio < 0.5:
-                    # In first segment of source Z
-                    seg_ratio = ratio * 2
-                    mid_x = start_port['x'] + seg_ratio * (s1_x - start_port['x'])
-                    mid_y = start_port['y'] + seg_ratio * (s1_y - start_port['y'])
-                else:
-                    # In second segment of source Z
-                    seg_ratio = (ratio - 0.5) * 2
-                    mid_x = s1_x + seg_ratio * (s2_x - s1_x)
-                    mid_y = s1_y + seg_ratio * (s2_y - s1_y)
-            else:
-                current_length += source_z_length
-                if current_length + middle_line_length >= target_length:
-                    # Middle point is in middle connection
-                    ratio = (target_length - current_length) / middle_line_length
-                    if self.connection_mode_var.get() == "straight":
-                        # Straight line
-                        mid_x = s2_x + ratio * (d2_x - s2_x)
-                        mid_y = s2_y + ratio * (d2_y - s2_y)
-                    else:  # manhattan
-                        # Manhattan connection - check which segment
-                        manhattan_mid_x = s2_x
-                        manhattan_mid_y = d2_y
-                        first_segment_length = abs(manhattan_mid_x - s2_x) + abs(manhattan_mid_y - s2_y)
-                        if ratio * middle_line_length <= first_segment_length:
-                            # In first segment (horizontal)
-                            seg_ratio = (ratio * middle_line_length) / first_segment_length
-                            mid_x = s2_x + seg_ratio * (manhattan_mid_x - s2_x)
-                            mid_y = s2_y + seg_ratio * (manhattan_mid_y - s2_y)
-                        else:
-                            # In second segment (vertical)
-                            seg_ratio = (ratio * middle_line_length - first_segment_length) / (abs(d2_x - manhattan_mid_x) + abs(d2_y - manhattan_mid_y))
-                            mid_x = manhattan_mid_x + seg_ratio * (d2_x - manhattan_mid_x)
-                            mid_y = manhattan_mid_y + seg_ratio * (d2_y - manhattan_mid_y)
-                else:
-                    # Middle point is in destination Z
-                    current_length += middle_line_length
-                    ratio = (target_length - current_length) / dest_z_length
-                    if ratio < 0.5:
-                        # In first segment of dest Z
-                        seg_ratio = ratio * 2
-                        mid_x = d2_x + seg_ratio * (d1_x - d2_x)
-                        mid_y = d2_y + seg_ratio * (d1_y - d2_y)
-                    else:
-                        # In second segment of dest Z
-                        seg_ratio = (ratio - 0.5) * 2
-                        mid_x = d1_x + seg_ratio * (end_port['x'] - d1_x)
-                        mid_y = d1_y + seg_ratio * (end_port['y'] - d1_y)
-            
-            # Add connection count at the middle of the entire connection path
-            self.ax.text(mid_x, mid_y, str(conn['connections']), 
-                        ha='center', va='center', fontsize=8,
-                        bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8))
+        # Initialize port positions if not set
+        self.initialize_port_positions()
+        t = profiler.record('ports', t)
+        
+        # Route middle legs around blocks in maze mode
+        maze = self.connection_mode_var.get() == "maze" and not self.bundle_var.get()
+        maze_routes = self.update_maze_routes(self.weight_filter_mask()) if maze else {}
+        t = profiler.record('maze', t)
+        
+        # Connections with the most crossings are drawn highlighted
+        highlighted = set(self.crossing_offenders) if self.crossings_var.get() else set()
+        
+        # Draw Manhattan connections with draggable port bubbles (or their bundles)
+        self.connection_routes = {}
+        self.connection_artists = {}
+        vias = {}   # Layer pair -> via marker positions of inter-layer connections
+        if self.bundle_var.get():
+            self.draw_bundles()
+            drawn = []
+        else:
+            drawn = self.connections
+        
+        # During a group move only the routes crossing the group boundary are rebuilt
+        # (after an undo/redo only the routes on the touched blocks)
+        reuse = self.group_drag['routes'] if self.group_drag is not None else self.kept_routes
+        self.kept_routes = {}
+        if maze:
+            reuse = {}
+        filtered = self.weight_filter_mask()
+        offsets = None  # Offsets among the visible connections, computed once on first use
+        for i, conn in enumerate(drawn):
+            # Connections below the weight filter are not routed or drawn at all
+            if not filtered[i]:
+                continue
+            
+            # Connections into collapsed clusters are drawn aggregated instead
+            if conn['from'] in self.hidden_blocks or conn['to'] in self.hidden_blocks:
+                continue
+            
+            # Build double Z-shaped connection (perpendicular to edge, then bend)
+            route = reuse.get(i)
+            if route is None:
+                connection_offset, path = maze_routes.get(i, (None, None))
+                if connection_offset is None:
+                    if offsets is None:
+                        t_offsets = profiler.tick()
+                        offsets = self.visible_offsets(filtered).tolist()
+                        profiler.add('offsets', t_offsets)
+                    connection_offset = offsets[i]
+                route = self.build_connection_route(conn, connection_offset, path)
+            
+            layers = self.draw_connection(i, conn, route, i in highlighted)
+            if len(layers) > 1:
+                start_port = conn['port_positions']['start']
+                end_port = conn['port_positions']['end']
+                vias.setdefault(layers, []).extend([(start_port['x'], start_port['y']),
+                                                    (end_port['x'], end_port['y'])])
+        
+        # One via marker collection per layer pair
+        for layers, points in vias.items():
+            via_x, via_y = zip(*points)
+            markers = self.ax.scatter(via_x, via_y, s=self.layer_config['via_size'], marker='s',
+                                      facecolors='none', edgecolors=self.layer_config['via_color'],
+                                      linewidths=2, zorder=4)
+            self.add_layer_artists(layers, markers)
+        t = profiler.record('connections', t)
+        
+        # Multi-pin nets are drawn as one route tree each
+        if self.nets is not None:
+            self.draw_nets()
+            t = profiler.record('nets', t)
+        
+        # Draw collapsed clusters as single blocks
+        if collapsed_view:
+            self.draw_collapsed_clusters(collapsed_view)
+        
+        # Draw congestion overlay on top of the routes
+        if self.congestion_var.get():
+            self.draw_congestion_overlay()
+        if self.density_var.get() or self.whitespace_var.get():
+            self.draw_density_overlay()
+        t = profiler.record('overlays', t)
                         
         self.ax.set_xlabel('X Position (μm)')
         self.ax.set_ylabel('Y Position (μm)')
@@ -1096,16 +3132,229 @@ class FloorplanToolV2:
         if self.dragging or self.port_dragging:
             self.auto_resize_view = False
         
+        if self.profile_overlay_var.get():
+            self.draw_profile_overlay()
+        
+        self.apply_layer_styles()
+        self.build_selection_overlay()
+        t = profiler.tick()
         self.canvas.draw()
+        profiler.record('canvas_draw', t)
     
 
         
+    def draw_connection(self, i, conn, route, highlighted=False):
+        """Draw one connection's route, port bubbles and count label; returns its layers"""
+        profiler = self.profiler
+        start_port = conn['port_positions']['start']
+        end_port = conn['port_positions']['end']
+        self.connection_routes[i] = route
+        
+        # Draw double Z-shaped connection as a single polyline
+        t_draw = profiler.tick()
+        route_x, route_y = zip(*route)
+        if highlighted:
+            lines = self.ax.plot(route_x, route_y, '-', color=self.crossing_config['color'], linewidth=3, alpha=0.9)
+        else:
+            lines = self.ax.plot(route_x, route_y, 'r--', linewidth=1, alpha=0.7)
+        
+        # Draw port bubbles (bigger for easier selection)
+        start_bubble = plt.Circle((start_port['x'], start_port['y']), self.PORT_RADIUS, 
+                                facecolor='blue', edgecolor='black', linewidth=1, alpha=0.8)
+        end_bubble = plt.Circle((end_port['x'], end_port['y']), self.PORT_RADIUS, 
+                              facecolor='red', edgecolor='black', linewidth=1, alpha=0.8)
+        self.ax.add_patch(start_bubble)
+        self.ax.add_patch(end_bubble)
+        t_draw = profiler.add('draw_routes', t_draw)
+        
+        # Add connection count at the middle of the entire connection path
+        mid_x, mid_y = route_midpoint(route)
+        label = self.ax.text(mid_x, mid_y, str(conn['connections']), 
+                    ha='center', va='center', fontsize=8,
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.8))
+        
+        # Connections between layers show only while both layers are visible
+        layers = self.connection_layers(conn)
+        self.connection_artists[i] = [*lines, start_bubble, end_bubble, label]
+        self.add_layer_artists(layers, *self.connection_artists[i])
+        profiler.add('labels', t_draw)
+        return layers
+    
+    def weight_filter_mask(self):
+        """Per connection: passes the weight filter (the index is built on first use)"""
+        if not self.weight_index.is_built(self.connections):
+            self.weight_index.build([conn['connections'] for conn in self.connections])
+            self.set_weight_filter_mode(redraw=False)
+        return self.weight_index.visible
+    
+    def set_weight_filter_mode(self, redraw=True):
+        """Fit the slider range to the filter mode and reapply the filter"""
+        index = self.weight_index
+        mode = self.weight_filter_var.get()
+        if mode == 'top':
+            low, high, value = 0, len(index.order), len(index.order)
+        elif mode == 'min':
+            low = index.weights[-1].item() if len(index.weights) else 0
+            high = index.weights[0].item() if len(index.weights) else 1
+            value = low
+        else:
+            low, high, value = 0, 1, 0
+        if hasattr(self, 'weight_scale'):
+            self.weight_scale.configure(from_=low, to=high)
+        self.weight_threshold_var.set(value)
+        if redraw:
+            self.apply_weight_filter()
+        else:
+            index.set_count(index.count_for(mode, value))
+            self.update_weight_filter_text()
+    
+    def update_weight_filter_text(self):
+        """Show how many connections pass the weight filter"""
+        index = self.weight_index
+        if index.count == len(index.order):
+            self.weight_filter_text_var.set(f"{index.count} shown")
+        else:
+            self.weight_filter_text_var.set(f"{index.count}/{len(index.order)} shown (≥ {index.threshold()})")
+    
+    @profiled('weight_filter')
+    def apply_weight_filter(self):
+        """Move the weight threshold, drawing or removing only the connections that cross it"""
+        if not self.connections:
+            return
+        if not self.weight_index.is_built(self.connections):
+            self.update_plot()
+            return
+        index = self.weight_index
+        before = index.visible.copy()
+        shown, hidden = index.set_count(index.count_for(self.weight_filter_var.get(),
+                                                         self.weight_threshold_var.get()))
+        self.update_weight_filter_text()
+        if not len(shown) and not len(hidden):
+            return
+        
+        # Views derived from all drawn routes (bundles, maze routing, crossings, congestion,
+        # vias, collapsed clusters) are rebuilt by a full redraw
+        changed = np.concatenate([shown, hidden]).tolist()
+        if (self.bundle_var.get() or self.connection_mode_var.get() == "maze" or self.collapse_var.get() or
+                self.crossings_var.get() or self.congestion_var.get() or
+                any(len(self.connection_layers(self.connections[i])) > 1 for i in changed)):
+            self.update_plot()
+            return
+        
+        # Drawn connections sharing a port with a shown or hidden one change their offset too
+        offsets = self.visible_offsets(index.visible)
+        moved = np.flatnonzero((offsets != self.visible_offsets(before)) & before & index.visible)
+        redrawn = np.concatenate([hidden, moved]).tolist()
+        for i in redrawn:
+            for artist in self.connection_artists.pop(i, []):
+                artist.remove()
+            self.connection_routes.pop(i, None)
+        if redrawn:
+            self.layer_artists = [entry for entry in self.layer_artists if entry[0].axes is not None]
+        
+        start = len(self.layer_artists)
+        offsets = offsets.tolist()
+        for i in np.concatenate([shown, moved]).tolist():
+            conn = self.connections[i]
+            self.draw_connection(i, conn, self.build_connection_route(conn, offsets[i]))
+        self.apply_layer_styles(self.layer_artists[start:])
+        
+        self.tiles.invalidate()
+        self.canvas.draw()
+    
+    def build_selection_overlay(self):
+        """Create the selection highlight and handles as animated artists
+        
+        canvas.draw() skips animated artists, so they never end up in the
+        cached background and can be redrawn on their own.
+        """
+        for artist in self.overlay_artists:
+            if artist.axes is not None:
+                artist.remove()
+        self.overlay_artists = []
+        self.overlay_handles = {}
+        
+        # The multi-selection is highlighted as one collection
+        if len(self.selected_blocks) > 1:
+            ids = [block_id for block_id in sorted(self.selected_blocks)
+                   if block_id not in self.hidden_blocks and not self.layer_hidden(self.blocks[block_id])]
+            x, y, w, h = block_geometry(self.blocks)[ids].T
+            corners = np.stack([np.column_stack([x, y]), np.column_stack([x + w, y]),
+                                np.column_stack([x + w, y + h]), np.column_stack([x, y + h])], axis=1)
+            group = PolyCollection(corners, linewidths=3, edgecolors=self.selection_config['color'],
+                                   facecolors='lightcoral', alpha=0.5)
+            self.ax.add_collection(group)
+            self.overlay_artists.append(group)
+        
+        block = self.selected_block
+        if block is None or block['id'] in self.hidden_blocks or self.layer_hidden(block):
+            for artist in self.overlay_artists:
+                artist.set_animated(True)
+            return
+        rect = plt.Rectangle((block['x'], block['y']), block['width'], block['height'],
+                             linewidth=3, edgecolor='red', facecolor='lightcoral', alpha=0.7)
+        self.ax.add_patch(rect)
+        label = self.ax.text(block['x'] + block['width']/2, block['y'] + block['height']/2,
+                             f"{block['name']}\n{int(block['area'])} μm²\n{int(block['width'])}×{int(block['height'])}",
+                             ha='center', va='center', fontsize=8, weight='bold')
+        self.overlay_artists.extend([rect, label])
+        if self.interactive_var.get():
+            self.overlay_handles = self.draw_improved_handles(block)
+            self.overlay_artists.extend(self.overlay_handles.values())
+        for artist in self.overlay_artists:
+            artist.set_animated(True)
+    
+    def on_draw(self, event):
+        """Cache every full draw as the background and put the overlay back on top"""
+        self.tiles_shown = False
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.blit_overlay()
+    
+    def blit_overlay(self):
+        """Draw the highlight, cache it for hover changes, then draw the handles on top"""
+        handles = set(self.overlay_handles.values())
+        for artist in self.overlay_artists:
+            if artist not in handles:
+                self.ax.draw_artist(artist)
+        self.selection_background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for handle in handles:
+            self.ax.draw_artist(handle)
+        self.canvas.blit(self.fig.bbox)
+    
+    @profiled('overlay')
+    def refresh_overlay(self):
+        """Redraw the selection over the cached background (the design itself is unchanged)"""
+        self.build_selection_overlay()
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.blit_overlay()
+    
+    def update_hover(self):
+        """Recolor the handles for hover_handle and blit only the overlay"""
+        colors = self.handle_config['colors']
+        for handle_id, handle in self.overlay_handles.items():
+            if handle_id == self.hover_handle:
+                handle.set_facecolor(colors['hover'])
+            else:
+                handle.set_facecolor(colors['corner'] if handle_id.startswith('corner') else colors['edge'])
+        if self.selection_background is None:
+            self.canvas.draw()
+            return
+        # Only the handles change color; the highlight and its label come from the cache
+        self.canvas.restore_region(self.selection_background)
+        for handle in self.overlay_handles.values():
+            self.ax.draw_artist(handle)
+        self.canvas.blit(self.fig.bbox)
+    
     def draw_improved_handles(self, block):
-        """Draw improved resize handles with better visibility"""
+        """Draw improved resize handles with better visibility; returns {handle id: patch}"""
         corner_size = self.handle_config['corner_size']
         edge_width = self.handle_config['edge_width']
         edge_height = self.handle_config['edge_height']
         colors = self.handle_config['colors']
+        handles = {}
         
         # Corner handles (all four corners)
         corners = [
@@ -1127,6 +3376,7 @@ class FloorplanToolV2:
                                  linewidth=2, edgecolor='black',
                                  facecolor=color, alpha=0.9)
             self.ax.add_patch(handle)
+            handles[handle_id] = handle
         
         # Edge handles (right and bottom edges)
         edge_handles = [
@@ -1150,87 +3400,258 @@ class FloorplanToolV2:
                                  linewidth=2, edgecolor='black',
                                  facecolor=color, alpha=0.9)
             self.ax.add_patch(handle)
+            handles[handle_id] = handle
+        return handles
         
     def update_properties(self):
         """Update properties tab"""
+        if self.headless:
+            return
+        
         # Clear existing widgets
         for widget in self.properties_container.winfo_children():
             widget.destroy()
+        self.property_frames = []
+        self.property_vars = []
             
         if not self.blocks:
             ttk.Label(self.properties_container, text="No blocks loaded").pack(pady=20)
             return
             
         # Create property editors for each block
-        for i, block in enumerate(self.blocks):
-            frame = ttk.LabelFrame(self.properties_container, text=f"Block {i+1}: {block['name']}")
-            frame.pack(fill=tk.X, padx=5, pady=5)
-            
-            # Area
-            ttk.Label(frame, text="Area (μm²):").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
-            area_var = tk.StringVar(value=str(int(block['area'])))
-            area_entry = ttk.Entry(frame, textvariable=area_var, width=15)
-            area_entry.grid(row=0, column=1, padx=5, pady=2)
-            
-            # Width
-            ttk.Label(frame, text="Width (μm):").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
-            width_var = tk.StringVar(value=str(int(block['width'])))
-            width_entry = ttk.Entry(frame, textvariable=width_var, width=15)
-            width_entry.grid(row=1, column=1, padx=5, pady=2)
-            
-            # Height
-            ttk.Label(frame, text="Height (μm):").grid(row=2, column=0, sticky=tk.W, padx=5, pady=2)
-            height_var = tk.StringVar(value=str(int(block['height'])))
-            height_entry = ttk.Entry(frame, textvariable=height_var, width=15)
-            height_entry.grid(row=2, column=1, padx=5, pady=2)
-            
-            # Position
-            ttk.Label(frame, text="X Position:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=2)
-            x_var = tk.StringVar(value=str(int(block['x'])))
-            x_entry = ttk.Entry(frame, textvariable=x_var, width=15)
-            x_entry.grid(row=3, column=1, padx=5, pady=2)
-            
-            ttk.Label(frame, text="Y Position:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=2)
-            y_var = tk.StringVar(value=str(int(block['y'])))
-            y_entry = ttk.Entry(frame, textvariable=y_var, width=15)
-            y_entry.grid(row=4, column=1, padx=5, pady=2)
+        for block in self.blocks:
+            self.add_block_properties(block)
+    
+    def add_block_properties(self, block):
+        """Append the property editors of one block to the Properties tab"""
+        frame = ttk.LabelFrame(self.properties_container, text=f"Block {block['id'] + 1}: {block['name']}")
+        frame.pack(fill=tk.X, padx=5, pady=5)
+        values = self.property_values(block)
+        
+        # Area
+        ttk.Label(frame, text="Area (μm²):").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
+        area_var = tk.StringVar(value=values['area'])
+        area_entry = ttk.Entry(frame, textvariable=area_var, width=15)
+        area_entry.grid(row=0, column=1, padx=5, pady=2)
+        
+        # Width
+        ttk.Label(frame, text="Width (μm):").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
+        width_var = tk.StringVar(value=values['width'])
+        width_entry = ttk.Entry(frame, textvariable=width_var, width=15)
+        width_entry.grid(row=1, column=1, padx=5, pady=2)
+        
+        # Height
+        ttk.Label(frame, text="Height (μm):").grid(row=2, column=0, sticky=tk.W, padx=5, pady=2)
+        height_var = tk.StringVar(value=values['height'])
+        height_entry = ttk.Entry(frame, textvariable=height_var, width=15)
+        height_entry.grid(row=2, column=1, padx=5, pady=2)
+        
+        # Position
+        ttk.Label(frame, text="X Position:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=2)
+        x_var = tk.StringVar(value=values['x'])
+        x_entry = ttk.Entry(frame, textvariable=x_var, width=15)
+        x_entry.grid(row=3, column=1, padx=5, pady=2)
+        
+        ttk.Label(frame, text="Y Position:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=2)
+        y_var = tk.StringVar(value=values['y'])
+        y_entry = ttk.Entry(frame, textvariable=y_var, width=15)
+        y_entry.grid(row=4, column=1, padx=5, pady=2)
+        
+        # Shape optimizer bounds
+        ttk.Label(frame, text="Min Aspect (h/w):").grid(row=5, column=0, sticky=tk.W, padx=5, pady=2)
+        aspect_min_var = tk.StringVar(value=values['aspect_min'])
+        ttk.Entry(frame, textvariable=aspect_min_var, width=15).grid(row=5, column=1, padx=5, pady=2)
+        
+        ttk.Label(frame, text="Max Aspect (h/w):").grid(row=6, column=0, sticky=tk.W, padx=5, pady=2)
+        aspect_max_var = tk.StringVar(value=values['aspect_max'])
+        ttk.Entry(frame, textvariable=aspect_max_var, width=15).grid(row=6, column=1, padx=5, pady=2)
+        
+        soft_var = tk.BooleanVar(value=values['soft'])
+        ttk.Checkbutton(frame, text="Soft Macro (reshapable)", 
+                       variable=soft_var).grid(row=7, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        
+        # Update button
+        def update_block(block=block, area_var=area_var, width_var=width_var, 
+                       height_var=height_var, x_var=x_var, y_var=y_var,
+                       aspect_min_var=aspect_min_var, aspect_max_var=aspect_max_var, soft_var=soft_var):
+            try:
+                values = {key: float(var.get()) for key, var in 
+                          (('aspect_min', aspect_min_var), ('aspect_max', aspect_max_var), ('area', area_var),
+                           ('width', width_var), ('height', height_var), ('x', x_var), ('y', y_var))}
+            except ValueError:
+                messagebox.showerror("Error", "Please enter valid numbers")
+                return
             
-            # Update button
-            def update_block(block_id=block['id'], area_var=area_var, width_var=width_var, 
-                           height_var=height_var, x_var=x_var, y_var=y_var):
-                try:
-                    block['area'] = float(area_var.get())
-                    block['width'] = float(width_var.get())
-                    block['height'] = float(height_var.get())
-                    block['x'] = float(x_var.get())
-                    block['y'] = float(y_var.get())
-                    self.update_plot()
-                except ValueError:
-                    messagebox.showerror("Error", "Please enter valid numbers")
-                    
-            ttk.Button(frame, text="Update", command=update_block).grid(row=5, column=0, columnspan=2, pady=5)
+            # The new geometry is snapped to the block's constraints (or rejected)
+            rect = self.constrain_geometry(block, values['x'], values['y'], values['width'], values['height'])
+            if rect is None:
+                messagebox.showerror("Constraint Violation", 
+                                     f"{block['name']} cannot be placed there: " + 
+                                     ", ".join(kind for kind, _ in self.constraints.block_violations(
+                                         block['id'], (values['x'], values['y'], values['width'], 
+                                                       values['height']), self.block_rect)))
+                return
+            values['x'], values['y'], values['width'], values['height'] = rect
+            
+            self.history.begin('properties')
+            self.history.touch_block(block)
+            block.update(values)
+            block['soft'] = soft_var.get()
+            self.respread_ports_for_block(block)
+            self.history.end(self.blocks, self.connections)
+            self.update_plot()
+                
+        ttk.Button(frame, text="Update", command=update_block).grid(row=8, column=0, columnspan=2, pady=5)
+        self.property_frames.append(frame)
+        self.property_vars.append({'area': area_var, 'width': width_var, 'height': height_var,
+                                   'x': x_var, 'y': y_var, 'aspect_min': aspect_min_var,
+                                   'aspect_max': aspect_max_var, 'soft': soft_var})
+    
+    def property_values(self, block):
+        """Values shown in a block's property editors"""
+        return {'area': str(int(block['area'])), 'width': str(int(block['width'])),
+                'height': str(int(block['height'])), 'x': str(int(block['x'])), 'y': str(int(block['y'])),
+                'aspect_min': str(block.get('aspect_min', self.shape_config['aspect_min'])),
+                'aspect_max': str(block.get('aspect_max', self.shape_config['aspect_max'])),
+                'soft': block.get('soft', True)}
+    
+    def refresh_block_properties(self, block_ids):
+        """Write the current values into the property editors of some blocks (no widgets rebuilt)"""
+        if self.headless:
+            return
+        if len(self.property_vars) != len(self.blocks):
+            self.update_properties()
+            return
+        for block_id in block_ids:
+            values = self.property_values(self.blocks[block_id])
+            for key, var in self.property_vars[block_id].items():
+                var.set(values[key])
             
     def update_connections(self):
         """Update connections tab"""
+        if self.headless:
+            return
+        
         # Clear existing widgets
         for widget in self.connections_container.winfo_children():
             widget.destroy()
+        self.connection_rows = []
             
         if not self.connections:
             ttk.Label(self.connections_container, text="No connections loaded").pack(pady=20)
             return
             
         # Create connection list
-        for i, conn in enumerate(self.connections):
-            frame = ttk.Frame(self.connections_container)
-            frame.pack(fill=tk.X, padx=5, pady=2)
-            
-            ttk.Label(frame, text=f"{conn['from_name']} ↔ {conn['to_name']}", 
-                     font=('Arial', 10, 'bold')).pack(anchor=tk.W)
-            ttk.Label(frame, text=f"Connections: {conn['connections']}", 
-                     font=('Arial', 9)).pack(anchor=tk.W)
-            
-            ttk.Separator(frame, orient='horizontal').pack(fill=tk.X, pady=2)
+        for conn in self.connections:
+            self.add_connection_row(conn)
+    
+    def add_connection_row(self, conn):
+        """Append one connection to the Connections tab"""
+        frame = ttk.Frame(self.connections_container)
+        frame.pack(fill=tk.X, padx=5, pady=2)
+        
+        names = ttk.Label(frame, text=f"{conn['from_name']} ↔ {conn['to_name']}", 
+                          font=('Arial', 10, 'bold'))
+        names.pack(anchor=tk.W)
+        weight = ttk.Label(frame, text=f"Connections: {conn['connections']}", 
+                           font=('Arial', 9))
+        weight.pack(anchor=tk.W)
+        
+        ttk.Separator(frame, orient='horizontal').pack(fill=tk.X, pady=2)
+        self.connection_rows.append((frame, names, weight))
+    
+    def on_scroll(self, event):
+        """Zoom by one wheel step per notch, keeping the point under the cursor in place"""
+        if event.inaxes != self.ax or not self.blocks:
+            return
+        self.auto_resize_view = False
+        factor = self.view_config['wheel_step'] ** -event.step
+        x_min, x_max = self.ax.get_xlim()
+        y_min, y_max = self.ax.get_ylim()
+        x, y = event.xdata, event.ydata
+        self.ax.set_xlim(x - (x - x_min) * factor, x + (x_max - x) * factor)
+        self.ax.set_ylim(y - (y - y_min) * factor, y + (y_max - y) * factor)
+        self.show_tiles()
+        self.schedule_settle()
+    
+    def tile_snapshot(self):
+        """Visible blocks, routes and ports of the last redraw, for rendering tiles"""
+        blocks = [block for i, block in enumerate(self.blocks)
+                  if i not in self.hidden_blocks and not self.layer_hidden(block)]
+        routes = []
+        ports = []
+        for i, route in self.connection_routes.items():
+            conn = self.connections[i]
+            if not all(self.layer_state[layer]['visible'] for layer in self.connection_layers(conn)):
+                continue
+            routes.append(route)
+            start = conn['port_positions']['start']
+            end = conn['port_positions']['end']
+            ports.extend([(start['x'], start['y']), (end['x'], end['y'])])
+        if self.bundle_paths is not None:
+            routes.extend(self.bundle_paths)
+        return TileSnapshot(block_geometry(blocks), routes, ports, self.PORT_RADIUS, self.net_segments,
+                            self.view_config['tile_size'])
+    
+    @profiled('tiles')
+    def show_tiles(self):
+        """Show the current view composed from cached tiles instead of re-rasterizing every artist
+        
+        Tiles still missing are shown from a coarser level and filled in by the
+        background renderer; ticks and labels catch up in settle_view().
+        """
+        if not self.blocks:
+            self.canvas.draw()
+            return
+        if self.tiles.snapshot is None:
+            self.tiles.set_snapshot(self.tile_snapshot())
+        bbox = self.ax.bbox
+        image, missing = self.tiles.view(self.ax.get_xlim(), self.ax.get_ylim(),
+                                         int(round(bbox.width)), int(round(bbox.height)))
+        
+        # Paste the screen-sized pixels straight into the axes area
+        renderer = self.canvas.get_renderer()
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(bbox)
+        renderer.draw_image(gc, int(round(bbox.x0)), int(round(bbox.y0)), image)
+        gc.restore()
+        for artist in self.overlay_artists:
+            self.ax.draw_artist(artist)
+        self.canvas.blit(bbox)
+        self.tiles_shown = True
+        if missing:
+            self.schedule_tile_poll()
+    
+    def schedule_tile_poll(self):
+        if self.headless or self.tile_poll_job is not None:
+            return
+        self.tile_poll_job = self.root.after(self.view_config['poll_ms'], self.poll_tiles)
+    
+    def poll_tiles(self):
+        """Show tiles the background renderer finished while the view is still tiled"""
+        self.tile_poll_job = None
+        if not self.tiles_shown:
+            return
+        if self.tiles.take_ready():
+            self.show_tiles()
+        else:
+            self.schedule_tile_poll()
+    
+    def schedule_settle(self):
+        """Redraw fully once the view stops moving for view_config['settle_ms']"""
+        if self.headless:
+            self.settle_view()
+            return
+        if self.settle_job is not None:
+            self.root.after_cancel(self.settle_job)
+        self.settle_job = self.root.after(self.view_config['settle_ms'], self.settle_view)
+    
+    def settle_view(self):
+        """Drop the tiles and draw the view with all artists, ticks and labels"""
+        self.settle_job = None
+        if self.panning or not self.tiles_shown:
+            return
+        self.canvas.draw()
     
     def zoom_in(self):
         """Zoom in on the current view"""
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Engineering change order (ECO) reload for the floorplanning tool
+Diffs a revised adjacency matrix against the loaded design by per-row
+hashes, so only the rows that changed are expanded into blocks and
+connections to add, remove or update.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+def read_matrix(filename):
+    """(names, matrix) of an adjacency matrix CSV (areas on the diagonal)"""
+    df = pd.read_csv(filename, index_col=0)
+    names = df.index.tolist()
+    if len(names) != len(df.columns):
+        raise ValueError("Number of row names must match number of column names")
+    if len(set(names)) != len(names):
+        raise ValueError("Block names must be unique")
+    return names, df.values.astype(float)
+
+
+def mix64(values):
+    """splitmix64 finalizer of a uint64 array"""
+    z = np.asarray(values, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def name_codes(names):
+    """64-bit code of every block name"""
+    return np.array([int.from_bytes(hashlib.blake2b(str(name).encode(), digest_size=8).digest(), 'little')
+                     for name in names], dtype=np.uint64)
+
+
+def row_hashes(names, matrix):
+    """Hash of what every row contributes to the design: its area and its connections
+
+    A row contributes the diagonal (block area) and the entries right of it
+    (process_adjacency_matrix reads the upper triangle). Entries are hashed
+    with the neighbour's name and summed, so a row keeps its hash when
+    other blocks are added, removed or reordered around it.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    codes = name_codes(names)
+    rows, cols = np.nonzero(np.triu(matrix, 1) != 0)
+    with np.errstate(over='ignore'):
+        entries = mix64(codes[cols] ^ matrix[rows, cols].view(np.uint64))
+        hashes = mix64(codes ^ mix64(np.ascontiguousarray(np.diagonal(matrix)).view(np.uint64)))
+        np.add.at(hashes, rows, entries)
+    return {name: int(value) for name, value in zip(names, hashes)}
+
+
+def row_connections(names, matrix, rows):
+    """{unordered name pair: (from name, to name, weight)} contributed by the given rows"""
+    found = {}
+    for i in rows:
+        for j in np.flatnonzero(matrix[i, i + 1:] > 0) + i + 1:
+            a, b = names[i], names[j]
+            found[(a, b) if a < b else (b, a)] = (a, b, matrix[i, j].item())
+    return found
+
+
+def diff_design(old_hashes, connections, names, matrix):
+    """ECO changes from the loaded design (row hashes and connections) to a new matrix
+
+    Returns a dict with 'hashes' (of the new matrix), 'added' and 'removed'
+    block names, 'areas' ({name: area} of the added and changed rows), and
+    connection changes: 'add' ([(from, to, weight)]), 'remove' (indexes
+    into connections) and 'update' ({index: (from, to, weight)}).
+    """
+    hashes = row_hashes(names, matrix)
+    index = {name: i for i, name in enumerate(names)}
+    added = [name for name in names if name not in old_hashes]
+    removed = [name for name in old_hashes if name not in index]
+    changed = [name for name in names if name in old_hashes and old_hashes[name] != hashes[name]]
+
+    # Only rows that changed (or are new) are expanded into connections
+    dirty = set(changed) | set(added)
+    new_conns = row_connections(names, matrix, sorted(index[name] for name in dirty))
+    gone = set(removed)
+    old_conns = {}
+    for i, conn in enumerate(connections):
+        if conn['from_name'] in dirty or conn['from_name'] in gone or conn['to_name'] in gone:
+            a, b = conn['from_name'], conn['to_name']
+            old_conns[(a, b) if a < b else (b, a)] = i
+
+    update = {}
+    for key in old_conns.keys() & new_conns.keys():
+        i = old_conns[key]
+        conn = connections[i]
+        if (conn['from_name'], conn['to_name'], conn['connections']) != new_conns[key]:
+            update[i] = new_conns[key]
+    return {
+        'hashes': hashes,
+        'added': added,
+        'removed': removed,
+        'areas': {name: matrix[index[name], index[name]].item() for name in changed + added},
+        'add': [new_conns[key] for key in sorted(new_conns.keys() - old_conns.keys())],
+        'remove': sorted(old_conns[key] for key in old_conns.keys() - new_conns.keys()),
+        'update': update
+    }
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Batch evaluation of candidate placements for the floorplanning tool
+Scores K placements of one design (a K x N position and shape tensor) for
+wirelength, outline area and overlap in vectorized passes
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Bytes of scratch memory per candidate per block, connection and net pin
+BYTES_PER_BLOCK = 96
+BYTES_PER_CONNECTION = 48
+BYTES_PER_PIN = 48
+
+
+def candidate_geometry(positions, shapes):
+    """K x N x 4 (x, y, width, height) from K x N x 2 positions and N x 2 or K x N x 2 shapes"""
+    positions = np.asarray(positions, dtype=float)
+    shapes = np.broadcast_to(np.asarray(shapes, dtype=float), positions.shape)
+    if positions.ndim != 3 or positions.shape[2] != 2:
+        raise ValueError(f"Positions must be K x N x 2, got {positions.shape}")
+    return np.concatenate([positions, shapes], axis=2)
+
+
+def overlap_totals(x, y, w, h):
+    """Total pairwise overlap area and overlapping pair count of every candidate
+
+    Blocks are sorted by x per candidate; pass d compares block i with the
+    d-th next one. Once block i no longer overlaps its d-th successor in x
+    it cannot overlap any later one, so each pass only carries the blocks
+    still overlapping and the work is proportional to the x-overlapping pairs.
+    The sweep runs along y instead when the blocks are sparser in y.
+    """
+    k, n = x.shape
+    x_density = w.sum() / max((np.max(x + w, axis=1) - np.min(x, axis=1)).sum(), 1e-12)
+    y_density = h.sum() / max((np.max(y + h, axis=1) - np.min(y, axis=1)).sum(), 1e-12)
+    if y_density < x_density:
+        x, y, w, h = y, x, h, w
+    order = np.argsort(x, axis=1)
+    xs = np.take_along_axis(x, order, axis=1).ravel()
+    xe = xs + np.take_along_axis(w, order, axis=1).ravel()
+    ys = np.take_along_axis(y, order, axis=1).ravel()
+    ye = ys + np.take_along_axis(h, order, axis=1).ravel()
+
+    area = np.zeros(k)
+    pairs = np.zeros(k, dtype=np.int64)
+    active = np.arange(k * n)
+    for d in range(1, n):
+        active = active[active % n + d < n]
+        partner = active + d
+        ox = np.minimum(xe[active], xe[partner]) - xs[partner]
+        keep = ox > 0
+        active, partner, ox = active[keep], partner[keep], ox[keep]
+        if not len(active):
+            break
+        oy = np.minimum(ye[active], ye[partner]) - np.maximum(ys[active], ys[partner])
+        hit = oy > 0
+        rows = active[hit] // n
+        area += np.bincount(rows, weights=ox[hit] * oy[hit], minlength=k)
+        pairs += np.bincount(rows, minlength=k)
+    return area, pairs
+
+
+def evaluate_chunk(args):
+    """Score one chunk of candidates (process pool worker)"""
+    geometry, src, dst, weights, nets = args
+    x, y, w, h = np.moveaxis(geometry, 2, 0)
+    cx = x + w / 2
+    cy = y + h / 2
+
+    # Weighted centre-to-centre Manhattan length of the pairwise connections
+    wirelength = ((np.abs(cx[:, src] - cx[:, dst]) + np.abs(cy[:, src] - cy[:, dst])) * weights).sum(axis=1)
+
+    # Weighted half-perimeter wirelength of the multi-pin nets, on block centres
+    if nets is not None:
+        net_ptr, net_pins, net_weights = nets
+        used = np.diff(net_ptr) > 0
+        if used.any():
+            starts = net_ptr[:-1][used]
+            px = cx[:, net_pins]
+            py = cy[:, net_pins]
+            hpwl = (np.maximum.reduceat(px, starts, axis=1) - np.minimum.reduceat(px, starts, axis=1) +
+                    np.maximum.reduceat(py, starts, axis=1) - np.minimum.reduceat(py, starts, axis=1))
+            wirelength = wirelength + (hpwl * net_weights[used]).sum(axis=1)
+
+    outline = ((np.max(x + w, axis=1) - np.min(x, axis=1)) *
+               (np.max(y + h, axis=1) - np.min(y, axis=1)))
+    overlap, overlap_pairs = overlap_totals(x, y, w, h)
+    return wirelength, outline, overlap, overlap_pairs
+
+
+def chunk_candidates(n, connections, pins, memory):
+    """Candidates per chunk so the scratch arrays stay within memory bytes"""
+    per_candidate = n * BYTES_PER_BLOCK + connections * BYTES_PER_CONNECTION + pins * BYTES_PER_PIN
+    return max(1, int(memory // max(per_candidate, 1)))
+
+
+def evaluate_candidates(positions, shapes, src, dst, weights, nets=None, memory=256 * 2**20,
+                        processes=1, parallel_threshold=4):
+    """Score K candidate placements of a design in one vectorized pass per chunk
+
+    positions are lower-left corners (K x N x 2); shapes are (width, height)
+    per block, shared (N x 2) or per candidate (K x N x 2). src, dst and
+    weights describe the pairwise connections; nets is an optional NetList.
+    Chunks are sized to memory bytes and fanned out to a process pool
+    when processes is not 1 and there are at least parallel_threshold chunks.
+
+    Returns a dict of K-length arrays: 'wirelength', 'outline_area',
+    'overlap_area' and 'overlap_pairs'.
+    """
+    geometry = candidate_geometry(positions, shapes)
+    k, n = geometry.shape[:2]
+    if not k or not n:
+        raise ValueError("No candidates or no blocks to evaluate")
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    weights = np.asarray(weights, dtype=float)
+    net_arrays = None
+    pins = 0
+    if nets is not None and len(nets):
+        net_arrays = (nets.net_ptr, nets.net_pins, nets.weights)
+        pins = len(nets.net_pins)
+
+    size = chunk_candidates(n, len(src), pins, memory)
+    chunks = [(geometry[start:start + size], src, dst, weights, net_arrays) for start in range(0, k, size)]
+
+    workers = min(processes or os.cpu_count() or 1, len(chunks))
+    if len(chunks) >= parallel_threshold and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_chunk, chunks))
+    else:
+        results = [evaluate_chunk(chunk) for chunk in chunks]
+
+    wirelength, outline, overlap, overlap_pairs = (np.concatenate(parts) for parts in zip(*results))
+    return {
+        'wirelength': wirelength,
+        'outline_area': outline,
+        'overlap_area': overlap,
+        'overlap_pairs': overlap_pairs
+    }
+
+
+def best_candidate(scores):
+    """Index of the candidate with the least overlap, ties broken by wirelength then outline area"""
+    return int(np.lexsort((scores['outline_area'], scores['wirelength'], scores['overlap_area']))[0])
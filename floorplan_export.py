@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Geometry exporters for the floorplanning tool
+Stream blocks, ports and connection routes (and multi-pin net trees) to SVG,
+JSON lines and a DEF-like text format
+"""
+
+import json
+import os
+import re
+from itertools import islice
+
+import numpy as np
+
+from floorplan_nets import EDGES, block_geometry
+from floorplan_routes import build_route_points, connection_offsets
+
+# Lines joined per write call
+CHUNK_LINES = 4096
+
+# DEF pin orientation for each block edge
+EDGE_ORIENT = {'left': 'W', 'right': 'E', 'bottom': 'S', 'top': 'N'}
+
+
+def write_lines(f, lines, chunk=CHUNK_LINES):
+    """Write an iterable of lines in bulk, chunk lines per write"""
+    lines = iter(lines)
+    count = 0
+    while True:
+        batch = list(islice(lines, chunk))
+        if not batch:
+            return count
+        f.write('\n'.join(batch))
+        f.write('\n')
+        count += len(batch)
+
+
+def fmt(value):
+    """Compact coordinate text"""
+    return f"{value:.10g}"
+
+
+def route_offsets(connections, maze_routes=None, base_offset=50):
+    """Z-connector offset of every connection (taken from maze_routes in maze mode)"""
+    if maze_routes is not None:
+        return np.array([maze_routes[i][0] for i in range(len(connections))], dtype=float)
+    return connection_offsets(connections, base_offset).astype(float)
+
+
+def iter_routes(connections, offsets, mode='straight', maze_routes=None):
+    """Yield (index, connection, route points) one connection at a time"""
+    for i, conn in enumerate(connections):
+        ports = conn['port_positions']
+        path = maze_routes[i][1] if maze_routes is not None else None
+        yield i, conn, build_route_points(ports['start'], ports['end'], float(offsets[i]), mode, path)
+
+
+def net_routes(nets, blocks, style='steiner', margin=10):
+    """Ports and route segments of multi-pin nets, as drawn on the canvas
+
+    Returns a dict with the NetList, the port x, y and edge code of every
+    pin, and the route segments (S x 2 x 2) sorted by net with the
+    segment range of every net in segment_ptr.
+    """
+    px, py, edges = nets.assign_ports(block_geometry(blocks), margin)
+    segments, owner = nets.route_segments(px, py, style, with_nets=True)
+    order = np.argsort(owner, kind='stable')
+    return {'nets': nets, 'px': px, 'py': py, 'edges': edges, 'segments': segments[order],
+            'segment_ptr': np.searchsorted(owner[order], np.arange(len(nets) + 1))}
+
+
+def iter_nets(routes):
+    """Yield (net index, pin blocks, pin index range, segments) one net at a time"""
+    if routes is None:
+        return
+    nets = routes['nets']
+    for n in range(len(nets)):
+        start, end = nets.net_ptr[n], nets.net_ptr[n + 1]
+        yield (n, nets.net_pins[start:end], range(start, end),
+               routes['segments'][routes['segment_ptr'][n]:routes['segment_ptr'][n + 1]])
+
+
+def export_bounds(blocks, offsets):
+    """(x_min, y_min, x_max, y_max) of the blocks, grown to cover the Z-connector legs"""
+    geometry = np.array([(b['x'], b['y'], b['width'], b['height']) for b in blocks], dtype=float).reshape(-1, 4)
+    padding = float(offsets.max()) if len(offsets) else 0.0
+    return (geometry[:, 0].min() - padding, geometry[:, 1].min() - padding,
+            (geometry[:, 0] + geometry[:, 2]).max() + padding, (geometry[:, 1] + geometry[:, 3]).max() + padding)
+
+
+def write_svg(f, blocks, connections, offsets, mode='straight', maze_routes=None, nets=None,
+              port_radius=15, show_names=True):
+    """SVG drawing in design coordinates (y is negated so that up stays up)"""
+    x_min, y_min, x_max, y_max = export_bounds(blocks, offsets)
+    width, height = x_max - x_min, y_max - y_min
+    font_size = fmt(max(width, height) / 150)
+
+    def lines():
+        yield '<?xml version="1.0" encoding="UTF-8"?>'
+        yield (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{fmt(x_min)} {fmt(-y_max)} '
+               f'{fmt(width)} {fmt(height)}">')
+        yield '<g id="blocks" fill="lightblue" fill-opacity="0.7" stroke="blue">'
+        for block in blocks:
+            yield (f'<rect x="{fmt(block["x"])}" y="{fmt(-block["y"] - block["height"])}" '
+                   f'width="{fmt(block["width"])}" height="{fmt(block["height"])}"/>')
+        yield '</g>'
+
+        yield '<g id="routes" fill="none" stroke="red" stroke-dasharray="8 4" stroke-opacity="0.7">'
+        for _, _, route in iter_routes(connections, offsets, mode, maze_routes):
+            points = ' '.join(f"{fmt(x)},{fmt(-y)}" for x, y in route)
+            yield f'<polyline points="{points}"/>'
+        yield '</g>'
+
+        for port_type, color in (('start', 'blue'), ('end', 'red')):
+            yield f'<g id="{port_type}_ports" fill="{color}" stroke="black">'
+            for conn in connections:
+                port = conn['port_positions'][port_type]
+                yield f'<circle cx="{fmt(port["x"])}" cy="{fmt(-port["y"])}" r="{port_radius}"/>'
+            yield '</g>'
+
+        if nets is not None:
+            yield '<g id="nets" stroke="red" stroke-dasharray="8 4" stroke-opacity="0.7">'
+            for (x1, y1), (x2, y2) in nets['segments'].tolist():
+                yield f'<line x1="{fmt(x1)}" y1="{fmt(-y1)}" x2="{fmt(x2)}" y2="{fmt(-y2)}"/>'
+            yield '</g>'
+            yield '<g id="net_ports" fill="blue" stroke="black">'
+            for x, y in zip(nets['px'].tolist(), nets['py'].tolist()):
+                yield f'<circle cx="{fmt(x)}" cy="{fmt(-y)}" r="{port_radius}"/>'
+            yield '</g>'
+
+        if show_names:
+            yield f'<g id="names" font-size="{font_size}" text-anchor="middle" dominant-baseline="middle">'
+            for block in blocks:
+                name = (block['name'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'))
+                yield (f'<text x="{fmt(block["x"] + block["width"] / 2)}" '
+                       f'y="{fmt(-block["y"] - block["height"] / 2)}">{name}</text>')
+            yield '</g>'
+        yield '</svg>'
+
+    return write_lines(f, lines())
+
+
+def write_jsonl(f, blocks, connections, offsets, mode='straight', maze_routes=None, nets=None):
+    """One JSON object per line: a design header, then every block, connection and net"""
+    encode = json.JSONEncoder(separators=(',', ':'), default=lambda value: value.item()).encode
+
+    def lines():
+        yield encode({'type': 'design', 'mode': mode, 'bounds': export_bounds(blocks, offsets),
+                      'blocks': len(blocks), 'connections': len(connections),
+                      'nets': len(nets['nets']) if nets is not None else 0})
+        for block in blocks:
+            record = {'type': 'block', 'id': block['id'], 'name': block['name'], 'x': block['x'], 'y': block['y'],
+                      'width': block['width'], 'height': block['height'], 'area': block['area']}
+            if 'soft' in block:
+                record['soft'] = block['soft']
+            yield encode(record)
+        for i, conn, route in iter_routes(connections, offsets, mode, maze_routes):
+            ports = conn['port_positions']
+            yield encode({'type': 'connection', 'index': i, 'from': conn['from'], 'to': conn['to'],
+                          'weight': conn['connections'],
+                          'start': {'x': ports['start']['x'], 'y': ports['start']['y'],
+                                    'edge': ports['start']['edge']},
+                          'end': {'x': ports['end']['x'], 'y': ports['end']['y'], 'edge': ports['end']['edge']},
+                          'route': route})
+        for n, pins, pin_range, segments in iter_nets(nets):
+            record = {'type': 'net', 'index': n, 'weight': nets['nets'].weights[n],
+                      'ports': [{'block': block, 'x': nets['px'][k], 'y': nets['py'][k],
+                                 'edge': EDGES[nets['edges'][k]]} for block, k in zip(pins.tolist(), pin_range)],
+                      'segments': segments.tolist()}
+            if nets['nets'].names is not None:
+                record['name'] = nets['nets'].names[n]
+            yield encode(record)
+
+    return write_lines(f, lines())
+
+
+def def_names(blocks):
+    """Unique DEF-safe component names for the blocks"""
+    names = []
+    used = set()
+    for block in blocks:
+        name = re.sub(r'[^A-Za-z0-9_]', '_', str(block['name'])) or 'BLOCK'
+        if name in used:
+            name = f"{name}_{block['id']}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def write_def(f, blocks, connections, offsets, mode='straight', maze_routes=None, nets=None,
+              design='floorplan', dbu=1000):
+    """DEF-like placement: COMPONENTS, PINS for every port and NETS with the routed points
+
+    Coordinates are written in integer database units (dbu per design unit).
+    Multi-pin nets follow the connections, with their route tree written as
+    NEW-separated segments.
+    """
+    names = def_names(blocks)
+    net_count = len(nets['nets']) if nets is not None else 0
+    pin_count = len(nets['px']) if nets is not None else 0
+    x_min, y_min, x_max, y_max = export_bounds(blocks, offsets)
+
+    def unit(value):
+        return int(round(value * dbu))
+
+    def point(x, y):
+        return f"( {unit(x)} {unit(y)} )"
+
+    def lines():
+        yield "VERSION 5.8 ;"
+        yield f"DESIGN {re.sub(r'[^A-Za-z0-9_]', '_', design)} ;"
+        yield f"UNITS DISTANCE MICRONS {dbu} ;"
+        yield f"DIEAREA {point(x_min, y_min)} {point(x_max, y_max)} ;"
+        yield ""
+        yield f"COMPONENTS {len(blocks)} ;"
+        for name, block in zip(names, blocks):
+            yield (f"  - {name} {name} + PLACED {point(block['x'], block['y'])} N "
+                   f"+ PROPERTY WIDTH {unit(block['width'])} HEIGHT {unit(block['height'])} ;")
+        yield "END COMPONENTS"
+        yield ""
+        yield f"PINS {2 * len(connections) + pin_count} ;"
+        for i, conn in enumerate(connections):
+            for port_type, suffix in (('start', 'S'), ('end', 'E')):
+                port = conn['port_positions'][port_type]
+                yield (f"  - P{i}_{suffix} + NET N{i} + DIRECTION INOUT "
+                       f"+ PLACED {point(port['x'], port['y'])} {EDGE_ORIENT.get(port['edge'], 'N')} ;")
+        for n, _, pin_range, _ in iter_nets(nets):
+            for k in pin_range:
+                yield (f"  - M{n}_{k} + NET M{n} + DIRECTION INOUT "
+                       f"+ PLACED {point(nets['px'][k], nets['py'][k])} {EDGE_ORIENT[EDGES[nets['edges'][k]]]} ;")
+        yield "END PINS"
+        yield ""
+        yield f"NETS {len(connections) + net_count} ;"
+        for i, conn, route in iter_routes(connections, offsets, mode, maze_routes):
+            yield (f"  - N{i} ( {names[conn['from']]} P{i}_S ) ( {names[conn['to']]} P{i}_E ) "
+                   f"+ WEIGHT {int(conn['connections'])} + ROUTED " + ' '.join(point(x, y) for x, y in route) + " ;")
+        for n, pins, pin_range, segments in iter_nets(nets):
+            line = f"  - M{n} " + ' '.join(f"( {names[block]} M{n}_{k} )" for block, k in zip(pins.tolist(), pin_range))
+            line += f" + WEIGHT {int(nets['nets'].weights[n])}"
+            if len(segments):
+                line += " + ROUTED " + ' NEW '.join(f"{point(x1, y1)} {point(x2, y2)}"
+                                                   for (x1, y1), (x2, y2) in segments.tolist())
+            yield line + " ;"
+        yield "END NETS"
+        yield ""
+        yield "END DESIGN"
+
+    return write_lines(f, lines())
+
+
+EXPORTERS = {
+    '.svg': write_svg,
+    '.jsonl': write_jsonl,
+    '.def': write_def
+}
+
+
+def export_floorplan(filename, blocks, connections, mode='straight', maze_routes=None, nets=None,
+                     port_radius=None, **options):
+    """Write the design in the format given by the file extension; returns the lines written
+
+    Every connection needs port positions. maze_routes is the {index: (offset, path)}
+    mapping of the maze router and is required in maze mode. nets are the
+    multi-pin net routes from net_routes. port_radius (drawings only) should be
+    the radius the canvas draws ports with.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {extension or filename}")
+    if mode == 'maze' and maze_routes is None:
+        raise ValueError("Maze mode export needs the maze routes")
+    if port_radius is not None and extension == '.svg':
+        options['port_radius'] = port_radius
+    offsets = route_offsets(connections, maze_routes)
+    with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        return EXPORTERS[extension](f, blocks, connections, offsets, mode, maze_routes, nets, **options)
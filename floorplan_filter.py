@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Connection weight filter for the floorplanning tool
+Keeps the connections sorted by weight once, so the connections passing a
+top-K or minimum-count filter are always a prefix of that order and moving
+the threshold only touches the connections between the old and new prefix.
+"""
+
+import numpy as np
+
+FILTER_MODES = ('all', 'top', 'min')
+
+
+class WeightIndex:
+    """Connections sorted by weight, heaviest first, with the currently visible prefix"""
+
+    def __init__(self):
+        self.order = np.zeros(0, dtype=np.int64)    # Connection indexes, heaviest first
+        self.weights = np.zeros(0)                  # Their weights (descending)
+        self.visible = np.zeros(0, dtype=bool)      # Per connection: passes the filter
+        self.count = 0                              # Visible connections (a prefix of order)
+
+    def build(self, weights):
+        """Sort the connection weights; every connection starts visible"""
+        weights = np.asarray(weights, dtype=float)
+        self.order = np.argsort(-weights, kind='stable')
+        self.weights = weights[self.order]
+        self.visible = np.ones(len(weights), dtype=bool)
+        self.count = len(weights)
+
+    def is_built(self, connections):
+        """Check whether the index matches the connection list"""
+        return len(self.visible) == len(connections)
+
+    def count_for(self, mode, value):
+        """Number of connections passing a filter, by one binary search
+
+        mode 'top' keeps the value heaviest connections, 'min' keeps the
+        connections with a weight of at least value, 'all' keeps every one.
+        """
+        total = len(self.order)
+        if mode == 'top':
+            return int(np.clip(round(value), 0, total))
+        if mode == 'min':
+            # -weights is ascending; count the entries with -weight <= -value
+            return int(np.searchsorted(-self.weights, -value, side='right'))
+        return total
+
+    def set_count(self, count):
+        """Show the count heaviest connections; returns (newly shown, newly hidden) indexes"""
+        old = self.count
+        self.count = count
+        changed = self.order[min(old, count):max(old, count)]
+        self.visible[changed] = count > old
+        none = np.zeros(0, dtype=np.int64)
+        return (changed, none) if count > old else (none, changed)
+
+    def threshold(self):
+        """Lowest weight still visible (None if nothing is)"""
+        return self.weights[self.count - 1].item() if self.count else None
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Undo/redo history for the floorplanning tool
+Records compact per-gesture deltas of the blocks and ports an edit touched
+"""
+
+from collections import deque
+
+# Fields saved for each touched object
+BLOCK_FIELDS = ('x', 'y', 'width', 'height', 'area', 'aspect_min', 'aspect_max', 'soft', 'layer')
+PORT_FIELDS = ('x', 'y', 'edge', 'pinned')
+
+# Marks a field (or a whole port) that did not exist
+MISSING = object()
+
+
+def capture(obj, fields):
+    """Copy the given fields of a dict (None if the object does not exist)"""
+    if obj is None:
+        return None
+    return tuple(obj.get(field, MISSING) for field in fields)
+
+
+def restore(obj, fields, state):
+    """Write captured fields back into a dict, deleting fields that were missing"""
+    for field, value in zip(fields, state):
+        if value is MISSING:
+            obj.pop(field, None)
+        else:
+            obj[field] = value
+
+
+class EditHistory:
+    """Undo/redo log of edit gestures
+
+    A gesture collects every block and port touched between begin() and end(),
+    so all motion events of one drag become a single undo step. Only objects
+    whose state actually changed are kept, as (key, before, after) deltas.
+    """
+
+    def __init__(self, max_steps=200, max_records=100000, listener=None):
+        self.max_steps = max_steps          # Undo steps kept
+        self.max_records = max_records      # Block/port deltas kept over all steps
+        self.listener = listener            # Called as listener(step, which) after every model change
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.records = 0                    # Deltas currently held in undo_stack
+        self.gesture = None                 # Open gesture: label plus 'before' states
+
+    def clear(self):
+        """Drop all history (e.g. after loading a new design)"""
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.records = 0
+        self.gesture = None
+
+    def remap(self, block_map, port_map):
+        """Renumber the recorded steps after blocks or connections were renumbered
+
+        block_map maps old block ids and port_map old (conn index, port type)
+        keys to their new ones; deltas of objects missing from the maps are
+        dropped, and so are the steps left empty.
+        """
+        def remap_step(step):
+            return {'label': step['label'],
+                    'blocks': [(block_map[key], before, after) for key, before, after in step['blocks']
+                               if key in block_map],
+                    'ports': [(port_map[key], before, after) for key, before, after in step['ports']
+                              if key in port_map]}
+
+        undo_steps = [remap_step(step) for step in self.undo_stack]
+        self.undo_stack = deque(step for step in undo_steps if step['blocks'] or step['ports'])
+        self.redo_stack = [step for step in map(remap_step, self.redo_stack) if step['blocks'] or step['ports']]
+        self.records = sum(len(step['blocks']) + len(step['ports']) for step in self.undo_stack)
+        self.gesture = None
+
+    def begin(self, label):
+        """Start collecting a gesture (an unfinished one is discarded)"""
+        self.gesture = {'label': label, 'blocks': {}, 'ports': {}}
+
+    def touch_block(self, block):
+        """Save a block's state the first time the open gesture touches it"""
+        if self.gesture is not None and block['id'] not in self.gesture['blocks']:
+            self.gesture['blocks'][block['id']] = capture(block, BLOCK_FIELDS)
+
+    def touch_port(self, conn_index, port_type, port):
+        """Save a port's state (None if it does not exist yet) the first time it is touched"""
+        key = (conn_index, port_type)
+        if self.gesture is not None and key not in self.gesture['ports']:
+            self.gesture['ports'][key] = capture(port, PORT_FIELDS)
+
+    def end(self, blocks, connections):
+        """Close the open gesture and push it if anything changed
+
+        Returns the recorded step, or None if the gesture was a no-op.
+        """
+        gesture, self.gesture = self.gesture, None
+        if gesture is None:
+            return None
+
+        block_deltas = []
+        for block_id, before in gesture['blocks'].items():
+            after = capture(blocks[block_id], BLOCK_FIELDS)
+            if after != before:
+                block_deltas.append((block_id, before, after))
+
+        port_deltas = []
+        for (conn_index, port_type), before in gesture['ports'].items():
+            port = connections[conn_index].get('port_positions', {}).get(port_type)
+            after = capture(port, PORT_FIELDS)
+            if after != before:
+                port_deltas.append(((conn_index, port_type), before, after))
+
+        if not block_deltas and not port_deltas:
+            return None
+
+        step = {'label': gesture['label'], 'blocks': block_deltas, 'ports': port_deltas}
+        self.undo_stack.append(step)
+        self.records += len(block_deltas) + len(port_deltas)
+        self.redo_stack = []
+
+        # Forget the oldest steps beyond the bounds (always keep the newest)
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.max_steps or
+                                            self.records > self.max_records):
+            oldest = self.undo_stack.popleft()
+            self.records -= len(oldest['blocks']) + len(oldest['ports'])
+        self.notify(step, 2)
+        return step
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self, blocks, connections):
+        """Revert the newest step; returns it (or None if there is nothing to undo)"""
+        if not self.undo_stack:
+            return None
+        step = self.undo_stack.pop()
+        self.records -= len(step['blocks']) + len(step['ports'])
+        self.apply(step, blocks, connections, 1)
+        self.redo_stack.append(step)
+        self.notify(step, 1)
+        return step
+
+    def redo(self, blocks, connections):
+        """Re-apply the newest undone step; returns it (or None)"""
+        if not self.redo_stack:
+            return None
+        step = self.redo_stack.pop()
+        self.apply(step, blocks, connections, 2)
+        self.undo_stack.append(step)
+        self.records += len(step['blocks']) + len(step['ports'])
+        self.notify(step, 2)
+        return step
+
+    def notify(self, step, which):
+        if self.listener is not None:
+            self.listener(step, which)
+
+    @staticmethod
+    def apply(step, blocks, connections, which):
+        """Write the before (which=1) or after (which=2) states of a step"""
+        for delta in step['blocks']:
+            restore(blocks[delta[0]], BLOCK_FIELDS, delta[which])
+
+        for delta in step['ports']:
+            conn_index, port_type = delta[0]
+            state = delta[which]
+            ports = connections[conn_index].setdefault('port_positions', {})
+            if state is None:
+                ports.pop(port_type, None)
+                if not ports:
+                    del connections[conn_index]['port_positions']
+            else:
+                restore(ports.setdefault(port_type, {}), PORT_FIELDS, state)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Edit journal for the floorplanning tool
+Appends model edits to a binary journal from a background thread and
+periodically compacts it into a snapshot for crash recovery
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from floorplan_history import BLOCK_FIELDS, PORT_FIELDS, MISSING
+
+# Fixed-size journal record: every record holds the complete new state of one object
+RECORD = np.dtype([
+    ('op', 'u1'),           # OP_* below
+    ('index', '<u4'),       # Block id or connection index
+    ('port', 'u1'),         # Port: 0 = start port, 1 = end port; block: layer
+    ('flag', 'i1'),         # Block: soft (-1 = unset); port: edge code (-1 = unset)
+    ('pinned', 'i1'),       # Port: pinned (-1 = unset)
+    ('values', '<f8', 7)    # Block: x, y, width, height, area, aspect_min, aspect_max; port: x, y
+])
+OP_HEADER, OP_BLOCK, OP_PORT, OP_PORT_REMOVED = range(4)
+MAGIC = 0x4A50463F          # Stored in the header record's index field
+
+PORT_TYPES = ('start', 'end')
+EDGE_CODES = ('left', 'right', 'bottom', 'top')
+
+
+def encode_step(step, which):
+    """Encode the before (which=1) or after (which=2) states of a history step"""
+    records = np.zeros(len(step['blocks']) + len(step['ports']), dtype=RECORD)
+    for n, delta in enumerate(step['blocks']):
+        state = dict(zip(BLOCK_FIELDS, delta[which]))
+        record = records[n]
+        record['op'] = OP_BLOCK
+        record['index'] = delta[0]
+        record['values'] = [np.nan if state[field] is MISSING else float(state[field])
+                            for field in ('x', 'y', 'width', 'height', 'area', 'aspect_min', 'aspect_max')]
+        record['flag'] = -1 if state['soft'] is MISSING else int(bool(state['soft']))
+        record['port'] = 0 if state['layer'] is MISSING else state['layer']
+
+    for n, delta in enumerate(step['ports'], len(step['blocks'])):
+        (conn_index, port_type), state = delta[0], delta[which]
+        record = records[n]
+        record['index'] = conn_index
+        record['port'] = PORT_TYPES.index(port_type)
+        if state is None:
+            record['op'] = OP_PORT_REMOVED
+            continue
+        state = dict(zip(PORT_FIELDS, state))
+        record['op'] = OP_PORT
+        record['values'][:2] = [state['x'], state['y']]
+        record['flag'] = EDGE_CODES.index(state['edge']) if state['edge'] in EDGE_CODES else -1
+        record['pinned'] = -1 if state['pinned'] is MISSING else int(bool(state['pinned']))
+    return records
+
+
+def header_record():
+    header = np.zeros(1, dtype=RECORD)
+    header['op'] = OP_HEADER
+    header['index'] = MAGIC
+    return header
+
+
+def read_journal(filename):
+    """Read all complete records of a journal (a torn last record is ignored)"""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    usable = len(data) - len(data) % RECORD.itemsize
+    records = np.frombuffer(data[:usable], dtype=RECORD)
+    if not len(records) or records[0]['op'] != OP_HEADER or records[0]['index'] != MAGIC:
+        raise ValueError(f"{filename} is not a floorplan journal")
+    return records[1:]
+
+
+def apply_records(records, blocks, connections):
+    """Apply journal records to the model; only the last record per object matters
+
+    Records hold absolute states, so replay is idempotent and the newest
+    record of every block and port wins.
+    """
+    if not len(records):
+        return
+    is_block = records['op'] == OP_BLOCK
+    keys = np.where(is_block, -1 - records['index'].astype(np.int64),
+                    records['index'].astype(np.int64) * 2 + records['port'])
+    # Index of the last occurrence of every key
+    _, reversed_first = np.unique(keys[::-1], return_index=True)
+    latest = records[len(records) - 1 - reversed_first]
+
+    for record in latest[latest['op'] == OP_BLOCK]:
+        block = blocks[int(record['index'])]
+        values = record['values'].tolist()
+        block['x'], block['y'], block['width'], block['height'], block['area'] = values[:5]
+        for field, value in (('aspect_min', values[5]), ('aspect_max', values[6])):
+            if np.isnan(value):
+                block.pop(field, None)
+            else:
+                block[field] = value
+        if record['flag'] < 0:
+            block.pop('soft', None)
+        else:
+            block['soft'] = bool(record['flag'])
+        if record['port']:
+            block['layer'] = int(record['port'])
+        else:
+            block.pop('layer', None)
+
+    for record in latest[latest['op'] != OP_BLOCK]:
+        conn = connections[int(record['index'])]
+        port_type = PORT_TYPES[record['port']]
+        if record['op'] == OP_PORT_REMOVED:
+            ports = conn.get('port_positions', {})
+            ports.pop(port_type, None)
+            if 'port_positions' in conn and not ports:
+                del conn['port_positions']
+            continue
+        port = conn.setdefault('port_positions', {}).setdefault(port_type, {})
+        port['x'], port['y'] = record['values'][:2].tolist()
+        if record['flag'] >= 0:
+            port['edge'] = EDGE_CODES[record['flag']]
+        if record['pinned'] < 0:
+            port.pop('pinned', None)
+        else:
+            port['pinned'] = bool(record['pinned'])
+
+
+def write_snapshot(filename, state):
+    """Atomically replace the snapshot file with the given model state"""
+    temp = filename + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump(state, f, default=lambda value: value.item())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, filename)
+
+
+def load_session(directory):
+    """Load the snapshot and replay the journal; returns the model state or None"""
+    snapshot = os.path.join(directory, 'snapshot.json')
+    if not os.path.exists(snapshot):
+        return None
+    with open(snapshot) as f:
+        state = json.load(f)
+    journal = os.path.join(directory, 'journal.bin')
+    if os.path.exists(journal):
+        apply_records(read_journal(journal), state['blocks'], state['connections'])
+    return state
+
+
+class EditJournal:
+    """Append-only journal written by a background thread
+
+    The GUI thread only encodes records and puts them on a queue. The writer
+    thread appends them to journal.bin, fsyncs at most every sync_interval
+    seconds, and keeps its own copy of the model so it can rewrite
+    snapshot.json and truncate the journal every compact_records records.
+    """
+
+    def __init__(self, directory, compact_records=200000, sync_interval=1.0):
+        self.directory = directory      # None disables journaling
+        self.compact_records = compact_records
+        self.sync_interval = sync_interval
+        self.snapshot_file = os.path.join(directory, 'snapshot.json') if directory else None
+        self.journal_file = os.path.join(directory, 'journal.bin') if directory else None
+        self.queue = queue.Queue()
+        self.thread = None
+        self.error = None               # Last exception raised by the writer thread
+
+    def has_session(self):
+        """Check whether a previous session was left behind"""
+        return self.directory is not None and os.path.exists(self.snapshot_file)
+
+    def start(self, state):
+        """Start journaling a freshly loaded design (state is copied by the caller)"""
+        if self.directory is None:
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='floorplan-journal', daemon=True)
+            self.thread.start()
+        self.queue.put(('start', state))
+
+    def record_step(self, step, which=2):
+        """Journal the states a history step left behind (which=1 after an undo)"""
+        if self.thread is not None and (step['blocks'] or step['ports']):
+            self.queue.put(('records', encode_step(step, which)))
+
+    def close(self, discard=True):
+        """Flush and stop the writer; discard removes the session files"""
+        if self.thread is None:
+            if discard:
+                self.remove_files()
+            return
+        self.queue.put(('close', discard))
+        self.thread.join()
+        self.thread = None
+
+    def remove_files(self):
+        for filename in (self.journal_file, self.snapshot_file):
+            if filename and os.path.exists(filename):
+                os.remove(filename)
+
+    def run(self):
+        """Writer thread main loop"""
+        journal = None
+        state = None
+        written = 0
+        last_sync = time.monotonic()
+        while True:
+            try:
+                kind, payload = self.queue.get(timeout=self.sync_interval)
+            except queue.Empty:
+                kind, payload = None, None
+
+            try:
+                if kind == 'start':
+                    state = payload
+                    journal = self.compact(journal, state)
+                    written = 0
+                elif kind == 'records' and journal is not None:
+                    journal.write(payload.tobytes())
+                    apply_records(payload, state['blocks'], state['connections'])
+                    written += len(payload)
+                    if written >= self.compact_records:
+                        journal = self.compact(journal, state)
+                        written = 0
+                elif kind == 'close':
+                    if journal is not None:
+                        journal.close()
+                    if payload:
+                        self.remove_files()
+                    return
+
+                if journal is not None and time.monotonic() - last_sync >= self.sync_interval:
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                    last_sync = time.monotonic()
+            except Exception as e:
+                # Keep the GUI running; the journal is best effort
+                self.error = e
+                if not isinstance(e, (OSError, ValueError)) and journal is not None:
+                    # The writer's copy of the model no longer matches the GUI, so stop
+                    # journaling (and compacting it) until the next design is loaded
+                    try:
+                        journal.close()
+                    except OSError:
+                        pass
+                    journal = None
+
+    def compact(self, journal, state):
+        """Write the model as a new snapshot and start an empty journal"""
+        if journal is not None:
+            journal.close()
+        os.makedirs(self.directory, exist_ok=True)
+        write_snapshot(self.snapshot_file, state)
+        journal = open(self.journal_file, 'wb')
+        journal.write(header_record().tobytes())
+        journal.flush()
+        return journal
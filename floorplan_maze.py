@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Obstacle-aware grid maze router for the floorplanning tool
+Routes the middle leg of each connection around hardmacros with A*
+"""
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Step directions on the routing grid: right, left, up, down
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def astar_route(cost, start, goal, bend_cost=2.0):
+    """Find the cheapest 4-connected cell path from start to goal
+
+    cost is an (nx, ny) array with the price of entering each cell,
+    start and goal are (ix, iy) cells. Returns the list of cells.
+    """
+    nx, ny = cost.shape
+    if start == goal:
+        return [start]
+
+    goal_x, goal_y = goal
+    cost_list = cost.tolist()
+    best = {}
+    parent = {}
+    counter = 0
+    heap = []
+    for d in range(4):
+        state = (start[0], start[1], d)
+        best[state] = 0.0
+        heap.append((abs(goal_x - start[0]) + abs(goal_y - start[1]), counter, 0.0, state))
+        counter += 1
+    heapq.heapify(heap)
+
+    while heap:
+        _, _, g, state = heapq.heappop(heap)
+        if g > best.get(state, float('inf')):
+            continue
+        x, y, d = state
+        if x == goal_x and y == goal_y:
+            # Walk back to the start
+            cells = [(x, y)]
+            while state in parent:
+                state = parent[state]
+                if (state[0], state[1]) != cells[-1]:
+                    cells.append((state[0], state[1]))
+            cells.reverse()
+            return cells
+
+        for nd, (ddx, ddy) in enumerate(DIRECTIONS):
+            cx, cy = x + ddx, y + ddy
+            if cx < 0 or cy < 0 or cx >= nx or cy >= ny:
+                continue
+            new_g = g + cost_list[cx][cy] + (bend_cost if nd != d else 0.0)
+            new_state = (cx, cy, nd)
+            if new_g < best.get(new_state, float('inf')):
+                best[new_state] = new_g
+                parent[new_state] = state
+                counter += 1
+                heapq.heappush(heap, (new_g + abs(goal_x - cx) + abs(goal_y - cy), counter, new_g, new_state))
+
+    return [start, goal]
+
+
+def route_batch(args):
+    """Route a batch of (key, start_cell, goal_cell) requests (process pool worker)"""
+    cost, bend_cost, batch = args
+    return [(key, astar_route(cost, start, goal, bend_cost)) for key, start, goal in batch]
+
+
+def rects_intersect(a, b):
+    """Check whether two (x_min, y_min, x_max, y_max) rectangles overlap"""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class MazeRouter:
+    """Grid router that treats blocks as obstacles and caches routes per connection"""
+
+    def __init__(self, cell_size=25.0, clearance=10.0, obstacle_cost=50.0, bend_cost=2.0,
+                 capacity=4, history_cost=1.0, present_cost=2.0):
+        self.cell_size = float(cell_size)
+        self.clearance = float(clearance)
+        self.obstacle_cost = float(obstacle_cost)
+        self.bend_cost = float(bend_cost)
+        self.capacity = capacity            # Routes per cell before it counts as overflowed
+        self.history_cost = float(history_cost)
+        self.present_cost = float(present_cost)
+
+        self.origin = (0.0, 0.0)
+        self.shape = (0, 0)
+        self.obstacles = np.zeros((0, 0), dtype=bool)
+        self.history = np.zeros((0, 0))
+        self.block_rects = {}       # block id -> rect at the last obstacle update
+        self.changed_rects = []     # Rects (old and new) of blocks changed since the last routing pass
+
+        # Route cache: key -> {'endpoints', 'cells', 'points', 'corridor'}
+        self.routes = {}
+
+    def to_cell(self, point):
+        """Convert a point to a clamped grid cell"""
+        nx, ny = self.shape
+        ix = int((point[0] - self.origin[0]) // self.cell_size)
+        iy = int((point[1] - self.origin[1]) // self.cell_size)
+        return min(max(ix, 0), nx - 1), min(max(iy, 0), ny - 1)
+
+    def cell_center(self, cell):
+        """Return the center point of a grid cell"""
+        return (self.origin[0] + (cell[0] + 0.5) * self.cell_size,
+                self.origin[1] + (cell[1] + 0.5) * self.cell_size)
+
+    def set_obstacles(self, blocks, bounds, margin=0.0):
+        """Rasterize blocks into the obstacle grid and record which blocks changed
+
+        bounds = (x_min, y_min, x_max, y_max) is the area that must be routable.
+        When it grows beyond the current grid, the grid is rebuilt with an extra
+        margin on every side and all cached routes are dropped.
+        """
+        x_min, y_min, x_max, y_max = bounds
+        ox, oy = self.origin
+        nx, ny = self.shape
+        if (not self.obstacles.size or x_min < ox or y_min < oy or
+                x_max > ox + nx * self.cell_size or y_max > oy + ny * self.cell_size):
+            x_min, y_min, x_max, y_max = x_min - margin, y_min - margin, x_max + margin, y_max + margin
+            self.origin = (float(x_min), float(y_min))
+            self.shape = (max(1, int(np.ceil((x_max - x_min) / self.cell_size))),
+                          max(1, int(np.ceil((y_max - y_min) / self.cell_size))))
+            self.history = np.zeros(self.shape)
+            self.block_rects = {}
+            self.routes = {}
+
+        rects = {}
+        for block in blocks:
+            rects[block['id']] = (block['x'] - self.clearance, block['y'] - self.clearance,
+                                  block['x'] + block['width'] + self.clearance,
+                                  block['y'] + block['height'] + self.clearance)
+
+        for block_id in set(rects) | set(self.block_rects):
+            old_rect = self.block_rects.get(block_id)
+            new_rect = rects.get(block_id)
+            if old_rect != new_rect:
+                self.changed_rects.extend(r for r in (old_rect, new_rect) if r is not None)
+
+        if self.changed_rects or not self.obstacles.size:
+            self.obstacles = self.rasterize_rects(list(rects.values()))
+        self.block_rects = rects
+
+    def remap(self, block_map, key_map):
+        """Renumber blocks and route keys (e.g. after an ECO); removed blocks count as changed"""
+        rects = {}
+        for block_id, rect in self.block_rects.items():
+            if block_id in block_map:
+                rects[block_map[block_id]] = rect
+            else:
+                self.changed_rects.append(rect)
+        self.block_rects = rects
+        self.routes = {key_map[key]: route for key, route in self.routes.items() if key in key_map}
+
+    def rasterize_rects(self, rects):
+        """Mark every cell overlapped by a rect as blocked"""
+        nx, ny = self.shape
+        grid = np.zeros((nx, ny), dtype=bool)
+        if not rects:
+            return grid
+        r = np.asarray(rects, dtype=float)
+        ix0 = np.clip(((r[:, 0] - self.origin[0]) // self.cell_size).astype(int), 0, nx - 1)
+        iy0 = np.clip(((r[:, 1] - self.origin[1]) // self.cell_size).astype(int), 0, ny - 1)
+        ix1 = np.clip(((r[:, 2] - self.origin[0]) // self.cell_size).astype(int), 0, nx - 1)
+        iy1 = np.clip(((r[:, 3] - self.origin[1]) // self.cell_size).astype(int), 0, ny - 1)
+
+        # 2D difference array, then prefix sums give the covered cells
+        diff = np.zeros((nx + 1, ny + 1), dtype=np.int32)
+        np.add.at(diff, (ix0, iy0), 1)
+        np.add.at(diff, (ix1 + 1, iy0), -1)
+        np.add.at(diff, (ix0, iy1 + 1), -1)
+        np.add.at(diff, (ix1 + 1, iy1 + 1), 1)
+        return diff.cumsum(axis=0).cumsum(axis=1)[:nx, :ny] > 0
+
+    def usage(self, exclude=None):
+        """Count how many cached routes pass through each cell"""
+        nx, ny = self.shape
+        cells = [route['cells'] for key, route in self.routes.items() if key != exclude]
+        if not cells:
+            return np.zeros((nx, ny))
+        flat = np.concatenate(cells)
+        return np.bincount(flat, minlength=nx * ny).reshape(nx, ny).astype(float)
+
+    def cost_grid(self, usage=None):
+        """Price of entering each cell: base + obstacles + congestion history/present"""
+        cost = 1.0 + self.obstacles * self.obstacle_cost + self.history * self.history_cost
+        if usage is not None:
+            cost += np.maximum(0, usage + 1 - self.capacity) * self.present_cost
+        return cost
+
+    def store_route(self, key, start, goal, cells):
+        """Convert a cell path into middle-leg points and cache it"""
+        nx, ny = self.shape
+        cell_array = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        flat = cell_array[:, 0] * ny + cell_array[:, 1]
+
+        # Corner cells of the path (start, bends, goal) as cell centers
+        corners = [list(self.cell_center(cells[0]))]
+        for n in range(1, len(cells) - 1):
+            before, after = cells[n - 1], cells[n + 1]
+            if before[0] != after[0] and before[1] != after[1]:
+                corners.append(list(self.cell_center(cells[n])))
+        if len(cells) > 1:
+            corners.append(list(self.cell_center(cells[-1])))
+
+        # Slide the first and last runs onto the endpoints to avoid small jogs
+        if len(corners) > 2:
+            axis = 1 if corners[0][1] == corners[1][1] else 0
+            corners[0][axis] = corners[1][axis] = start[axis]
+            axis = 1 if corners[-1][1] == corners[-2][1] else 0
+            corners[-1][axis] = corners[-2][axis] = goal[axis]
+        elif len(corners) == 2:
+            axis = 1 if corners[0][1] == corners[1][1] else 0
+            corners[0][axis] = corners[1][axis] = start[axis]
+
+        # Rectilinear point list from start through the corners to goal
+        points = [tuple(start)]
+        for corner in corners + [list(goal)]:
+            corner = tuple(corner)
+            if corner[0] != points[-1][0] and corner[1] != points[-1][1]:
+                points.append((corner[0], points[-1][1]))
+            points.append(corner)
+
+        # Drop collinear and duplicate points
+        compact = [points[0]]
+        for n in range(1, len(points) - 1):
+            prev, point, nxt = compact[-1], points[n], points[n + 1]
+            if point == prev:
+                continue
+            if (prev[0] == point[0] == nxt[0]) or (prev[1] == point[1] == nxt[1]):
+                continue
+            compact.append(point)
+        compact.append(points[-1])
+
+        # Corridor: the area whose obstacles can change this route
+        x0 = min(start[0], goal[0], self.origin[0] + cell_array[:, 0].min() * self.cell_size)
+        y0 = min(start[1], goal[1], self.origin[1] + cell_array[:, 1].min() * self.cell_size)
+        x1 = max(start[0], goal[0], self.origin[0] + (cell_array[:, 0].max() + 1) * self.cell_size)
+        y1 = max(start[1], goal[1], self.origin[1] + (cell_array[:, 1].max() + 1) * self.cell_size)
+
+        self.routes[key] = {
+            'endpoints': (tuple(start), tuple(goal)),
+            'cells': flat,
+            'points': compact[1:-1],
+            'corridor': (x0 - self.cell_size, y0 - self.cell_size,
+                         x1 + self.cell_size, y1 + self.cell_size)
+        }
+
+    def is_dirty(self, key, start, goal):
+        """Check whether a cached route must be rerouted"""
+        route = self.routes.get(key)
+        if route is None or route['endpoints'] != (tuple(start), tuple(goal)):
+            return True
+        return any(rects_intersect(route['corridor'], rect) for rect in self.changed_rects)
+
+    def route_connections(self, requests, processes=None, parallel_threshold=200):
+        """Route requests = {key: (start, goal)}, rerouting only dirty connections
+
+        Returns {key: middle-leg points}. Cached routes whose endpoints are
+        unchanged and whose corridor no moved block touches are reused.
+        """
+        for key in list(self.routes):
+            if key not in requests:
+                del self.routes[key]
+
+        dirty = [key for key, (start, goal) in requests.items() if self.is_dirty(key, start, goal)]
+        self.changed_rects = []
+        if dirty:
+            self.route_keys(dirty, requests, processes, parallel_threshold)
+
+        return {key: self.routes[key]['points'] for key in requests}
+
+    def route_keys(self, keys, requests, processes=None, parallel_threshold=200):
+        """Route the given keys against the current obstacles and congestion"""
+        for key in keys:
+            self.routes.pop(key, None)
+        cost = self.cost_grid(self.usage())
+        batch = [(key, self.to_cell(requests[key][0]), self.to_cell(requests[key][1])) for key in keys]
+
+        if len(batch) >= parallel_threshold and (processes is None or processes > 1):
+            # Fan large reroutes out to a process pool, one chunk per worker
+            workers = processes or os.cpu_count() or 1
+            chunks = [batch[n::workers] for n in range(workers) if batch[n::workers]]
+            results = []
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for chunk_result in pool.map(route_batch, [(cost, self.bend_cost, chunk) for chunk in chunks]):
+                    results.extend(chunk_result)
+        else:
+            results = route_batch((cost, self.bend_cost, batch))
+
+        for key, cells in results:
+            start, goal = requests[key]
+            self.store_route(key, start, goal, cells)
+
+    def reroute_all(self, requests, processes=None, parallel_threshold=200):
+        """Drop every cached route and route all requests from scratch"""
+        self.routes = {}
+        self.history = np.zeros(self.shape)
+        self.changed_rects = []
+        self.route_keys(list(requests), requests, processes, parallel_threshold)
+        return {key: self.routes[key]['points'] for key in requests}
+
+    def overflow(self):
+        """Return the total routes above capacity summed over all cells"""
+        return float(np.maximum(0, self.usage() - self.capacity).sum())
+
+    def rip_up_and_reroute(self, requests, iterations=5):
+        """Negotiate congestion by rerouting connections through overflowed cells
+
+        Each iteration raises the history cost of overflowed cells, then rips
+        up and sequentially reroutes every connection crossing one of them.
+        Returns the remaining overflow.
+        """
+        for _ in range(iterations):
+            usage = self.usage()
+            over = usage > self.capacity
+            if not over.any():
+                break
+            self.history += np.maximum(0, usage - self.capacity)
+
+            over_flat = over.reshape(-1)
+            victims = [key for key, route in self.routes.items()
+                       if key in requests and over_flat[route['cells']].any()]
+            for key in victims:
+                # Rip up, then reroute with everyone else's routes as present congestion
+                del self.routes[key]
+                cost = self.cost_grid(self.usage())
+                start, goal = requests[key]
+                cells = astar_route(cost, self.to_cell(start), self.to_cell(goal), self.bend_cost)
+                self.store_route(key, start, goal, cells)
+
+        return self.overflow()
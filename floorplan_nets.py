@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Multi-pin nets for the floorplanning tool
+Stores nets as compressed sparse rows (net -> blocks) and computes ports,
+half-perimeter wirelength and star or single-trunk Steiner routes for all
+nets at once
+"""
+
+import numpy as np
+
+# Port edge codes (same order as the edit journal)
+EDGES = ('left', 'right', 'bottom', 'top')
+
+ROUTE_STYLES = ('steiner', 'star')
+
+
+def block_geometry(blocks):
+    """(x, y, width, height) of every block as an N x 4 array"""
+    return np.array([(b['x'], b['y'], b['width'], b['height']) for b in blocks], dtype=float).reshape(-1, 4)
+
+
+class NetList:
+    """Hyperedge nets in CSR form
+
+    net_pins[net_ptr[n]:net_ptr[n + 1]] are the distinct blocks of net n.
+    Every pin gets one port on its block, so a 40-pin bus is 40 ports and
+    one route tree instead of 780 pairwise connections.
+    """
+
+    def __init__(self, net_ptr, net_pins, weights=None, names=None):
+        self.net_ptr = np.asarray(net_ptr, dtype=np.int64)
+        self.net_pins = np.asarray(net_pins, dtype=np.int64)
+        self.degrees = np.diff(self.net_ptr)
+        self.pin_nets = np.repeat(np.arange(len(self.degrees)), self.degrees)     # Net of every pin
+        self.weights = np.ones(len(self.degrees)) if weights is None else np.asarray(weights, dtype=float)
+        self.names = names
+
+    def __len__(self):
+        return len(self.degrees)
+
+    @classmethod
+    def from_bookshelf(cls, netlist):
+        return cls(netlist['net_ptr'], netlist['net_pins'], names=netlist['net_names'])
+
+    @classmethod
+    def from_connections(cls, connections):
+        """Two-pin nets from pairwise connections, weighted by their connection counts"""
+        pins = np.array([(conn['from'], conn['to']) for conn in connections], dtype=np.int64).reshape(-1, 2)
+        return cls(np.arange(0, 2 * len(pins) + 1, 2), pins.ravel(),
+                   [conn['connections'] for conn in connections])
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['net_ptr'], state['net_pins'], state['weights'], state.get('names'))
+
+    def to_dict(self):
+        """Plain-list form for JSON snapshots"""
+        return {'net_ptr': self.net_ptr.tolist(), 'net_pins': self.net_pins.tolist(),
+                'weights': self.weights.tolist(), 'names': self.names}
+
+    def restrict(self, keep_blocks):
+        """Nets with the pins on blocks where keep_blocks (a boolean array) is False dropped"""
+        keep = keep_blocks[self.net_pins]
+        counts = np.bincount(self.pin_nets[keep], minlength=len(self))
+        return NetList(np.concatenate([[0], np.cumsum(counts)]), self.net_pins[keep], self.weights, self.names)
+
+    def net_sums(self, values):
+        return np.bincount(self.pin_nets, weights=values, minlength=len(self))
+
+    def assign_ports(self, geometry, margin=10):
+        """One port per pin on the block edge facing the centre of its net
+
+        Returns the port x, y and edge code (index into EDGES) of every pin.
+        """
+        x, y, w, h = geometry[self.net_pins].T
+        cx = x + w / 2
+        cy = y + h / 2
+        count = np.maximum(self.degrees, 1)
+        dx = (self.net_sums(cx) / count)[self.pin_nets] - cx
+        dy = (self.net_sums(cy) / count)[self.pin_nets] - cy
+
+        # Leave through the side the net centre lies beyond, relative to the block's aspect
+        horizontal = np.abs(dx) * h > np.abs(dy) * w
+        edges = np.where(horizontal, np.where(dx > 0, 1, 0), np.where(dy > 0, 3, 2))
+        mx = np.minimum(margin, w / 2)
+        my = np.minimum(margin, h / 2)
+        px = np.where(horizontal, np.where(dx > 0, x + w, x), np.clip(cx + dx, x + mx, x + w - mx))
+        py = np.where(horizontal, np.clip(cy + dy, y + my, y + h - my), np.where(dy > 0, y + h, y))
+        return px, py, edges
+
+    def hpwl(self, px, py):
+        """Half-perimeter wirelength of every net from its port positions"""
+        result = np.zeros(len(self))
+        used = self.degrees > 0
+        if not used.any():
+            return result
+        starts = self.net_ptr[:-1][used]
+        result[used] = (np.maximum.reduceat(px, starts) - np.minimum.reduceat(px, starts) +
+                        np.maximum.reduceat(py, starts) - np.minimum.reduceat(py, starts))
+        return result
+
+    def total_hpwl(self, px, py):
+        """Weighted wirelength of the design"""
+        return float((self.weights * self.hpwl(px, py)).sum())
+
+    def median(self, values):
+        """Median (upper middle) of the pin values of every net"""
+        order = np.lexsort((values, self.pin_nets))
+        middle = np.minimum(self.net_ptr[:-1] + self.degrees // 2, max(len(values) - 1, 0))
+        return values[order][middle] if len(values) else np.zeros(len(self))
+
+    def route_segments(self, px, py, style='steiner', with_nets=False):
+        """Route segments of all nets with two or more pins as an S x 2 x 2 array
+
+        'steiner' draws one trunk through the median pin along the longer
+        side of the net's bounding box with a perpendicular branch per pin;
+        'star' joins every pin to the net centre with an L. with_nets also
+        returns the net of every segment.
+        """
+        if style not in ROUTE_STYLES:
+            raise ValueError(f"Unknown net route style: {style}")
+        routed = self.degrees >= 2
+        pins = routed[self.pin_nets]
+        net = self.pin_nets[pins]
+        x, y = px[pins], py[pins]
+
+        if style == 'star':
+            count = np.maximum(self.degrees, 1)
+            centre_x = (self.net_sums(px) / count)[net]
+            centre_y = (self.net_sums(py) / count)[net]
+            first = np.stack([np.column_stack([x, y]), np.column_stack([centre_x, y])], axis=1)
+            second = np.stack([np.column_stack([centre_x, y]), np.column_stack([centre_x, centre_y])], axis=1)
+            segments = np.concatenate([first, second])
+            return (segments, np.concatenate([net, net])) if with_nets else segments
+
+        used = self.degrees > 0
+        x_min = np.zeros(len(self))
+        x_max = np.zeros(len(self))
+        y_min = np.zeros(len(self))
+        y_max = np.zeros(len(self))
+        if used.any():
+            starts = self.net_ptr[:-1][used]
+            x_min[used] = np.minimum.reduceat(px, starts)
+            x_max[used] = np.maximum.reduceat(px, starts)
+            y_min[used] = np.minimum.reduceat(py, starts)
+            y_max[used] = np.maximum.reduceat(py, starts)
+        trunk_x = self.median(px)
+        trunk_y = self.median(py)
+        horizontal = (x_max - x_min) >= (y_max - y_min)
+
+        # Trunks along the longer side of every routed net
+        nets = np.flatnonzero(routed)
+        h = horizontal[nets]
+        trunks = np.empty((len(nets), 2, 2))
+        trunks[:, 0, 0] = np.where(h, x_min[nets], trunk_x[nets])
+        trunks[:, 0, 1] = np.where(h, trunk_y[nets], y_min[nets])
+        trunks[:, 1, 0] = np.where(h, x_max[nets], trunk_x[nets])
+        trunks[:, 1, 1] = np.where(h, trunk_y[nets], y_max[nets])
+
+        # Branches from every pin straight onto its trunk
+        h = horizontal[net]
+        branches = np.empty((len(x), 2, 2))
+        branches[:, 0, 0] = x
+        branches[:, 0, 1] = y
+        branches[:, 1, 0] = np.where(h, x, trunk_x[net])
+        branches[:, 1, 1] = np.where(h, trunk_y[net], y)
+        moving = (branches[:, 0] != branches[:, 1]).any(axis=1)
+        segments = np.concatenate([trunks, branches[moving]])
+        return (segments, np.concatenate([nets, net[moving]])) if with_nets else segments
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Global port assignment for the floorplanning tool
+Spreads connection ports evenly along block edges, ordered to avoid crossings
+"""
+
+import numpy as np
+
+# Edge codes used in the assignment arrays
+EDGE_NAMES = ('left', 'right', 'bottom', 'top')
+LEFT, RIGHT, BOTTOM, TOP = range(4)
+
+# Outward normal angle of each edge and the sort direction along it
+NORMAL_ANGLES = np.array([np.pi, 0.0, -np.pi / 2, np.pi / 2])
+SORT_SIGNS = np.array([-1.0, 1.0, 1.0, -1.0])
+
+
+class PortAssigner:
+    """Assigns ports per (block, edge) group with incremental updates
+
+    Endpoints are numbered 0..2C-1: endpoint c is the start port of connection c
+    and endpoint C + c is its end port.
+    """
+
+    def __init__(self, margin=20):
+        self.margin = margin            # Keep ports this far from block corners
+        self.num_connections = 0
+        self.block = np.zeros(0, dtype=np.int64)    # Block owning each endpoint
+        self.other = np.zeros(0, dtype=np.int64)    # Block at the far end
+        self.edge = np.zeros(0, dtype=np.int64)     # Current edge code (-1 = unassigned)
+        self.incidence_ptr = np.zeros(1, dtype=np.int64)
+        self.incidence = np.zeros(0, dtype=np.int64)
+
+    def build(self, blocks, connections):
+        """Index endpoints by block for the current connections"""
+        from_ids = np.array([conn['from'] for conn in connections], dtype=np.int64)
+        to_ids = np.array([conn['to'] for conn in connections], dtype=np.int64)
+        self.num_connections = len(connections)
+        self.block = np.concatenate([from_ids, to_ids])
+        self.other = np.concatenate([to_ids, from_ids])
+        self.edge = np.full(len(self.block), -1, dtype=np.int64)
+
+        # CSR incidence: endpoints of block b are incidence[ptr[b]:ptr[b + 1]]
+        order = np.argsort(self.block, kind='stable')
+        counts = np.bincount(self.block, minlength=len(blocks))
+        self.incidence_ptr = np.concatenate([[0], np.cumsum(counts)])
+        self.incidence = order
+
+    def is_built(self, connections):
+        """Check whether the index matches the connection list"""
+        return self.num_connections == len(connections) and len(self.block) == 2 * len(connections)
+
+    def endpoints_of(self, block_ids):
+        """Return all endpoints attached to the given blocks"""
+        block_ids = np.asarray(sorted(block_ids), dtype=np.int64)
+        if not len(block_ids):
+            return np.zeros(0, dtype=np.int64)
+        starts = self.incidence_ptr[block_ids]
+        counts = self.incidence_ptr[block_ids + 1] - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return self.incidence[np.repeat(starts, counts) + offsets]
+
+    @staticmethod
+    def geometry(blocks, block_ids):
+        """Gather (x, y, width, height) arrays for the given block ids"""
+        rows = [(blocks[b]['x'], blocks[b]['y'], blocks[b]['width'], blocks[b]['height']) for b in block_ids]
+        geom = np.array(rows, dtype=float).reshape(-1, 4)
+        return geom[:, 0], geom[:, 1], geom[:, 2], geom[:, 3]
+
+    def choose_edges(self, blocks, endpoints):
+        """Pick the edge facing the far block, plus the angle to the far block"""
+        x, y, w, h = self.geometry(blocks, self.block[endpoints])
+        ox, oy, ow, oh = self.geometry(blocks, self.other[endpoints])
+        dx = (ox + ow / 2) - (x + w / 2)
+        dy = (oy + oh / 2) - (y + h / 2)
+
+        # Same rule as find_edge_connection_points: dominant axis picks the edge
+        edges = np.where(np.abs(dx) > np.abs(dy),
+                         np.where(dx > 0, RIGHT, LEFT),
+                         np.where(dy > 0, TOP, BOTTOM))
+        return edges, np.arctan2(dy, dx)
+
+    def place(self, blocks, endpoints, edges, angles):
+        """Space the endpoints evenly along their edges, ordered by angle
+
+        Returns a list of (connection index, 'start'/'end', x, y, edge name).
+        """
+        if not len(endpoints):
+            return []
+        x, y, w, h = self.geometry(blocks, self.block[endpoints])
+
+        # Angle relative to the edge normal, signed so it grows along the edge axis
+        rel = np.angle(np.exp(1j * (angles - NORMAL_ANGLES[edges]))) * SORT_SIGNS[edges]
+
+        # Group by (block, edge) and rank by angle within each group
+        group = self.block[endpoints] * 4 + edges
+        order = np.lexsort((rel, group))
+        sorted_group = group[order]
+        first = np.r_[True, sorted_group[1:] != sorted_group[:-1]]
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - group_start
+        _, inverse, counts = np.unique(group, return_inverse=True, return_counts=True)
+        fraction = (rank + 1) / (counts[inverse] + 1)
+
+        # Usable span of each edge, keeping clear of the corners where possible
+        length = np.where((edges == LEFT) | (edges == RIGHT), h, w)
+        margin = np.minimum(self.margin, length / 4)
+        along = margin + fraction * (length - 2 * margin)
+
+        port_x = np.select([edges == LEFT, edges == RIGHT], [x, x + w], x + along)
+        port_y = np.select([edges == BOTTOM, edges == TOP], [y, y + h], y + along)
+
+        updates = []
+        for n, e in enumerate(endpoints.tolist()):
+            conn_index = e % self.num_connections if self.num_connections else e
+            port_type = 'start' if e < self.num_connections else 'end'
+            updates.append((conn_index, port_type, float(port_x[n]), float(port_y[n]), EDGE_NAMES[edges[n]]))
+        return updates
+
+    def free_endpoints(self, connections, endpoints):
+        """Drop endpoints whose port was pinned by hand"""
+        keep = []
+        for e in endpoints.tolist():
+            conn = connections[e % self.num_connections]
+            port_type = 'start' if e < self.num_connections else 'end'
+            port = conn.get('port_positions', {}).get(port_type)
+            if not (port and port.get('pinned')):
+                keep.append(e)
+        return np.array(keep, dtype=np.int64)
+
+    def sync_edges(self, connections, ports):
+        """Re-read the edge of the given (connection index, port type) ports after an undo/redo"""
+        if not self.is_built(connections):
+            return
+        for conn_index, port_type in ports:
+            endpoint = conn_index if port_type == 'start' else self.num_connections + conn_index
+            port = connections[conn_index].get('port_positions', {}).get(port_type)
+            self.edge[endpoint] = EDGE_NAMES.index(port['edge']) if port and port.get('edge') in EDGE_NAMES else -1
+
+    def assign_all(self, blocks, connections):
+        """Assign every unpinned port in the design"""
+        if not self.is_built(connections):
+            self.build(blocks, connections)
+        endpoints = self.free_endpoints(connections, np.arange(len(self.block)))
+        edges, angles = self.choose_edges(blocks, endpoints)
+        self.edge[endpoints] = edges
+        return self.place(blocks, endpoints, edges, angles)
+
+    def update(self, blocks, connections, touched_blocks):
+        """Reassign only the edges touched by moving or resizing touched_blocks"""
+        if not self.is_built(connections):
+            return self.assign_all(blocks, connections)
+
+        # Endpoints on the touched blocks, and their partners on neighbouring blocks
+        own = self.endpoints_of(touched_blocks)
+        partners = (own + self.num_connections) % (2 * self.num_connections)
+        affected = self.free_endpoints(connections, np.unique(np.concatenate([own, partners])))
+        if not len(affected):
+            return []
+
+        # Edges they left and edges they joined are both touched
+        old_edges = self.edge[affected]
+        new_edges, _ = self.choose_edges(blocks, affected)
+        self.edge[affected] = new_edges
+        touched_groups = set((self.block[affected] * 4 + old_edges).tolist())
+        touched_groups |= set((self.block[affected] * 4 + new_edges).tolist())
+
+        # Re-place every free endpoint that sits on a touched edge
+        candidates = self.free_endpoints(connections, self.endpoints_of(set(self.block[affected].tolist())))
+        candidates = candidates[self.edge[candidates] >= 0]
+        in_group = np.isin(self.block[candidates] * 4 + self.edge[candidates], list(touched_groups))
+        members = candidates[in_group]
+        _, angles = self.choose_edges(blocks, members)
+        return self.place(blocks, members, self.edge[members], angles)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Frame-time profiler for the floorplanning tool
+Switchable per-phase timers feeding a ring buffer, with Chrome trace export
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+# Shared no-op context returned while profiling is disabled
+NULL_FRAME = nullcontext()
+
+
+class Frame:
+    """Context manager timing one frame (an update_plot or a mouse event)"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        self.totals = {}
+        self.profiler.open_frames.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler.open_frames.pop()
+        self.profiler.emit(self.name, 'frame', self.start, end - self.start,
+                           {name: ns / 1e6 for name, ns in self.totals.items()})
+        self.profiler.frame_times.setdefault(
+            self.name, deque(maxlen=self.profiler.frame_capacity)).append((end - self.start) / 1e6)
+        return False
+
+
+class FrameProfiler:
+    """Ring buffer of timed frames and phases
+
+    Frames are opened with frame() (or the profiled decorator). Inside a frame,
+    t = tick() ... t = record('phase', t) emits a phase event, and
+    add('phase', t) accumulates time spent in a phase across a loop; the
+    totals are attached to the frame event. While disabled, tick() returns 0
+    and every other call returns immediately.
+    """
+
+    def __init__(self, capacity=100000, frame_capacity=1000, enabled=False):
+        self.enabled = enabled
+        self.frame_capacity = frame_capacity    # Frame times kept per frame name
+        self.events = deque(maxlen=capacity)    # (name, category, start ns, duration ns, args, thread)
+        self.frame_times = {}                   # Frame name -> recent durations in ms
+        self.open_frames = []
+
+    def clear(self):
+        self.events.clear()
+        self.frame_times = {}
+
+    def frame(self, name):
+        """Context manager timing a frame; a shared no-op while disabled"""
+        if not self.enabled:
+            return NULL_FRAME
+        return Frame(self, name)
+
+    def tick(self):
+        """Current time in ns (0 while disabled)"""
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def record(self, name, start):
+        """Emit a phase from start until now; returns now for chaining"""
+        if not self.enabled or not start:
+            return 0
+        now = time.perf_counter_ns()
+        self.emit(name, 'phase', start, now - start, None)
+        return now
+
+    def add(self, name, start):
+        """Add the time since start to the phase total of the open frame; returns now"""
+        if not self.enabled or not start or not self.open_frames:
+            return 0
+        now = time.perf_counter_ns()
+        totals = self.open_frames[-1].totals
+        totals[name] = totals.get(name, 0) + now - start
+        return now
+
+    def emit(self, name, category, start, duration, args):
+        self.events.append((name, category, start, duration, args, threading.get_ident()))
+
+    def percentiles(self, name, points=(50, 95)):
+        """Frame time percentiles in ms for a frame name (None without samples)"""
+        times = self.frame_times.get(name)
+        if not times:
+            return None
+        return tuple(float(p) for p in np.percentile(np.fromiter(times, dtype=float), points))
+
+    def summary(self):
+        """{frame name: (count, p50 ms, p95 ms)} over the recent frames"""
+        return {name: (len(times),) + self.percentiles(name) for name, times in self.frame_times.items() if times}
+
+    def export_chrome_trace(self, filename):
+        """Write the buffered events in Chrome trace format (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        origin = min((event[2] for event in self.events), default=0)
+        trace = []
+        for name, category, start, duration, args, thread in self.events:
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - origin) / 1e3,
+                'dur': duration / 1e3,
+                'pid': pid,
+                'tid': thread
+            }
+            if args:
+                event['args'] = {f"{key}_ms": round(value, 4) for key, value in args.items()}
+            trace.append(event)
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return len(trace)
+
+
+def profiled(name):
+    """Method decorator timing each call as a frame of self.profiler"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.frame(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
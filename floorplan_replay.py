@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Interaction recording and headless replay for the floorplanning tool
+Records mouse events in data coordinates and replays them against an Agg canvas
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from floorplan_constraints import ConstraintSet
+from floorplan_nets import NetList
+
+# Mouse event kinds, in the order of their handlers
+EVENT_KINDS = ('press', 'move', 'release')
+HANDLERS = ('on_mouse_press', 'on_mouse_move', 'on_mouse_release')
+
+# Recorded event: time since the recording started, position in data coordinates,
+# whether shift was held, and the UI mode snapshot that was active
+EVENT = np.dtype([
+    ('kind', 'u1'),
+    ('t', '<f8'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('button', 'u1'),
+    ('dblclick', 'u1'),
+    ('mode', '<u2'),
+    ('shift', 'u1')
+])
+
+# Tk variables that change how the handlers behave
+UI_VARS = ('interactive_var', 'shape_mode_var', 'connection_mode_var', 'pan_var', 'auto_ports_var',
+           'congestion_var', 'crossings_var', 'collapse_var', 'bundle_var',
+           'weight_filter_var', 'weight_threshold_var')
+FILTER_VARS = ('weight_filter_var', 'weight_threshold_var')
+
+
+def mouse_event(app, x, y, button=1, dblclick=False, shift=False):
+    """Minimal stand-in for a matplotlib mouse event in data coordinates"""
+    return SimpleNamespace(inaxes=app.ax, xdata=x, ydata=y, button=button, dblclick=dblclick,
+                           key='shift' if shift else None)
+
+
+def ui_modes(app):
+    """Tk variable values and layer visibility (hidden layers cannot be picked)"""
+    modes = {name: getattr(app, name).get() for name in UI_VARS}
+    modes['layer_visible'] = [[layer, state['visible']] for layer, state in sorted(app.layer_state.items())]
+    return modes
+
+
+def apply_modes(app, modes):
+    """Restore a snapshot taken by ui_modes"""
+    for name, value in modes.items():
+        if name == 'layer_visible':
+            for layer, visible in value:
+                app.layer_state.setdefault(layer, {'visible': True, 'dim': False})['visible'] = visible
+            if app.selected_block is not None and app.layer_hidden(app.selected_block):
+                app.selected_block = None
+            app.apply_layer_styles()
+        else:
+            getattr(app, name).set(value)
+
+    # Filtered-out connections cannot be picked; the filter follows its variables
+    if any(name in modes for name in FILTER_VARS):
+        app.apply_weight_filter()
+
+
+def geometry(app):
+    """Block geometry (N x 4) and port positions (2C x 2) of the current model"""
+    blocks = np.array([(b['x'], b['y'], b['width'], b['height']) for b in app.blocks], dtype=float).reshape(-1, 4)
+    ports = []
+    for conn in app.connections:
+        positions = conn.get('port_positions', {})
+        for port_type in ('start', 'end'):
+            port = positions.get(port_type)
+            ports.append((port['x'], port['y']) if port else (np.nan, np.nan))
+    return blocks, np.array(ports, dtype=float).reshape(-1, 2)
+
+
+class InteractionRecorder:
+    """Collects the mouse events the handlers receive while recording"""
+
+    def __init__(self):
+        self.recording = False
+        self.events = []
+        self.modes = []
+        self.meta = None
+        self.start_time = 0.0
+
+    def start(self, app):
+        """Start recording from the current model and UI modes"""
+        self.recording = True
+        self.events = []
+        self.modes = []
+        self.start_time = time.perf_counter()
+        self.meta = {
+            'design': copy.deepcopy({
+                'hardmacro_names': app.hardmacro_names,
+                'blocks': app.blocks,
+                'connections': app.connections,
+                'nets': app.nets.to_dict() if app.nets is not None else None
+            }),
+            'view': [list(app.ax.get_xlim()), list(app.ax.get_ylim())],
+            'constraints': app.constraints.to_dict()
+        }
+
+    def capture(self, app, kind, event):
+        """Record one mouse event (called first thing in each handler)"""
+        if not self.recording or event.inaxes != app.ax or event.xdata is None:
+            return
+        modes = ui_modes(app)
+        if not self.modes or self.modes[-1] != modes:
+            self.modes.append(modes)
+        self.events.append((EVENT_KINDS.index(kind), time.perf_counter() - self.start_time,
+                            event.xdata, event.ydata, int(event.button or 0), int(bool(event.dblclick)),
+                            len(self.modes) - 1, int('shift' in (event.key or ''))))
+
+    def stop(self, app):
+        """Stop recording and remember the final geometry for verification"""
+        self.recording = False
+        blocks, ports = geometry(app)
+        self.final_blocks = blocks
+        self.final_ports = ports
+        return len(self.events)
+
+    def save(self, filename):
+        """Write events, modes, start design and final geometry to a compressed .npz file"""
+        meta = dict(self.meta, modes=self.modes)
+        np.savez_compressed(filename,
+                            events=np.array(self.events, dtype=EVENT),
+                            meta=np.array(json.dumps(meta, default=lambda value: value.item())),
+                            final_blocks=self.final_blocks,
+                            final_ports=self.final_ports)
+
+
+def load_recording(filename):
+    with np.load(filename) as data:
+        return {
+            'events': data['events'],
+            'meta': json.loads(str(data['meta'])),
+            'final_blocks': data['final_blocks'],
+            'final_ports': data['final_ports']
+        }
+
+
+def replay(recording, app=None, tolerance=1e-6):
+    """Drive the mouse handlers with a recording and verify the final geometry
+
+    Runs headless unless an app is given. Returns a report with per-kind
+    latency statistics (ms) and the blocks/ports that ended up elsewhere.
+    """
+    if app is None:
+        from floorplan_desktop_v3 import FloorplanToolV2
+        app = FloorplanToolV2()
+
+    design = copy.deepcopy(recording['meta']['design'])
+    app.hardmacro_names = design['hardmacro_names']
+    app.blocks = design['blocks']
+    app.connections = design['connections']
+    app.nets = NetList.from_dict(design['nets']) if design.get('nets') else None
+    app.load_design()
+
+    # Drags snap to or are rejected by the constraints that were loaded while recording
+    if recording['meta'].get('constraints'):
+        app.constraints = ConstraintSet.from_dict(recording['meta']['constraints'], app.hardmacro_names,
+                                                  app.constraint_config['cell_size'],
+                                                  app.constraint_config['tolerance'], app.blocks)
+    (x_min, x_max), (y_min, y_max) = recording['meta']['view']
+    app.ax.set_xlim(x_min, x_max)
+    app.ax.set_ylim(y_min, y_max)
+
+    modes = recording['meta']['modes']
+    active_mode = None
+    events = recording['events']
+    latency = np.zeros(len(events))
+    for n, event in enumerate(events.tolist()):
+        kind, _, x, y, button, dblclick, mode, shift = event
+        if mode != active_mode:
+            apply_modes(app, modes[mode])
+            active_mode = mode
+        handler = getattr(app, HANDLERS[kind])
+        start = time.perf_counter()
+        handler(mouse_event(app, x, y, button, bool(dblclick), bool(shift)))
+        latency[n] = (time.perf_counter() - start) * 1e3
+
+    report = {'events': len(events), 'total_ms': float(latency.sum()), 'latency': {}}
+    for kind, name in enumerate(EVENT_KINDS):
+        values = latency[events['kind'] == kind]
+        if len(values):
+            report['latency'][name] = {
+                'count': int(len(values)),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)),
+                'max_ms': float(values.max())
+            }
+
+    # Compare against the geometry captured when the recording stopped
+    blocks, ports = geometry(app)
+    report['block_mismatches'] = mismatches(blocks, recording['final_blocks'], tolerance)
+    report['port_mismatches'] = mismatches(ports, recording['final_ports'], tolerance)
+    report['verified'] = not report['block_mismatches'] and not report['port_mismatches']
+    return report
+
+
+def mismatches(actual, expected, tolerance):
+    """Indices of rows that differ by more than tolerance (NaN equals NaN)"""
+    if actual.shape != expected.shape:
+        return list(range(max(len(actual), len(expected))))
+    close = np.isclose(actual, expected, rtol=0.0, atol=tolerance, equal_nan=True).all(axis=1)
+    return np.flatnonzero(~close).tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded floorplan interaction headless")
+    parser.add_argument('recording', help="Recording (.npz) saved from the Record button")
+    parser.add_argument('--report', help="Write the latency/verification report to this JSON file")
+    parser.add_argument('--tolerance', type=float, default=1e-6,
+                        help="Allowed difference of the final geometry")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    report = replay(load_recording(args.recording), tolerance=args.tolerance)
+
+    print(f"Replayed {report['events']} events in {report['total_ms']:.1f} ms")
+    for name, stats in report['latency'].items():
+        print(f"  {name:8s} {stats['count']:6d} events  p50 {stats['p50_ms']:8.2f} ms  "
+              f"p95 {stats['p95_ms']:8.2f} ms  max {stats['max_ms']:8.2f} ms")
+    if report['verified']:
+        print("Final geometry matches the recording")
+    else:
+        print(f"Final geometry differs: {len(report['block_mismatches'])} blocks, "
+              f"{len(report['port_mismatches'])} ports")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if report['verified'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Connection route geometry for the floorplanning tool
+Builds the double Z-connector polylines drawn between port bubbles
+"""
+
+import numpy as np
+
+
+def z_connector(port, other_port, offset):
+    """Return the two Z-connector points leaving a port perpendicular to its edge"""
+    edge = port['edge']
+    x, y = port['x'], port['y']
+
+    if edge in ['left', 'right']:
+        # First perpendicular line going left/right from port
+        p1_x = x - offset if edge == 'left' else x + offset
+        p1_y = y
+        # Second perpendicular line going up/down
+        p2_x = p1_x
+        p2_y = y + (offset if y < other_port['y'] else -offset)
+    else:  # 'top', 'bottom' (unknown edges are treated as top)
+        # First perpendicular line going down/up from port
+        p1_x = x
+        p1_y = y - offset if edge == 'bottom' else y + offset
+        # Second perpendicular line going left/right
+        p2_x = x + (offset if x < other_port['x'] else -offset)
+        p2_y = p1_y
+
+    return (p1_x, p1_y), (p2_x, p2_y)
+
+
+def middle_leg(s2, d2, mode, path=None):
+    """Return the intermediate points of the middle leg between the two Z's"""
+    if mode == 'straight':
+        return []
+    if path is not None:
+        # Routed middle leg supplied by a router (endpoints excluded)
+        return list(path)
+    # Manhattan connection between the two Z's
+    return [(s2[0], d2[1])]
+
+
+def build_route_points(start_port, end_port, offset, mode='straight', path=None):
+    """Build the full double Z polyline from start port to end port"""
+    s1, s2 = z_connector(start_port, end_port, offset)
+    d1, d2 = z_connector(end_port, start_port, offset)
+
+    points = [(start_port['x'], start_port['y']), s1, s2]
+    points.extend(middle_leg(s2, d2, mode, path))
+    points.extend([d2, d1, (end_port['x'], end_port['y'])])
+    return points
+
+
+def route_segments(points):
+    """Return the (x0, y0, x1, y1) segments of a route polyline as an array"""
+    pts = np.asarray(points, dtype=float)
+    return np.hstack([pts[:-1], pts[1:]])
+
+
+def route_midpoint(points):
+    """Find the point halfway along a route, measured in Manhattan length"""
+    pts = np.asarray(points, dtype=float)
+    deltas = pts[1:] - pts[:-1]
+    lengths = np.abs(deltas).sum(axis=1)
+    total_length = lengths.sum()
+    if total_length <= 0:
+        return tuple(pts[0])
+
+    # Locate the segment containing half the total length
+    cumulative = np.cumsum(lengths)
+    target_length = total_length / 2
+    seg = int(np.searchsorted(cumulative, target_length))
+    seg = min(seg, len(lengths) - 1)
+    before = cumulative[seg] - lengths[seg]
+    ratio = (target_length - before) / lengths[seg] if lengths[seg] > 0 else 0.0
+
+    mid = pts[seg] + ratio * deltas[seg]
+    return float(mid[0]), float(mid[1])
+
+
+def near_counts(points, edges, tolerance=5.0):
+    """For every port, count the ports on the same edge type within tolerance
+
+    Same test as get_connection_offset (|dx| < tolerance and |dy| < tolerance,
+    the port itself included), done with a uniform grid instead of a scan.
+    """
+    n = len(points)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    cells = np.floor(points / tolerance).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    height = int(cells[:, 1].max()) + 2
+    width = int(cells[:, 0].max()) + 2
+    keys = (edges.astype(np.int64) * width + cells[:, 0]) * height + cells[:, 1]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    counts = np.zeros(n, dtype=np.int64)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            # Ports in the neighbouring cell of every port
+            neighbor = keys + dx * height + dy
+            lo = np.searchsorted(sorted_keys, neighbor, side='left')
+            hi = np.searchsorted(sorted_keys, neighbor, side='right')
+            span = hi - lo
+            if not span.any():
+                continue
+            owner = np.repeat(np.arange(n), span)
+            offsets = np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+            other = order[np.repeat(lo, span) + offsets]
+            close = ((np.abs(points[other, 0] - points[owner, 0]) < tolerance) &
+                     (np.abs(points[other, 1] - points[owner, 1]) < tolerance))
+            counts += np.bincount(owner[close], minlength=n)
+    return counts
+
+
+def connection_offsets(connections, base_offset=50, tolerance=5.0):
+    """Vectorized get_connection_offset for all connections at once"""
+    edge_codes = {'left': 0, 'right': 1, 'bottom': 2, 'top': 3}
+    starts = [conn['port_positions']['start'] for conn in connections]
+    ends = [conn['port_positions']['end'] for conn in connections]
+    start_xy = np.array([(p['x'], p['y']) for p in starts], dtype=float).reshape(-1, 2)
+    end_xy = np.array([(p['x'], p['y']) for p in ends], dtype=float).reshape(-1, 2)
+    start_edge = np.array([edge_codes.get(p['edge'], 4) for p in starts], dtype=np.int64)
+    end_edge = np.array([edge_codes.get(p['edge'], 4) for p in ends], dtype=np.int64)
+
+    multiplier = np.maximum(near_counts(start_xy, start_edge, tolerance),
+                            near_counts(end_xy, end_edge, tolerance))
+    return base_offset + multiplier * 20
@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+"""
+Local asyncio service for the floorplanning tool
+Serves a headless floorplan model over HTTP/JSON on localhost: concurrent
+read queries, serialized mutations, batch requests and a WebSocket stream
+of edit events. Includes a client and a load tester.
+
+    python floorplan_service.py serve --port 8765
+    python floorplan_service.py load-test --port 8765 --clients 16 --requests 200
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import gc
+import hashlib
+import json
+import math
+import re
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+
+from floorplan_desktop_v3 import FloorplanToolV2
+from floorplan_evaluate import evaluate_candidates
+from floorplan_export import route_offsets
+from floorplan_routes import build_route_points
+
+# Hosts the service may bind to and accept peers from
+LOCAL_HOSTS = ('127.0.0.1', '::1', 'localhost')
+
+DEFAULT_PORT = 8765
+
+# Largest request body accepted (bytes)
+MAX_BODY = 64 * 2**20
+
+# Events buffered per WebSocket subscriber before it is dropped as too slow
+SUBSCRIBER_QUEUE = 1000
+
+# Items per page of the list endpoints when no limit is given
+PAGE_LIMIT = 1000
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+                405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# (method, path pattern, operation, access)
+ROUTES = [
+    ('GET', r'/health', 'health', 'read'),
+    ('GET', r'/metrics', 'metrics', 'read'),
+    ('GET', r'/blocks', 'blocks', 'read'),
+    ('GET', r'/blocks/(\d+)', 'block', 'read'),
+    ('GET', r'/connections', 'connections', 'read'),
+    ('GET', r'/routes', 'routes', 'read'),
+    ('POST', r'/load', 'load', 'write'),
+    ('POST', r'/blocks/(\d+)/move', 'move', 'write'),
+    ('POST', r'/undo', 'undo', 'write'),
+    ('POST', r'/redo', 'redo', 'write')
+]
+
+
+class ServiceError(Exception):
+    """Request error reported to the client with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def check_request_source(method, headers):
+    """Reject requests a web page could have sent to the local service
+
+    The Host must be a local name (against DNS rebinding), a browser's
+    Origin must be local, and bodies must be JSON: browsers send text/plain
+    or form posts cross-site without a preflight.
+    """
+    if urlsplit('//' + headers.get('host', '')).hostname not in LOCAL_HOSTS:
+        raise ServiceError(403, "Host must be a local address")
+    origin = headers.get('origin')
+    if origin is not None and urlsplit(origin).hostname not in LOCAL_HOSTS:
+        raise ServiceError(403, f"Origin not allowed: {origin}")
+    if method == 'POST' and headers.get('content-type', '').split(';')[0].strip().lower() != 'application/json':
+        raise ServiceError(400, "Requests must be sent as application/json")
+
+
+def content_length(headers):
+    """Request body size from the Content-Length header"""
+    try:
+        size = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise ServiceError(400, "Invalid Content-Length")
+    if size < 0:
+        raise ServiceError(400, "Invalid Content-Length")
+    if size > MAX_BODY:
+        raise ServiceError(413, "Request body too large")
+    return size
+
+
+def match_route(method, path):
+    """(operation, access, path arguments) of a request"""
+    allowed = False
+    for route_method, pattern, operation, access in ROUTES:
+        found = re.fullmatch(pattern, path)
+        if found:
+            if route_method == method:
+                return operation, access, [int(arg) for arg in found.groups()]
+            allowed = True
+    if allowed:
+        raise ServiceError(405, f"{method} not allowed on {path}")
+    raise ServiceError(404, f"Unknown path {path}")
+
+
+class ReadWriteLock:
+    """Any number of readers or one writer; a waiting writer holds back new readers"""
+
+    def __init__(self):
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+        self.condition = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.writer and not self.waiting_writers)
+            self.readers += 1
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.readers -= 1
+                self.condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def write(self):
+        async with self.condition:
+            self.waiting_writers += 1
+            await self.condition.wait_for(lambda: not self.writer and not self.readers)
+            self.waiting_writers -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.writer = False
+                self.condition.notify_all()
+
+
+def websocket_frame(payload, opcode=0x1):
+    """One unmasked, unfragmented server frame"""
+    header = bytes([0x80 | opcode])
+    size = len(payload)
+    if size < 126:
+        header += bytes([size])
+    elif size < 2**16:
+        header += bytes([126]) + struct.pack('!H', size)
+    else:
+        header += bytes([127]) + struct.pack('!Q', size)
+    return header + payload
+
+
+async def read_websocket_frame(reader):
+    """(opcode, payload) of the next frame, unmasking client frames"""
+    first, second = await reader.readexactly(2)
+    size = second & 0x7F
+    if size == 126:
+        size = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif size == 127:
+        size = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(size)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+def page(query, total):
+    """(start, stop) of the requested page of a list endpoint"""
+    try:
+        start = max(int(query.get('start', 0)), 0)
+        limit = max(int(query.get('limit', PAGE_LIMIT)), 0)
+    except ValueError:
+        raise ServiceError(400, "start and limit must be integers")
+    return min(start, total), min(start + limit, total)
+
+
+class FloorplanService:
+    """HTTP/WebSocket front end of one headless floorplan model
+
+    Reads run concurrently on a thread pool; mutations take the write lock
+    and run one at a time on the thread that owns the model (its Tk
+    variables live in that thread's Tcl interpreter). Every mutation bumps
+    the version and is pushed to the /events subscribers.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, read_workers=4):
+        if host not in LOCAL_HOSTS:
+            raise ValueError(f"The service only listens on localhost, not {host}")
+        self.host = host
+        self.port = port
+        self.lock = ReadWriteLock()
+        self.model_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='floorplan-model')
+        self.read_pool = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='floorplan-read')
+        self.app = None
+        self.version = 0
+        self.offsets = None             # (version, Z-connector offsets) for /routes
+        self.offsets_lock = threading.Lock()    # Reads fill the offsets cache from several threads
+        self.subscribers = set()
+        self.server = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.app = await loop.run_in_executor(self.model_thread, FloorplanToolV2)
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for queue in list(self.subscribers):
+            queue.put_nowait(None)
+        self.read_pool.shutdown(wait=True)
+        if self.app is not None:
+            # The model's Tk variables must be freed by the thread that created them
+            await asyncio.get_running_loop().run_in_executor(self.model_thread, self.release_model)
+        self.model_thread.shutdown(wait=True)
+
+    def release_model(self):
+        self.app = None
+        gc.collect()
+
+    # Operations (run in the read pool or the model thread)
+
+    def op_health(self, args, query, body):
+        return {'status': 'ok', 'version': self.version}, None
+
+    def op_metrics(self, args, query, body):
+        app = self.app
+        result = {'version': self.version, 'blocks': len(app.blocks), 'connections': len(app.connections),
+                  'nets': len(app.nets) if app.nets is not None else 0}
+        if app.blocks:
+            geometry = np.array([(b['x'], b['y'], b['width'], b['height']) for b in app.blocks], dtype=float)
+            src = np.array([conn['from'] for conn in app.connections], dtype=np.int64)
+            dst = np.array([conn['to'] for conn in app.connections], dtype=np.int64)
+            weights = np.array([conn['connections'] for conn in app.connections], dtype=float)
+            scores = evaluate_candidates(geometry[None, :, :2], geometry[:, 2:], src, dst, weights, app.nets,
+                                         processes=1)
+            result.update({name: values[0].item() for name, values in scores.items()})
+        return result, None
+
+    def block_record(self, block):
+        record = {key: block[key] for key in ('id', 'name', 'x', 'y', 'width', 'height', 'area')}
+        record['layer'] = block.get('layer', 0)
+        return record
+
+    def get_block(self, block_id):
+        if block_id >= len(self.app.blocks):
+            raise ServiceError(404, f"No block {block_id}")
+        return self.app.blocks[block_id]
+
+    def op_blocks(self, args, query, body):
+        start, stop = page(query, len(self.app.blocks))
+        return {'version': self.version, 'total': len(self.app.blocks), 'start': start,
+                'blocks': [self.block_record(block) for block in self.app.blocks[start:stop]]}, None
+
+    def op_block(self, args, query, body):
+        return dict(self.block_record(self.get_block(args[0])), version=self.version), None
+
+    def op_connections(self, args, query, body):
+        start, stop = page(query, len(self.app.connections))
+        records = []
+        for i, conn in enumerate(self.app.connections[start:stop], start):
+            record = {'index': i, 'from': conn['from'], 'to': conn['to'], 'weight': conn['connections']}
+            if 'port_positions' in conn:
+                record['ports'] = {port_type: {key: port[key] for key in ('x', 'y', 'edge')}
+                                   for port_type, port in conn['port_positions'].items()}
+            records.append(record)
+        return {'version': self.version, 'total': len(self.app.connections), 'start': start,
+                'connections': records}, None
+
+    def op_routes(self, args, query, body):
+        """Route polylines of a page of connections (mode 'straight' or 'manhattan')"""
+        mode = query.get('mode', 'manhattan')
+        if mode not in ('straight', 'manhattan'):
+            raise ServiceError(400, f"Unknown route mode: {mode}")
+        connections = self.app.connections
+        with self.offsets_lock:
+            if self.offsets is None or self.offsets[0] != self.version:
+                self.offsets = (self.version, route_offsets(connections))
+            offsets = self.offsets[1]
+        start, stop = page(query, len(connections))
+        routes = []
+        for i in range(start, stop):
+            ports = connections[i]['port_positions']
+            routes.append({'index': i, 'points': build_route_points(ports['start'], ports['end'],
+                                                                    float(offsets[i]), mode)})
+        return {'version': self.version, 'total': len(connections), 'start': start, 'routes': routes}, None
+
+    def op_load(self, args, query, body):
+        """Load {'matrix'} (adjacency matrix, areas on the diagonal) or {'areas', 'src', 'dst', 'weights'}"""
+        app = self.app
+        if 'matrix' in body:
+            matrix = np.asarray(body['matrix'], dtype=float)
+            if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+                raise ServiceError(400, "matrix must be square")
+            count = len(matrix)
+        else:
+            missing = [key for key in ('areas', 'src', 'dst', 'weights') if key not in body]
+            if missing:
+                raise ServiceError(400, f"Missing {', '.join(missing)}")
+            count = len(body['areas'])
+            if not (len(body['src']) == len(body['dst']) == len(body['weights'])):
+                raise ServiceError(400, "src, dst and weights must have the same length")
+            if any(not 0 <= i < count for i in body['src']) or any(not 0 <= j < count for j in body['dst']):
+                raise ServiceError(400, "Connection endpoint out of range")
+        names = body.get('names') or [f"B{i}" for i in range(count)]
+        if len(names) != count:
+            raise ServiceError(400, "names must have one entry per block")
+
+        app.hardmacro_names = list(names)
+        if 'matrix' in body:
+            app.process_adjacency_matrix(matrix)
+        else:
+            app.process_edge_list(body['areas'], body['src'], body['dst'], body['weights'])
+        app.reset_design_state()
+        app.initialize_port_positions()
+        return ({'blocks': len(app.blocks), 'connections': len(app.connections)},
+                {'type': 'load', 'blocks': len(app.blocks), 'connections': len(app.connections)})
+
+    def op_move(self, args, query, body):
+        """Move a block to {'x', 'y'} or by {'dx', 'dy'} as one undo step (snapped to its constraints)"""
+        app = self.app
+        block = self.get_block(args[0])
+        try:
+            if 'x' in body or 'y' in body:
+                dx = float(body.get('x', block['x'])) - block['x']
+                dy = float(body.get('y', block['y'])) - block['y']
+            else:
+                dx = float(body.get('dx', 0))
+                dy = float(body.get('dy', 0))
+        except (TypeError, ValueError):
+            raise ServiceError(400, "Coordinates must be numbers")
+        if not (math.isfinite(dx) and math.isfinite(dy)):
+            raise ServiceError(400, "Coordinates must be finite")
+        dx, dy = app.constrain_move(block, dx, dy)
+        app.history.begin('move')
+        app.history.touch_block(block)
+        block['x'] += dx
+        block['y'] += dy
+        app.update_ports_for_block_movement(block, dx, dy)
+        app.respread_ports_for_block(block)
+        app.history.end(app.blocks, app.connections)
+        record = self.block_record(block)
+        return record, dict(record, type='move')
+
+    def apply_step(self, action, step):
+        if step is None:
+            return {'applied': False}, None
+        self.app.port_assigner.sync_edges(self.app.connections, [key for key, _, _ in step['ports']])
+        blocks = sorted(block_id for block_id, _, _ in step['blocks'])
+        return {'applied': True, 'label': step['label'], 'blocks': blocks}, \
+            {'type': action, 'label': step['label'], 'blocks': blocks}
+
+    def op_undo(self, args, query, body):
+        return self.apply_step('undo', self.app.history.undo(self.app.blocks, self.app.connections))
+
+    def op_redo(self, args, query, body):
+        return self.apply_step('redo', self.app.history.redo(self.app.blocks, self.app.connections))
+
+    def run_operations(self, operations):
+        """Run resolved operations in order; returns (responses, events)"""
+        responses = []
+        events = []
+        for operation, access, args, query, body in operations:
+            try:
+                payload, event = getattr(self, f"op_{operation}")(args, query, body)
+            except ServiceError as e:
+                responses.append((e.status, {'error': str(e)}))
+                continue
+            except (KeyError, TypeError, ValueError) as e:
+                responses.append((400, {'error': f"{type(e).__name__}: {e}"}))
+                continue
+            if event is not None:
+                self.version += 1
+                event['version'] = self.version
+                events.append(event)
+            responses.append((200, payload))
+        return responses, events
+
+    async def execute(self, operations):
+        """Run operations under the read or write lock; a batch with any mutation is one write"""
+        loop = asyncio.get_running_loop()
+        if any(access == 'write' for _, access, _, _, _ in operations):
+            async with self.lock.write():
+                responses, events = await loop.run_in_executor(self.model_thread, self.run_operations, operations)
+        else:
+            async with self.lock.read():
+                responses, events = await loop.run_in_executor(self.read_pool, self.run_operations, operations)
+        for event in events:
+            self.publish(event)
+        return responses
+
+    def publish(self, event):
+        message = json.dumps(event)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow to keep up; it is disconnected instead of stalling the writers
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def resolve(self, method, target, body):
+        parts = urlsplit(target)
+        operation, access, args = match_route(method, parts.path)
+        return operation, access, args, dict(parse_qsl(parts.query)), body if isinstance(body, dict) else {}
+
+    async def dispatch(self, method, target, body):
+        """(status, payload) of one request"""
+        if urlsplit(target).path == '/batch':
+            if method != 'POST':
+                raise ServiceError(405, "Batches are POSTed")
+            requests = body.get('requests') if isinstance(body, dict) else None
+            if not isinstance(requests, list):
+                raise ServiceError(400, "A batch needs a 'requests' list")
+            operations = []
+            for request in requests:
+                operations.append(self.resolve(request.get('method', 'GET').upper(), request.get('path', ''),
+                                               request.get('body')))
+            responses = await self.execute(operations)
+            return 200, {'responses': [{'status': status, 'body': payload} for status, payload in responses]}
+        [(status, payload)] = await self.execute([self.resolve(method, target, body)])
+        return status, payload
+
+    # Connections
+
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        if peer is not None and peer[0] not in ('127.0.0.1', '::1', '::ffff:127.0.0.1'):
+            writer.close()
+            return
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, _ = lines[0].split(' ', 2)
+                except ValueError:
+                    await self.respond(writer, 400, {'error': "Malformed request line"}, close=True)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                try:
+                    check_request_source(method.upper(), headers)
+                    size = content_length(headers)
+                except ServiceError as e:
+                    await self.respond(writer, e.status, {'error': str(e)}, close=True)
+                    return
+
+                if headers.get('upgrade', '').lower() == 'websocket' and urlsplit(target).path == '/events':
+                    await self.stream_events(reader, writer, headers)
+                    return
+
+                raw = await reader.readexactly(size) if size else b''
+                try:
+                    body = json.loads(raw) if raw else {}
+                    status, payload = await self.dispatch(method.upper(), target, body)
+                except ServiceError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except json.JSONDecodeError as e:
+                    status, payload = 400, {'error': f"Invalid JSON: {e}"}
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                close = headers.get('connection', '').lower() == 'close'
+                await self.respond(writer, status, payload, close)
+                if close:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, close=False):
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                     f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + data)
+        await writer.drain()
+
+    async def stream_events(self, reader, writer, headers):
+        """Push every edit event to a WebSocket subscriber until it disconnects"""
+        key = headers.get('sec-websocket-key')
+        if not key:
+            await self.respond(writer, 400, {'error': "Missing Sec-WebSocket-Key"}, close=True)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        writer.write(websocket_frame(json.dumps({'type': 'hello', 'version': self.version}).encode()))
+        await writer.drain()
+
+        queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+        self.subscribers.add(queue)
+
+        async def listen():
+            # Answer pings and stop on close; clients send nothing else
+            while True:
+                opcode, payload = await read_websocket_frame(reader)
+                if opcode == 0x8:
+                    return
+                if opcode == 0x9:
+                    writer.write(websocket_frame(payload, 0xA))
+
+        listener = asyncio.ensure_future(listen())
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, listener}, return_when=asyncio.FIRST_COMPLETED)
+                if listener in done:
+                    getter.cancel()
+                    break
+                message = getter.result()
+                if message is None:
+                    break
+                writer.write(websocket_frame(message.encode()))
+                await writer.drain()
+            writer.write(websocket_frame(b'', 0x8))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subscribers.discard(queue)
+            listener.cancel()
+
+
+class FloorplanClient:
+    """Keep-alive JSON client of the service (one request at a time per client)"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self.writer.wait_closed()
+
+    async def request(self, method, path, body=None):
+        """(status, payload) of one request"""
+        data = json.dumps(body).encode() if body is not None else b''
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await self.writer.drain()
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split(' ')[1])
+        size = 0
+        for line in head[1:]:
+            if line.lower().startswith('content-length:'):
+                size = int(line.split(':', 1)[1])
+        return status, json.loads(await self.reader.readexactly(size))
+
+    async def batch(self, requests):
+        """Responses of a list of {'method', 'path', 'body'} requests sent as one batch"""
+        status, payload = await self.request('POST', '/batch', {'requests': requests})
+        if status != 200:
+            raise ServiceError(status, payload.get('error', ''))
+        return payload['responses']
+
+    async def events(self):
+        """Async iterator over the edit events (a separate connection)"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        key = base64.b64encode(np.random.bytes(16)).decode()
+        writer.write(f"GET /events HTTP/1.1\r\nHost: {self.host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        if b' 101 ' not in head.split(b'\r\n')[0]:
+            writer.close()
+            raise ServiceError(400, "WebSocket upgrade refused")
+        try:
+            while True:
+                opcode, payload = await read_websocket_frame(reader)
+                if opcode == 0x8:
+                    return
+                if opcode == 0x1:
+                    yield json.loads(payload)
+        finally:
+            writer.close()
+
+
+def random_design(n, connections_per_block=4, seed=0):
+    """Edge-list load request of a random design"""
+    rng = np.random.default_rng(seed)
+    count = n * connections_per_block // 2
+    src = rng.integers(0, n, count)
+    dst = rng.integers(0, n, count)
+    keep = src != dst
+    return {'areas': rng.lognormal(12, 0.5, n).round().tolist(), 'src': src[keep].tolist(),
+            'dst': dst[keep].tolist(), 'weights': rng.integers(1, 50, int(keep.sum())).tolist()}
+
+
+async def load_test(host='127.0.0.1', port=DEFAULT_PORT, clients=8, requests=200, write_ratio=0.1,
+                    blocks=100, seed=0, log=print):
+    """Load a random design, then run clients concurrent request loops
+
+    Each request is a move (with probability write_ratio) or one of the
+    read queries. Returns per-kind latency statistics in seconds.
+    """
+    setup = await FloorplanClient(host, port).connect()
+    status, payload = await setup.request('POST', '/load', random_design(blocks, seed=seed))
+    await setup.close()
+    if status != 200:
+        raise ServiceError(status, payload.get('error', ''))
+    reads = ['/metrics', '/blocks?limit=100', '/connections?limit=100', '/routes?limit=100']
+    latencies = {'read': [], 'write': []}
+    errors = 0
+
+    async def worker(index):
+        nonlocal errors
+        rng = np.random.default_rng(seed + index + 1)
+        client = await FloorplanClient(host, port).connect()
+        try:
+            for _ in range(requests):
+                if rng.random() < write_ratio:
+                    kind = 'write'
+                    call = ('POST', f"/blocks/{rng.integers(blocks)}/move",
+                            {'dx': float(rng.normal(0, 20)), 'dy': float(rng.normal(0, 20))})
+                else:
+                    kind = 'read'
+                    call = ('GET', reads[rng.integers(len(reads))], None)
+                start = time.perf_counter()
+                status, _ = await client.request(*call)
+                latencies[kind].append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    stats = {'elapsed': elapsed, 'requests': clients * requests, 'errors': errors,
+             'throughput': clients * requests / elapsed}
+    for kind, values in latencies.items():
+        if values:
+            values = np.array(values)
+            stats[kind] = {'count': len(values), 'median': float(np.median(values)),
+                           'p95': float(np.percentile(values, 95)), 'max': float(values.max())}
+    log(f"{stats['requests']} requests in {elapsed:.2f} s ({stats['throughput']:.0f}/s), {errors} errors")
+    for kind in ('read', 'write'):
+        if kind in stats:
+            s = stats[kind]
+            log(f"{kind:6s} n={s['count']:<6d} median {s['median'] * 1e3:8.2f} ms  "
+                f"p95 {s['p95'] * 1e3:8.2f} ms  max {s['max'] * 1e3:8.2f} ms")
+    return stats
+
+
+async def serve(host, port):
+    service = await FloorplanService(host, port).start()
+    print(f"Floorplan service on http://{host}:{service.port}")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local floorplan service and its load tester")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="Run the service")
+    serve_parser.add_argument('--host', default='127.0.0.1', choices=LOCAL_HOSTS)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    test_parser = commands.add_parser('load-test', help="Load a random design and hammer a running service")
+    test_parser.add_argument('--host', default='127.0.0.1', choices=LOCAL_HOSTS)
+    test_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    test_parser.add_argument('--clients', type=int, default=8)
+    test_parser.add_argument('--requests', type=int, default=200, help="Requests per client")
+    test_parser.add_argument('--write-ratio', type=float, default=0.1)
+    test_parser.add_argument('--blocks', type=int, default=100)
+    test_parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(serve(args.host, args.port))
+        return 0
+    stats = asyncio.run(load_test(args.host, args.port, args.clients, args.requests, args.write_ratio,
+                                  args.blocks, args.seed))
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Shape-curve optimizer for the floorplanning tool
+Chooses soft macro width/height with Stockmeyer shape curves on a slicing tree
+"""
+
+import numpy as np
+
+# Cut types of internal slicing tree nodes
+VERTICAL = 'V'      # Children side by side (widths add)
+HORIZONTAL = 'H'    # Children stacked (heights add)
+
+
+def leaf_curve(block, aspect_min=0.5, aspect_max=2.0, samples=16):
+    """Shape curve of one block as (widths, heights), widths ascending
+
+    Soft macros sample aspect ratios (height / width) between their bounds at
+    constant area; hard macros keep their current shape.
+    """
+    if not block.get('soft', True):
+        return np.array([float(block['width'])]), np.array([float(block['height'])])
+
+    area = float(block['area'])
+    lo = float(block.get('aspect_min', aspect_min))
+    hi = float(block.get('aspect_max', aspect_max))
+    ratios = np.geomspace(max(lo, 1e-6), max(hi, lo, 1e-6), samples if hi > lo else 1)[::-1]
+    widths = np.sqrt(area / ratios)
+    return widths, area / widths
+
+
+def prune_curve(widths, heights, limit):
+    """Remove dominated points and keep at most limit points (min area always kept)"""
+    order = np.lexsort((heights, widths))
+    sorted_heights = heights[order]
+
+    # A point is kept only if it is lower than every narrower point
+    keep = sorted_heights < np.minimum.accumulate(np.concatenate([[np.inf], sorted_heights[:-1]]))
+    index = order[keep]
+    if len(index) > limit:
+        chosen = np.unique(np.append(np.linspace(0, len(index) - 1, limit - 1).round().astype(int),
+                                      np.argmin(widths[index] * heights[index])))
+        index = index[chosen]
+    return index, widths[index], heights[index]
+
+
+def combine_curves(curve_a, curve_b, cut, limit=24):
+    """Stockmeyer combination of two child curves under a cut
+
+    Returns (widths, heights, index_a, index_b) where index_a/index_b pick the
+    child point realizing each combined point.
+    """
+    wa, ha = curve_a
+    wb, hb = curve_b
+    if cut == HORIZONTAL:
+        # Stacking is the vertical cut with width and height swapped; reversing
+        # keeps the swapped curves ordered by ascending width
+        wa, ha = curve_a[1][::-1], curve_a[0][::-1]
+        wb, hb = curve_b[1][::-1], curve_b[0][::-1]
+
+    # Candidate heights: every child height; each child uses its narrowest point that fits
+    candidates = np.unique(np.concatenate([ha, hb]))
+    candidates = candidates[candidates >= max(ha.min(), hb.min())]
+    ia = fit_index(ha, candidates)
+    ib = fit_index(hb, candidates)
+
+    widths = wa[ia] + wb[ib]
+    heights = np.maximum(ha[ia], hb[ib])
+    if cut == HORIZONTAL:
+        widths, heights = heights, widths
+        ia = len(wa) - 1 - ia
+        ib = len(wb) - 1 - ib
+
+    index, widths, heights = prune_curve(widths, heights, limit)
+    return widths, heights, ia[index], ib[index]
+
+
+def fit_index(heights, limits):
+    """Index of the narrowest point whose height fits each limit
+
+    Curve points are ordered by ascending width / descending height, so the
+    narrowest fitting point is the first one at or below the limit.
+    """
+    descending = heights[::-1]
+    # Count of points (from the tall end) taller than the limit
+    taller = len(heights) - np.searchsorted(descending, limits, side='right')
+    return np.minimum(taller, len(heights) - 1)
+
+
+def build_slicing_tree(blocks):
+    """Derive a slicing tree from the current placement by recursive bisection
+
+    Each group is cut across its wider spread of block centers, at the point
+    that best balances area. Returns (nodes, root) where nodes[n] is either
+    ('leaf', block index) or (cut, left node, right node).
+    """
+    centers_x = np.array([b['x'] + b['width'] / 2 for b in blocks])
+    centers_y = np.array([b['y'] + b['height'] / 2 for b in blocks])
+    areas = np.array([b['width'] * b['height'] for b in blocks], dtype=float)
+
+    nodes = []
+    pending = [(np.arange(len(blocks)), None, 0)]  # (members, parent, slot)
+    while pending:
+        members, parent, slot = pending.pop()
+        if len(members) == 1:
+            node = ('leaf', int(members[0]))
+            children = []
+        else:
+            spread_x = np.ptp(centers_x[members])
+            spread_y = np.ptp(centers_y[members])
+            cut = VERTICAL if spread_x >= spread_y else HORIZONTAL
+            key = centers_x[members] if cut == VERTICAL else centers_y[members]
+            members = members[np.argsort(key, kind='stable')]
+            cumulative = np.cumsum(areas[members])
+            split = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+            split = min(max(split + 1, 1), len(members) - 1)
+            node = [cut, None, None]
+            children = [(members[:split], len(nodes), 1), (members[split:], len(nodes), 2)]
+
+        nodes.append(node)
+        if parent is not None:
+            nodes[parent][slot] = len(nodes) - 1
+        pending.extend(children)
+
+    return [tuple(node) for node in nodes], 0
+
+
+def evaluate_tree(nodes, blocks, aspect_min, aspect_max, samples, limit):
+    """Compute the shape curve of every node bottom-up"""
+    curves = [None] * len(nodes)
+    choices = [None] * len(nodes)
+    # Nodes are created parent-first, so reverse order visits children first
+    for n in range(len(nodes) - 1, -1, -1):
+        node = nodes[n]
+        if node[0] == 'leaf':
+            curves[n] = leaf_curve(blocks[node[1]], aspect_min, aspect_max, samples)
+        else:
+            cut, left, right = node
+            widths, heights, ia, ib = combine_curves(curves[left], curves[right], cut, limit)
+            curves[n] = (widths, heights)
+            choices[n] = (ia, ib)
+    return curves, choices
+
+
+def realize(nodes, curves, choices, root, point, origin):
+    """Place every leaf for the chosen root curve point
+
+    Returns {block index: (x, y, width, height)}.
+    """
+    result = {}
+    stack = [(root, point, origin[0], origin[1])]
+    while stack:
+        n, p, x, y = stack.pop()
+        node = nodes[n]
+        if node[0] == 'leaf':
+            widths, heights = curves[n]
+            result[node[1]] = (x, y, float(widths[p]), float(heights[p]))
+            continue
+        cut, left, right = node
+        ia, ib = choices[n]
+        pa, pb = int(ia[p]), int(ib[p])
+        stack.append((left, pa, x, y))
+        if cut == VERTICAL:
+            stack.append((right, pb, x + curves[left][0][pa], y))
+        else:
+            stack.append((right, pb, x, y + curves[left][1][pa]))
+    return result
+
+
+def weighted_wirelength(placement, connections):
+    """Connection-weighted Manhattan distance between block centers"""
+    if not connections:
+        return 0.0
+    ids = sorted(placement)
+    geom = np.array([placement[i] for i in ids])
+    position = {block_id: n for n, block_id in enumerate(ids)}
+    cx = geom[:, 0] + geom[:, 2] / 2
+    cy = geom[:, 1] + geom[:, 3] / 2
+    a = np.array([position[conn['from']] for conn in connections])
+    b = np.array([position[conn['to']] for conn in connections])
+    weight = np.array([float(conn['connections']) for conn in connections])
+    return float((weight * (np.abs(cx[a] - cx[b]) + np.abs(cy[a] - cy[b]))).sum())
+
+
+def optimize_shapes(blocks, connections, aspect_min=0.5, aspect_max=2.0, samples=16,
+                    curve_points=24, wl_weight=1.0, wl_candidates=8):
+    """Choose shapes and slicing positions for all blocks at once
+
+    Builds a slicing tree from the current placement, combines shape curves
+    bottom-up, then realizes the wl_candidates smallest-area root shapes and
+    picks the one minimizing area / min_area + wl_weight * wl / min_wl.
+    Returns ({block index: (x, y, width, height)}, summary dict).
+    """
+    nodes, root = build_slicing_tree(blocks)
+    curves, choices = evaluate_tree(nodes, blocks, aspect_min, aspect_max, samples, curve_points)
+
+    origin = (min(b['x'] for b in blocks), min(b['y'] for b in blocks))
+    widths, heights = curves[root]
+    areas = widths * heights
+    candidates = np.argsort(areas)[:max(1, wl_candidates)]
+
+    results = []
+    for p in candidates:
+        placement = realize(nodes, curves, choices, root, int(p), origin)
+        results.append((int(p), placement, weighted_wirelength(placement, connections)))
+
+    min_area = areas[candidates].min()
+    min_wl = max(min(r[2] for r in results), 1e-9)
+    best = min(results, key=lambda r: areas[r[0]] / min_area + wl_weight * r[2] / min_wl)
+
+    summary = {
+        'width': float(widths[best[0]]),
+        'height': float(heights[best[0]]),
+        'area': float(areas[best[0]]),
+        'wirelength': best[2]
+    }
+    return best[1], summary
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Tiled render cache for the floorplanning tool
+Renders a snapshot of the design into fixed-size tiles at discrete zoom
+levels on a background thread and composes the visible tiles into one image,
+so panning and wheel zoom blit pixels instead of re-rasterizing every artist
+"""
+
+import math
+import threading
+from collections import OrderedDict, deque
+from itertools import chain
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+
+# Pixels per tile side
+TILE_SIZE = 256
+
+# Tile render resolution (only sets the point to pixel scale of line widths and markers)
+TILE_DPI = 100
+
+
+class TileSnapshot:
+    """Immutable copy of the drawable design: block rectangles, route polylines and ports
+
+    Level 0 covers the whole design with one tile; every level halves the
+    design units per pixel.
+    """
+
+    def __init__(self, geometry, routes, ports, port_radius, net_segments=None, tile_size=TILE_SIZE):
+        self.geometry = np.asarray(geometry, dtype=float).reshape(-1, 4)
+        self.routes = list(routes)
+        if net_segments is not None and len(net_segments):
+            self.routes.extend(np.asarray(net_segments, dtype=float))
+        self.ports = np.asarray(ports, dtype=float).reshape(-1, 2)
+        self.port_radius = port_radius
+        self.tile_size = tile_size
+
+        # Bounding box of every route, for culling routes per tile
+        self.route_bounds = np.zeros((0, 4))
+        if self.routes:
+            points = np.array(list(chain.from_iterable(self.routes)), dtype=float).reshape(-1, 2)
+            starts = np.concatenate([[0], np.cumsum([len(route) for route in self.routes[:-1]])])
+            self.route_bounds = np.column_stack([np.minimum.reduceat(points[:, 0], starts),
+                                                 np.minimum.reduceat(points[:, 1], starts),
+                                                 np.maximum.reduceat(points[:, 0], starts),
+                                                 np.maximum.reduceat(points[:, 1], starts)])
+        x, y, w, h = self.geometry.T
+        xs = np.concatenate([x, x + w, self.route_bounds[:, 0], self.route_bounds[:, 2], self.ports[:, 0], [0.0]])
+        ys = np.concatenate([y, y + h, self.route_bounds[:, 1], self.route_bounds[:, 3], self.ports[:, 1], [0.0]])
+        x_min, x_max = xs.min(), xs.max()
+        y_min, y_max = ys.min(), ys.max()
+        self.origin = (x_min - port_radius, y_min - port_radius)
+        span = max(x_max - x_min, y_max - y_min) + 2 * port_radius
+        self.base_scale = max(span, 1e-9) / tile_size     # Design units per pixel at level 0
+        self.block_verts = np.stack([np.column_stack(c) for c in ((x, y), (x + w, y), (x + w, y + h), (x, y + h))],
+                                    axis=1) if len(x) else np.zeros((0, 4, 2))
+
+    def scale(self, level):
+        """Design units per pixel at level"""
+        return self.base_scale / 2 ** level
+
+    def level_for(self, units_per_pixel, max_level):
+        """Coarsest level at least as sharp as the screen"""
+        if units_per_pixel <= 0:
+            return max_level
+        return int(min(max(math.ceil(math.log2(self.base_scale / units_per_pixel)), 0), max_level))
+
+    def tile_bounds(self, level, ix, iy):
+        side = self.tile_size * self.scale(level)
+        x0 = self.origin[0] + ix * side
+        y0 = self.origin[1] + iy * side
+        return x0, y0, x0 + side, y0 + side
+
+
+class TileRenderer:
+    """Offscreen Agg figure that draws one tile of a snapshot at a time"""
+
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.fig = Figure(figsize=(tile_size / TILE_DPI, tile_size / TILE_DPI), dpi=TILE_DPI)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_axes([0, 0, 1, 1])
+        self.ax.set_axis_off()
+        self.blocks = PolyCollection([], facecolors='lightblue', edgecolors='blue', linewidths=1, alpha=0.7)
+        self.routes = LineCollection([], colors='red', linewidths=1, alpha=0.7)
+        self.ax.add_collection(self.blocks)
+        self.ax.add_collection(self.routes)
+        self.start_ports, = self.ax.plot([], [], 'o', color='blue', markeredgecolor='black', alpha=0.8)
+        self.end_ports, = self.ax.plot([], [], 'o', color='red', markeredgecolor='black', alpha=0.8)
+
+    def render(self, snapshot, level, ix, iy):
+        """RGBA pixels (tile_size x tile_size x 4, top row first) of one tile"""
+        x0, y0, x1, y1 = snapshot.tile_bounds(level, ix, iy)
+        scale = snapshot.scale(level)
+        pad = snapshot.port_radius
+
+        x, y, w, h = snapshot.geometry.T
+        inside = (x < x1) & (x + w > x0) & (y < y1) & (y + h > y0)
+        self.blocks.set_verts(snapshot.block_verts[inside])
+
+        bounds = snapshot.route_bounds
+        inside = (bounds[:, 0] <= x1) & (bounds[:, 2] >= x0) & (bounds[:, 1] <= y1) & (bounds[:, 3] >= y0)
+        self.routes.set_segments([snapshot.routes[i] for i in np.flatnonzero(inside)])
+
+        # Ports are stored start, end, start, end, ...; bubbles keep their size in design units
+        ports = snapshot.ports
+        inside = ((ports[:, 0] >= x0 - pad) & (ports[:, 0] <= x1 + pad) &
+                  (ports[:, 1] >= y0 - pad) & (ports[:, 1] <= y1 + pad))
+        size = max(2 * snapshot.port_radius / scale * 72 / TILE_DPI, 1)
+        for line, parity in ((self.start_ports, 0), (self.end_ports, 1)):
+            chosen = inside & (np.arange(len(ports)) % 2 == parity)
+            line.set_data(ports[chosen, 0], ports[chosen, 1])
+            line.set_markersize(size)
+
+        self.ax.set_xlim(x0, x1)
+        self.ax.set_ylim(y0, y1)
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba()).copy()
+
+
+class TileCache:
+    """LRU of rendered tiles keyed by (level, ix, iy), filled by a background thread
+
+    Missing tiles are queued newest first and rendered one at a time;
+    setting a new snapshot drops every tile and pending request.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE, capacity=256, max_level=12):
+        self.tile_size = tile_size
+        self.capacity = capacity
+        self.max_level = max_level
+        self.snapshot = None
+        self.generation = 0
+        self.tiles = OrderedDict()
+        self.queue = deque()
+        self.queued = set()
+        self.ready = 0              # Tiles rendered since the last take_ready()
+        self.busy = False           # The worker is rendering a tile
+        self.lock = threading.Condition()
+        self.worker = None
+
+    def invalidate(self):
+        """Forget the snapshot (the design changed)"""
+        self.set_snapshot(None)
+
+    def set_snapshot(self, snapshot):
+        with self.lock:
+            self.snapshot = snapshot
+            self.generation += 1
+            self.tiles.clear()
+            self.queue.clear()
+            self.queued.clear()
+
+    def get(self, key):
+        """Cached tile or None (the tile is then queued for rendering)"""
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+                return tile
+            if key not in self.queued:
+                self.queued.add(key)
+                self.queue.appendleft(key)
+                # Requests of views long scrolled past are dropped first
+                while len(self.queue) > self.capacity:
+                    self.queued.discard(self.queue.pop())
+                self.lock.notify()
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, daemon=True)
+                self.worker.start()
+            return None
+
+    def peek(self, key):
+        with self.lock:
+            return self.tiles.get(key)
+
+    def pending(self):
+        with self.lock:
+            return len(self.queue)
+
+    def take_ready(self):
+        """Number of tiles rendered since the last call"""
+        with self.lock:
+            ready, self.ready = self.ready, 0
+            return ready
+
+    def wait(self, timeout=None):
+        """Block until every queued tile is rendered; returns False on timeout"""
+        with self.lock:
+            return self.lock.wait_for(lambda: not self.queue and not self.busy, timeout)
+
+    def run(self):
+        renderer = TileRenderer(self.tile_size)
+        while True:
+            with self.lock:
+                while not self.queue:
+                    self.busy = False
+                    self.lock.notify_all()
+                    self.lock.wait()
+                key = self.queue.popleft()
+                snapshot, generation = self.snapshot, self.generation
+                self.busy = True
+            tile = renderer.render(snapshot, *key) if snapshot is not None else None
+            with self.lock:
+                self.queued.discard(key)
+                if tile is None or generation != self.generation:
+                    continue
+                self.tiles[key] = tile
+                while len(self.tiles) > self.capacity:
+                    self.tiles.popitem(last=False)
+                self.ready += 1
+
+    def fallback(self, level, ix, iy):
+        """The matching part of the nearest cached coarser tile, scaled up (None if none is cached)"""
+        size = self.tile_size
+        for up in range(1, level + 1):
+            parent = self.peek((level - up, ix >> up, iy >> up))
+            if parent is None:
+                continue
+            part = size >> up
+            if part < 1:
+                return None
+            col = (ix & ((1 << up) - 1)) * part
+            row = ((1 << up) - 1 - (iy & ((1 << up) - 1))) * part
+            crop = parent[row:row + part, col:col + part]
+            return np.repeat(np.repeat(crop, size // part, axis=0), size // part, axis=1)
+        return None
+
+    def compose(self, x_limits, y_limits, width, height):
+        """Mosaic of the tiles covering the part of the design in view
+
+        width and height are the view size in screen pixels. Returns
+        (RGBA image, (left, right, bottom, top) extent, missing tile count);
+        missing tiles are queued and shown from a coarser level meanwhile.
+        The image is None when the view misses the design.
+        """
+        snapshot = self.snapshot
+        units_per_pixel = min((x_limits[1] - x_limits[0]) / max(width, 1),
+                              (y_limits[1] - y_limits[0]) / max(height, 1))
+        level = snapshot.level_for(units_per_pixel, self.max_level)
+        side = self.tile_size * snapshot.scale(level)
+        ix0 = math.floor((x_limits[0] - snapshot.origin[0]) / side)
+        ix1 = math.floor((x_limits[1] - snapshot.origin[0]) / side)
+        iy0 = math.floor((y_limits[0] - snapshot.origin[1]) / side)
+        iy1 = math.floor((y_limits[1] - snapshot.origin[1]) / side)
+
+        # Level L has 2**L x 2**L tiles over the design; there is nothing to draw outside
+        last = 2 ** level - 1
+        ix0, iy0 = max(ix0, 0), max(iy0, 0)
+        ix1, iy1 = min(ix1, last), min(iy1, last)
+        if ix0 > ix1 or iy0 > iy1:
+            return None, None, 0
+
+        size = self.tile_size
+        image = np.full(((iy1 - iy0 + 1) * size, (ix1 - ix0 + 1) * size, 4), 255, dtype=np.uint8)
+        missing = 0
+        for iy in range(iy0, iy1 + 1):
+            row = (iy1 - iy) * size
+            for ix in range(ix0, ix1 + 1):
+                tile = self.get((level, ix, iy))
+                if tile is None:
+                    missing += 1
+                    tile = self.fallback(level, ix, iy)
+                    if tile is None:
+                        continue
+                col = (ix - ix0) * size
+                image[row:row + size, col:col + size] = tile
+        x0 = snapshot.origin[0] + ix0 * side
+        y0 = snapshot.origin[1] + iy0 * side
+        extent = (x0, snapshot.origin[0] + (ix1 + 1) * side, y0, snapshot.origin[1] + (iy1 + 1) * side)
+        return image, extent, missing
+
+    def view(self, x_limits, y_limits, width, height):
+        """The view as a height x width RGBA image in screen pixels (top row first)
+
+        Resamples the composed tiles by nearest neighbour; returns
+        (image, missing tile count).
+        """
+        image, extent, missing = self.compose(x_limits, y_limits, width, height)
+        if image is None:
+            return np.full((height, width, 4), 255, dtype=np.uint8), missing
+
+        # Screen pixels outside the mosaic sample the white border row and column added here
+        image = np.pad(image, ((0, 1), (0, 1), (0, 0)), constant_values=255)
+        left, right, bottom, top = extent
+        scale = (right - left) / (image.shape[1] - 1)
+        x = x_limits[0] + (np.arange(width) + 0.5) * (x_limits[1] - x_limits[0]) / width
+        y = y_limits[1] - (np.arange(height) + 0.5) * (y_limits[1] - y_limits[0]) / height
+        cols = np.floor((x - left) / scale).astype(np.int64)
+        rows = np.floor((top - y) / scale).astype(np.int64)
+        cols[(cols < 0) | (cols >= image.shape[1] - 1)] = image.shape[1] - 1
+        rows[(rows < 0) | (rows >= image.shape[0] - 1)] = image.shape[0] - 1
+        return image.take(rows, axis=0).take(cols, axis=1), missing